@@ -0,0 +1 @@
+alter table frf_prjt.frf_raw_data_excel add column if not exists pass_accurate boolean;
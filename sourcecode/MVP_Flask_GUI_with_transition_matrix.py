@@ -1,53 +1,24 @@
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-from mplsoccer import Pitch
-from flask import Flask, render_template_string, request, url_for, redirect
-from scipy.stats import binned_statistic_2d
-from itertools import product
-import io
-import base64
-import ast
+from flask import Blueprint, Flask, Response, g, jsonify, render_template_string, request, url_for, redirect
+from action_values import LEADERBOARD_GROUPS, leaderboard
+from dashboard_core import (ALL_CONTEXTS, BOOTSTRAP_PLOTS, CONFIDENCE, LEAGUE_PLOTS, PLOT_TITLES, TEAMS,
+                            append_match_events, context_version, get_bootstrap_bands, get_league_average,
+                            get_match_index, get_possession_chains, get_scored_actions, get_window_calculations,
+                            image_cache, metrics,
+                            render_plot, warmup)
+from window_counts import FULL_WINDOW, PERIODS, describe_window, parse_window, window_parameters
+from grid_encoding import GRID_FORMATS, grid_arrays, describe_grids, encode_grid
 import warnings
+import hmac
+import io
+import json
 import os
-
-# Set a non-GUI backend for Matplotlib to prevent thread errors in Flask
-plt.switch_backend('Agg')
+import time
 
 # Suppress pandas and other library warnings for cleaner output
-pd.options.mode.chained_assignment = None
 warnings.filterwarnings('ignore')
 
-# --- DATA LOADING AND PREPROCESSING ---
-# This part of the code is executed once when the app starts.
-try:
-    df_raw = pd.read_csv("datasets/Universitatea_Cluj_2024_2025_events.csv")
-    # Convert 'type.secondary' and 'pass.endLocation' from strings to lists/objects
-    df_raw['type.secondary'] = df_raw['type.secondary'].apply(lambda x: ast.literal_eval(x) if isinstance(x, str) else x)
-    df_raw['pass.endLocation.x'] = df_raw['pass.endLocation.x'].astype(float)
-    df_raw['pass.endLocation.y'] = df_raw['pass.endLocation.y'].astype(float)
-
-except FileNotFoundError:
-    print("Error: Dataset file not found. Please check the file path.")
-
-# --- Define the list of teams and their IDs ---
-TEAMS = [
-    (11566, 'Rapid Bucureşti'),
-    (11564, 'Dinamo Bucureşti'),
-    (11565, 'FCS Bucureşti'),
-    (11611, 'CFR Cluj'),
-    (26233, 'Universitatea Craiova'),
-    (61242, 'Farul Constanţa'),
-    (11634, 'Botoşani'),
-    (11571, 'Oţelul'),
-    (11663, 'Unirea Slobozia'),
-    (11886, 'Poli Iaşi'),
-    (60392, 'AS FC Buzău'),
-    (32854, 'Sepsi'),
-    (60390, 'Petrolul 52'),
-    (30817, 'UTA Arad'),
-    (55427, 'Hermannstadt')
-]
+# The data, calculations and plot rendering live in dashboard_core; this module holds the pages
+# and routes. Importing it reads no data and imports none of pandas, SciPy or matplotlib.
 
 # --- PLOT DESCRIPTIONS ---
 PLOT_DESCRIPTIONS = {
@@ -76,14 +47,31 @@ PLOT_DESCRIPTIONS = {
         "Vizualizarea surprinde nu doar o stare statică, ci dinamica prin care un atac câștigă valoare cu fiecare pasă sau șut suplimentar."
     )
     for i in range(10)
-}
+},
+    'xT vs League Average':
+    "Această hartă (Heatmap) compară valoarea Expected Threat (xT) a adversarului selectat cu media ligii, calculată ca medie a tuturor echipelor din campionat, fiecare echipă având aceeași pondere. Poarta noastră se află în dreapta, iar cea adversă în stânga. Fiecare celulă arată diferența dintre xT-ul adversarului și xT-ul mediu al ligii în acea zonă: nuanțele de roșu indică zone în care adversarul este mai periculos decât media, iar nuanțele de albastru zone în care este mai puțin periculos. Scala este centrată pe zero, astfel încât celulele albe corespund unui nivel de pericol egal cu media. Această comparație scoate în evidență ce face un adversar diferit față de restul ligii și ne ajută să pregătim planul defensiv specific pentru fiecare meci.",
+    'Move Probability vs League Average':
+    "Această hartă (Heatmap) compară probabilitatea ca adversarul să mute mingea (prin pase sau driblinguri reușite) din fiecare zonă cu media ligii. Poarta noastră se află în dreapta, iar cea adversă în stânga. Nuanțele de roșu marchează zonele din care adversarul construiește mai des decât media echipelor din campionat, iar nuanțele de albastru zonele în care o face mai rar. Numărul afișat în fiecare celulă reprezintă diferența de probabilitate față de medie. Astfel putem identifica tiparele de construcție specifice fiecărui adversar.",
+    'Shot Probability vs League Average':
+    "Această hartă (Heatmap) compară probabilitatea ca adversarul să șuteze din fiecare zonă cu media ligii. Poarta noastră se află în dreapta, iar cea adversă în stânga. Nuanțele de roșu arată zonele din care adversarul alege să finalizeze mai des decât media, iar nuanțele de albastru zonele din care șutează mai rar. Numărul afișat în fiecare celulă reprezintă diferența de probabilitate față de medie. Comparația evidențiază preferințele de finalizare ale adversarului față de restul campionatului.",
+    'Goal Probability vs League Average':
+    "Această hartă (Heatmap) compară probabilitatea ca un șut al adversarului să devină gol, în fiecare zonă, cu media ligii. Poarta noastră se află în dreapta, iar cea adversă în stânga. Nuanțele de roșu indică zonele în care adversarul este mai eficient decât media, iar nuanțele de albastru zonele în care este mai puțin eficient. Numărul afișat în fiecare celulă reprezintă diferența de probabilitate față de medie. Pentru adversarii cu puține șuturi, diferențele pot fi influențate de un număr mic de evenimente și trebuie interpretate cu prudență.",
+    f'xT Lower Bound ({CONFIDENCE:.0%} CI)':
+    f"Această hartă (Heatmap) arată limita inferioară a intervalului de încredere de {CONFIDENCE:.0%} pentru valoarea Expected Threat (xT) în fiecare zonă. Intervalul este obținut prin bootstrap: posesiile adversarului sunt reeșantionate aleator, cu înlocuire, de mai multe ori, iar modelul xT este recalculat pentru fiecare eșantion. Poarta noastră se află în dreapta, iar cea adversă în stânga. Valoarea din fiecare celulă este nivelul de pericol pe care îl putem considera, cu încredere ridicată, drept minim pentru acea zonă: o valoare mare aici indică o zonă periculoasă chiar și în scenariul cel mai favorabil pentru noi.",
+    f'xT Upper Bound ({CONFIDENCE:.0%} CI)':
+    f"Această hartă (Heatmap) arată limita superioară a intervalului de încredere de {CONFIDENCE:.0%} pentru valoarea Expected Threat (xT) în fiecare zonă, obținută prin reeșantionarea bootstrap a posesiilor adversarului. Poarta noastră se află în dreapta, iar cea adversă în stânga. Valoarea din fiecare celulă reprezintă nivelul de pericol pe care adversarul îl poate atinge în mod plauzibil din acea zonă. Comparată cu limita inferioară, harta arată cât de mult se poate schimba imaginea atunci când câteva posesii ar fi decurs altfel.",
+    f'xT Uncertainty ({CONFIDENCE:.0%} CI Width)':
+    f"Această hartă (Heatmap) arată lățimea intervalului de încredere de {CONFIDENCE:.0%} pentru valoarea Expected Threat (xT), adică diferența dintre limita superioară și cea inferioară obținute prin bootstrap. Poarta noastră se află în dreapta, iar cea adversă în stânga. Nuanțele închise marchează zonele în care estimarea xT este nesigură, de obicei pentru că adversarul a avut puține acțiuni sau puține goluri din acele zone, iar nuanțele deschise zonele în care estimarea este stabilă. Această hartă ne ajută să decidem ce diferențe din celelalte hărți xT sunt reale și care pot fi doar efectul unui număr mic de evenimente.",
+    f'Move Probability Uncertainty ({CONFIDENCE:.0%} CI Width)':
+    f"Această hartă (Heatmap) arată lățimea intervalului de încredere de {CONFIDENCE:.0%} pentru probabilitatea ca adversarul să mute mingea (prin pase sau driblinguri reușite) din fiecare zonă, obținută prin reeșantionarea bootstrap a posesiilor. Poarta noastră se află în dreapta, iar cea adversă în stânga. Nuanțele închise indică zonele în care probabilitatea este estimată din puține evenimente și poate varia mult, iar nuanțele deschise zonele în care estimarea este sigură.",
+    f'Shot Probability Uncertainty ({CONFIDENCE:.0%} CI Width)':
+    f"Această hartă (Heatmap) arată lățimea intervalului de încredere de {CONFIDENCE:.0%} pentru probabilitatea ca adversarul să șuteze din fiecare zonă, obținută prin reeșantionarea bootstrap a posesiilor. Poarta noastră se află în dreapta, iar cea adversă în stânga. Nuanțele închise marchează zonele în care probabilitatea de șut este incertă, iar nuanțele deschise zonele în care tiparul de finalizare al adversarului este bine stabilit.",
+    f'Goal Probability Uncertainty ({CONFIDENCE:.0%} CI Width)':
+    f"Această hartă (Heatmap) arată lățimea intervalului de încredere de {CONFIDENCE:.0%} pentru probabilitatea ca un șut al adversarului să devină gol, în fiecare zonă, obținută prin reeșantionarea bootstrap a posesiilor. Poarta noastră se află în dreapta, iar cea adversă în stânga. Deoarece golurile sunt rare, intervalele sunt adesea largi: nuanțele închise arată zonele în care probabilitatea de gol se bazează pe foarte puține șuturi și trebuie interpretată cu prudență."
 }
 
-# --- CACHING ---
-calculation_cache = {}
-
 # --- FLASK WEB APPLICATION SETUP ---
-app = Flask(__name__)
+dashboard = Blueprint('dashboard', __name__)
 
 # The HTML for the main page with a dropdown menu.
 HTML_FORM = """
@@ -136,6 +124,8 @@ HTML_RESULTS = """
         .container { max-width: 1200px; margin: auto; }
         .plot-controls { background: #fff; padding: 1em; border-radius: 8px; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1); margin-bottom: 2em; text-align: center; }
         .plot-controls select { width: 50%; padding: 12px; font-size: 16px; border-radius: 6px; border: 1px solid #ccc; }
+        .window-controls { margin-top: 1em; }
+        .window-controls select { width: auto; padding: 8px; }
         .plot-box { 
             background: #fff; padding: 1em; border-radius: 8px; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1); 
             text-align: center; margin-bottom: 2em;
@@ -154,6 +144,7 @@ HTML_RESULTS = """
 <body>
     <div class="container">
         <a href="/" class="back-button">← Go Back</a>
+        {% if plots %}<a href="{{ url_for('.players', team_id_selection=team_id_selection) }}" class="back-button">Player xT Leaderboard</a>{% endif %}
         <h1>Analysis for {{ title }}</h1>
         {% if plots %}
             <div class="plot-controls">
@@ -173,12 +164,43 @@ HTML_RESULTS = """
                         {% endfor %}
                     </select>
                     {% endif %}
+                    <div class="window-controls">
+                        <label for="last_matches_select">Matches:</label>
+                        <select name="last_matches" id="last_matches_select" onchange="this.form.submit()">
+                            <option value="">All</option>
+                            {% for n in [1, 3, 5, 10] %}
+                            <option value="{{ n }}" {% if n == window.last_matches %}selected{% endif %}>Last {{ n }}</option>
+                            {% endfor %}
+                        </select>
+                        <label for="period_select">Period:</label>
+                        <select name="period" id="period_select" onchange="this.form.submit()">
+                            <option value="">Full match</option>
+                            {% for period in periods %}
+                            <option value="{{ period }}" {% if period == window.period %}selected{% endif %}>{{ period }}</option>
+                            {% endfor %}
+                        </select>
+                        <label for="minute_from_select">Minutes:</label>
+                        <select name="minute_from" id="minute_from_select" onchange="this.form.submit()">
+                            {% for minute in range(0, 120, 15) %}
+                            <option value="{{ minute }}" {% if minute == (window.minute_from or 0) %}selected{% endif %}>{{ minute }}</option>
+                            {% endfor %}
+                        </select>
+                        <select name="minute_to" id="minute_to_select" onchange="this.form.submit()">
+                            {% for minute in range(15, 120, 15) %}
+                            <option value="{{ minute }}" {% if minute == window.minute_to %}selected{% endif %}>{{ minute }}</option>
+                            {% endfor %}
+                            <option value="" {% if window.minute_to is none %}selected{% endif %}>end</option>
+                        </select>
+                        {% for name in ['match_from', 'match_to'] if window[name] is not none %}
+                        <input type="hidden" name="{{ name }}" value="{{ window[name] }}">
+                        {% endfor %}
+                    </div>
                 </form>
             </div>
             
             {% for plot_title, plot_url in plots.items() %}
                 <div class="plot-box">
-                    <img src="data:image/png;base64,{{ plot_url }}" alt="{{ plot_title }}">
+                    <img src="{{ plot_url }}" alt="{{ plot_title }}">
                     <div class="plot-caption">
                         <h2>{{ descriptions_to_display[plot_title] }}</h2>
                         <p>{{ descriptions[descriptions_to_display[plot_title]] }}</p>
@@ -195,264 +217,59 @@ HTML_RESULTS = """
 </html>
 """
 
-def generate_heatmap_plot(binned_statistic, title, cmap='Blues', show_labels=False, figsize=(15, 8)):
-    """
-    Generates a heatmap plot from a pre-binned statistic and returns it as a base64 encoded image string.
-    """
-    plt.style.use('seaborn-v0_8-whitegrid')
-    fig, ax = plt.subplots(figsize=figsize)
-    pitch = Pitch(line_color='black', pitch_type='custom', pitch_length=105, pitch_width=68, line_zorder=2)
-    
-    pitch.draw(ax=ax)
-    
-    if binned_statistic is None:
-        ax.set_title(title, fontsize=20)
-    else:
-        pcm = pitch.heatmap(binned_statistic, cmap=cmap, edgecolor='grey', ax=ax)
-        
-        ax_cbar = fig.add_axes([0.95, 0.1, 0.03, 0.8])
-        plt.colorbar(pcm, cax=ax_cbar)
-        
-        if show_labels:
-            pitch.label_heatmap(binned_statistic, color='blue', fontsize=9,
-                                 ax=ax, ha='center', va='center', str_format="{0:,.2f}", zorder=3)
-        
-        fig.suptitle(title, fontsize=20)
-    
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png', bbox_inches='tight')
-    plt.close(fig)
-    buf.seek(0)
-    return base64.b64encode(buf.getvalue()).decode('utf-8')
-
-def generate_transition_matrix_plot(transition_matrices_array, sector_index, bins):
-    """
-    Generates a heatmap of a specific transition matrix for a given sector,
-    with an added number for each cell.
-    """
-    plt.style.use('seaborn-v0_8-whitegrid')
-    fig, ax = plt.subplots(figsize=(15, 8))
-    pitch = Pitch(line_color='black', pitch_type='custom', pitch_length=105, pitch_width=68, line_zorder=2)
-    pitch.draw(ax=ax)
-    
-    if sector_index < 0 or sector_index >= transition_matrices_array.shape[0]:
-        ax.set_title(f"Invalid Sector Index: {sector_index}", fontsize=20)
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png', bbox_inches='tight')
-        plt.close(fig)
-        buf.seek(0)
-        return base64.b64encode(buf.getvalue()).decode('utf-8'), "Invalid Sector"
-        
-    transition_matrix = transition_matrices_array[sector_index]
-    
-    # Create a binned statistic object with the transition matrix data.
-    binned_stat = {
-        'statistic': transition_matrix,
-        'x_grid': np.linspace(0, 105, bins[0] + 1),
-        'y_grid': np.linspace(0, 68, bins[1] + 1)
-    }
-    
-    # Get the x and y coordinates for the selected sector to highlight it
-    x_coords = np.linspace(0, 105, bins[0] + 1)
-    y_coords = np.linspace(0, 68, bins[1] + 1)
-    sector_y_bin = sector_index // bins[0]
-    sector_x_bin = sector_index % bins[0]
-    
-    rect_x = x_coords[sector_x_bin]
-    rect_y = y_coords[sector_y_bin]
-    rect_width = x_coords[sector_x_bin + 1] - rect_x
-    rect_height = y_coords[sector_y_bin + 1] - rect_y
-    
-    rect = plt.Rectangle((rect_x, rect_y), rect_width, rect_height,
-                         edgecolor='red', facecolor='yellow', linewidth=3, zorder=4,
-                         alpha=0.5, label='Starting Sector')
-    ax.add_patch(rect)
-    
-    # Plot the transition probabilities
-    heatmap = pitch.heatmap(
-        binned_stat,
-        cmap='Greens',
-        edgecolor='grey',
-        ax=ax,
-        vmin=0,
-        vmax=np.max(transition_matrix)
-    )
-    
-    # Add a colorbar
-    ax_cbar = fig.add_axes([0.95, 0.1, 0.03, 0.8])
-    plt.colorbar(heatmap, cax=ax_cbar)
-    
-    # Add cell numbers to the plot
-    for y_idx in range(bins[1]):
-        for x_idx in range(bins[0]):
-            sector_number = y_idx * bins[0] + x_idx
-            text_color = 'white' if transition_matrix[y_idx, x_idx] > 0.05 else 'black'
-            ax.text(
-                (x_coords[x_idx] + x_coords[x_idx + 1]) / 2,
-                (y_coords[y_idx] + y_coords[y_idx + 1]) / 2,
-                str(sector_number),
-                ha='center',
-                va='center',
-                color=text_color,
-                fontsize=8,
-                zorder=5
-            )
-
-    plot_title = f"Transition Probabilities from Sector {sector_index}"
-    fig.suptitle(plot_title, fontsize=20)
-    
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png', bbox_inches='tight')
-    plt.close(fig)
-    
-    buf.seek(0)
-    return base64.b64encode(buf.getvalue()).decode('utf-8'), plot_title
-
-
-def run_all_calculations(dataframe):
-    """
-    Runs all the core calculations once and stores the binned statistics.
-    """
-    calculations = {}
-    pitch = Pitch(line_color='black', pitch_type='custom', pitch_length=105, pitch_width=68, line_zorder=2)
-    bins = (16, 12)
-    
-    # 1. HEATMAPS FOR MOVES, SHOTS, AND GOALS
-    pass_types = ['short_or_medium_pass', 'long_pass', 'head_pass', 'smart_pass', 'cross', 'forward_pass', 'progressive_pass', 'lateral_pass','back_pass','dribble']
-    move_df = dataframe.loc[
-        (dataframe['type.secondary'].apply(lambda x: isinstance(x, list) and any(item in x for item in pass_types))) &
-        (dataframe['pass.accurate'] == True)
-    ].copy()
-
-    shot_df = dataframe.loc[dataframe['type.primary'] == "shot"].copy()
-    goal_df = shot_df.loc[shot_df['shot.isGoal'] == True].copy()
-    
-    calculations['move_binned'] = pitch.bin_statistic(move_df['location.x'], move_df['location.y'], statistic='count', bins=bins, normalize=False) if not move_df.empty else None
-    calculations['shot_binned'] = pitch.bin_statistic(shot_df["location.x"], shot_df["location.y"], statistic='count', bins=bins, normalize=False) if not shot_df.empty else None
-    calculations['goal_binned'] = pitch.bin_statistic(goal_df["location.x"], goal_df["location.y"], statistic='count', bins=bins, normalize=False) if not goal_df.empty else None
-
-    # 2. PROBABILITY MAPS
-    if calculations['move_binned'] is not None and calculations['shot_binned'] is not None and calculations['goal_binned'] is not None:
-        move_count = calculations['move_binned']["statistic"]
-        shot_count = calculations['shot_binned']["statistic"]
-        goal_count = calculations['goal_binned']["statistic"]
-        
-        total_actions = move_count + shot_count
-        move_probability = np.divide(move_count, total_actions, out=np.zeros_like(move_count), where=total_actions != 0)
-        shot_probability = np.divide(shot_count, total_actions, out=np.zeros_like(shot_count), where=total_actions != 0)
-        goal_probability = np.divide(goal_count, shot_count, out=np.zeros_like(goal_count), where=shot_count != 0)
-
-        move_prob_binned = calculations['move_binned'].copy()
-        move_prob_binned["statistic"] = move_probability
-        shot_prob_binned = calculations['shot_binned'].copy()
-        shot_prob_binned["statistic"] = shot_probability
-        goal_prob_binned = calculations['goal_binned'].copy()
-        goal_prob_binned["statistic"] = goal_probability
-        
-        calculations['move_prob_binned'] = move_prob_binned
-        calculations['shot_prob_binned'] = shot_prob_binned
-        calculations['goal_prob_binned'] = goal_prob_binned
-        calculations['goal_probability'] = goal_probability
-        calculations['shot_probability'] = shot_probability
-        calculations['move_probability'] = move_probability
-    
-    # 3. xT MATRIX (Markov chain calculation)
-    if 'move_prob_binned' in calculations:
-        pitch_length = 105
-        pitch_width = 68
-        
-        start_sectors = binned_statistic_2d(move_df['location.x'], move_df['location.y'], values=None, statistic='count', bins=bins, range=[[0, 105], [0, 68]], expand_binnumbers=True)[3]
-        move_df['start_sector_x_bin'], move_df['start_sector_y_bin'] = start_sectors[0], start_sectors[1]
-        end_sectors = binned_statistic_2d(move_df['pass.endLocation.x'], move_df['pass.endLocation.y'], values=None, statistic='count', bins=bins, range=[[0, 105], [0, 68]], expand_binnumbers=True)[3]
-        move_df['end_sector_x_bin'], move_df['end_sector_y_bin'] = end_sectors[0], end_sectors[1]
-
-        transition_matrices_array = np.zeros((192, 12, 16))
-        for start_sector_x in range(1, 17):
-            for start_sector_y in range(1, 13):
-                this_sector_moves = move_df[(move_df['start_sector_x_bin'] == start_sector_x) & (move_df['start_sector_y_bin'] == start_sector_y)]
-                
-                count_starts = len(this_sector_moves)
-                if count_starts == 0: continue
-                end_counts = this_sector_moves.groupby(['end_sector_x_bin', 'end_sector_y_bin']).size().reset_index(name='count_ends')
-                start_sector_flat_idx = (start_sector_y - 1) * 16 + (start_sector_x - 1)
-                for _, row2 in end_counts.iterrows():
-                    end_sector_x, end_sector_y, value = row2['end_sector_x_bin'], row2['end_sector_y_bin'], row2['count_ends']
-                    if 0 < end_sector_x <= 16 and 0 < end_sector_y <= 12:
-                        transition_matrices_array[start_sector_flat_idx][end_sector_y - 1][end_sector_x - 1] = value / count_starts
-
-        calculations['transition_matrices_array'] = transition_matrices_array
-        
-        xT_final = np.zeros((12, 16))
-        num_iterations = 10
-        xT_matrices = {}
-        for i in range(num_iterations):
-            shoot_expected_payoff = calculations['goal_probability'] * calculations['shot_probability']
-            move_prob_reshaped = calculations['move_probability'].reshape(192)
-            move_expected_payoff = move_prob_reshaped * np.sum(transition_matrices_array * xT_final, axis=(1, 2))
-            move_expected_payoff_intermediate = move_expected_payoff.reshape(12, 16)
-            xT_final = shoot_expected_payoff + move_expected_payoff_intermediate
-            
-            xT_binned_iter = pitch.bin_statistic(dataframe['location.x'], dataframe['location.y'], statistic='count', bins=bins, normalize=False)
-            xT_binned_iter["statistic"] = xT_final
-            xT_matrices[f'xT Matrix after {i+1} Moves'] = xT_binned_iter
-        
-        calculations['xT_matrices'] = xT_matrices
-    
-    return calculations
+# HTML for the action value leaderboards
+HTML_LEADERBOARD = """
+<!doctype html>
+<html>
+<head>
+    <title>xT Leaderboard</title>
+    <style>
+        body { font-family: sans-serif; margin: 2em; background-color: #f0f2f5; }
+        .container { max-width: 1200px; margin: auto; }
+        .plot-controls { background: #fff; padding: 1em; border-radius: 8px; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1); margin-bottom: 2em; text-align: center; }
+        .plot-controls select { width: 50%; padding: 12px; font-size: 16px; border-radius: 6px; border: 1px solid #ccc; }
+        .table-box { background: #fff; padding: 1em; border-radius: 8px; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1); }
+        table { width: 100%; border-collapse: collapse; }
+        th, td { padding: 8px; border-bottom: 1px solid #eee; text-align: right; }
+        th:first-child, td:first-child { text-align: left; }
+        .message-box { background: #fff; padding: 2em; border-radius: 8px; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1); }
+        .back-button { display: inline-block; margin-bottom: 2em; padding: 10px 15px; background-color: #6c757d; color: white; text-decoration: none; border-radius: 6px; }
+        .back-button:hover { background-color: #5a6268; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <a href="{{ url_for('.analyze', team_id_selection=team_id_selection) }}" class="back-button">← Back to the Analysis</a>
+        <h1>xT Leaderboard for {{ title }}</h1>
+        <div class="plot-controls">
+            <form action="/players" method="get">
+                <input type="hidden" name="team_id_selection" value="{{ team_id_selection }}">
+                <label for="by_select">Group by:</label>
+                <select name="by" id="by_select" onchange="this.form.submit()">
+                    {% for group in groups %}
+                    <option value="{{ group }}" {% if group == by %}selected{% endif %}>{{ group }}</option>
+                    {% endfor %}
+                </select>
+            </form>
+        </div>
+        {% if rows %}
+        <div class="table-box">
+            <table>
+                <tr>{% for column in columns %}<th>{{ column }}</th>{% endfor %}</tr>
+                {% for row in rows %}
+                <tr>{% for column in columns %}<td>{{ row[column] if row[column] is string else ('%.3f' | format(row[column]) if row[column] is float else row[column]) }}</td>{% endfor %}</tr>
+                {% endfor %}
+            </table>
+        </div>
+        {% else %}
+        <div class="message-box"><p>{{ message }}</p></div>
+        {% endif %}
+    </div>
+</body>
+</html>
+"""
 
-def generate_specific_plot(calculations, plot_title, df):
-    """
-    Generates a single plot based on a title and pre-calculated statistics.
-    """
-    pitch = Pitch(line_color='black', pitch_type='custom', pitch_length=105, pitch_width=68, line_zorder=2)
-    
-    binned_stat = None
-    cmap = 'Blues'
-    show_labels = False
-    
-    if plot_title == 'Moving-Ball Actions ( Pass actions ) Heatmap':
-        binned_stat = calculations.get('move_binned')
-        cmap = 'Oranges'
-    elif plot_title == 'Shot Heatmap':
-        binned_stat = calculations.get('shot_binned')
-        cmap = 'Oranges'
-        show_labels = True
-    elif plot_title == 'Goal Heatmap':
-        binned_stat = calculations.get('goal_binned')
-        cmap = 'Oranges'
-        show_labels = True
-    elif plot_title == 'Move Probability':
-        binned_stat = calculations.get('move_prob_binned')
-        cmap = 'Oranges'
-        show_labels = True
-    elif plot_title == 'Shot Probability':
-        binned_stat = calculations.get('shot_prob_binned')
-        cmap = 'Oranges'
-        show_labels = True
-    elif plot_title == 'Goal Probability':
-        binned_stat = calculations.get('goal_prob_binned')
-        cmap = 'Oranges'
-        show_labels = True
-    elif 'xT Matrix after' in plot_title:
-        xT_matrices = calculations.get('xT_matrices', {})
-        binned_stat = xT_matrices.get(plot_title)
-        cmap = 'Oranges'
-        show_labels = True
-    else:
-        title = "Plot Not Found"
-        buf = io.BytesIO()
-        plt.style.use('seaborn-v0_8-whitegrid')
-        fig, ax = plt.subplots(figsize=(15, 8))
-        pitch.draw(ax=ax)
-        ax.set_title(title, fontsize=20)
-        plt.savefig(buf, format='png', bbox_inches='tight')
-        plt.close(fig)
-        buf.seek(0)
-        return base64.b64encode(buf.getvalue()).decode('utf-8'), title
-
-    return generate_heatmap_plot(binned_stat, plot_title, cmap=cmap, show_labels=show_labels), plot_title
-
-@app.route('/')
+@dashboard.route('/')
 def index():
     """Renders the main page with the form."""
     teams = [
@@ -474,74 +291,316 @@ def index():
     ]
     return render_template_string(HTML_FORM, teams=teams)
 
-@app.route('/analyze', methods=['POST', 'GET'])
+def parse_sector(selected_sector):
+    return int(selected_sector) if selected_sector and selected_sector.isdigit() else 0
+
+def render_results(team_id_context, **context):
+    """Renders the results page, timing the template stage."""
+    # Unknown contexts share one label so request parameters cannot grow the metrics
+    with metrics.timer('template', team_id_context if get_match_index().has_events(team_id_context) else 'other'):
+        return render_template_string(HTML_RESULTS, team_id_selection=team_id_context, descriptions=PLOT_DESCRIPTIONS, **context)
+
+@dashboard.route('/analyze', methods=['POST', 'GET'])
 def analyze():
     selected_team_id_str = request.values.get('team_id_selection')
     selected_plot_title = request.values.get('plot_title')
     selected_sector = request.values.get('sector_index')
+    try:
+        window = parse_window(request.values)
+    except ValueError as e:
+        return render_results(selected_team_id_str, plots={}, title="Invalid filter", message=str(e), descriptions_to_display={})
 
     if selected_team_id_str == 'UCLUJ':
-        processed_df = df_raw.copy()
-        processed_df = processed_df[processed_df["team.id"] != 60374]
         title = "UCLUJ - All Games"
         team_id_context = 'UCLUJ'
     else:
         selected_team_id = int(selected_team_id_str)
-        processed_df = df_raw.copy()
-        processed_df = processed_df[processed_df["team.id"] == selected_team_id] 
         team_name = next((name for tid, name in TEAMS if tid == selected_team_id), f"Team {selected_team_id}")
         title = f"Game vs {team_name}"
         team_id_context = selected_team_id_str
-    
-    if processed_df.empty:
+    if window != FULL_WINDOW:
+        title = f"{title} ({describe_window(window)})"
+
+    calculations = get_window_calculations(team_id_context, window)
+    if calculations is None:
         message = "No data available for the selected game. Please go back and try again."
         # Pass an empty descriptions_to_display dictionary to avoid a KeyError
-        return render_template_string(HTML_RESULTS, plots={}, title=title, message=message, team_id_selection=team_id_context, descriptions=PLOT_DESCRIPTIONS, descriptions_to_display={})
+        return render_results(team_id_context, plots={}, title=title, message=message, descriptions_to_display={})
 
-    processed_df['type.secondary'] = processed_df['type.secondary'].apply(lambda x: ast.literal_eval(x) if isinstance(x, str) else x)
-    
-    cache_key = team_id_context
-    if cache_key not in calculation_cache:
-        calculation_cache[cache_key] = run_all_calculations(processed_df)
+    plot_titles = list(PLOT_TITLES)
 
-    plot_titles = ['Moving-Ball Actions ( Pass actions ) Heatmap', 'Shot Heatmap', 'Goal Heatmap', 'Move Probability', 'Shot Probability', 'Goal Probability', 'Transition Matrix']
-    plot_titles.extend([f'xT Matrix after {i+1} Moves' for i in range(10)])
-    
     if not selected_plot_title:
         selected_plot_title = plot_titles[0]
     
     plots_to_display = {}
     descriptions_to_display = {}
     
+    # Images are referenced by URL and served (and cached) by plot_image()
     if selected_plot_title == 'Transition Matrix':
-        sector_index = int(selected_sector) if selected_sector and selected_sector.isdigit() else 0
+        sector_index = parse_sector(selected_sector)
         
-        transition_matrices_array = calculation_cache[cache_key].get('transition_matrices_array')
+        transition_matrices_array = calculations.get('transition_matrices_array')
         if transition_matrices_array is not None:
-            plot_url, plot_title_result = generate_transition_matrix_plot(transition_matrices_array, sector_index, (16, 12))
-            plots_to_display[plot_title_result] = plot_url
+            valid_sector = 0 <= sector_index < transition_matrices_array.shape[0]
+            plot_title_result = f"Transition Probabilities from Sector {sector_index}" if valid_sector else "Invalid Sector"
+            plots_to_display[plot_title_result] = url_for('.plot_image', context=team_id_context, plot=selected_plot_title,
+                                                          sector_index=sector_index, **window_parameters(window))
             # Use the static key "Transition Matrix" to fetch the description
             descriptions_to_display[plot_title_result] = 'Transition Matrix'
         else:
             message = "Transition matrices not found. Cannot generate plot."
-            return render_template_string(HTML_RESULTS, plots={}, title=title, message=message, team_id_selection=team_id_context, descriptions=PLOT_DESCRIPTIONS, descriptions_to_display={})
+            return render_results(team_id_context, plots={}, title=title, message=message, descriptions_to_display={})
     else:
-        plot_url, plot_title_result = generate_specific_plot(calculation_cache[cache_key], selected_plot_title, processed_df)
-        plots_to_display[plot_title_result] = plot_url
+        plot_title_result = selected_plot_title if selected_plot_title in plot_titles else "Plot Not Found"
+        plots_to_display[plot_title_result] = url_for('.plot_image', context=team_id_context, plot=selected_plot_title,
+                                                      **window_parameters(window))
         # Use the dynamic title as the key to fetch the description
         descriptions_to_display[plot_title_result] = plot_title_result
     
-    return render_template_string(
-        HTML_RESULTS,
+    return render_results(
+        team_id_context,
         plots=plots_to_display,
         title=title,
         plot_titles=plot_titles,
         selected_plot_title=selected_plot_title,
-        team_id_selection=team_id_context,
         selected_sector=selected_sector,
-        descriptions=PLOT_DESCRIPTIONS,
-        descriptions_to_display=descriptions_to_display
+        descriptions_to_display=descriptions_to_display,
+        window=window,
+        periods=PERIODS
     )
 
+@dashboard.route('/plot/<context>/<path:plot>')
+def plot_image(context, plot):
+    """
+    Serves a rendered plot as PNG, rendering it only on an image cache miss.
+    """
+    try:
+        window = parse_window(request.args)
+    except ValueError as e:
+        return Response(str(e), status=400, mimetype='text/plain')
+    if not get_match_index().has_events(context):
+        return Response("No data available for the selected game.", status=404, mimetype='text/plain')
+    sector_index = parse_sector(request.args.get('sector_index')) if plot == 'Transition Matrix' else None
+    # The key carries the counts version, so images of an outdated context are never served
+    cache_key = (context, context_version(context), plot, sector_index, window)
+
+    entry = image_cache.get(cache_key)
+    metrics.cache_result('image', context, entry is not None)
+    if entry is None:
+        calculations = get_window_calculations(context, window)
+        if calculations is None:
+            return Response("No data available for the selected window.", status=404, mimetype='text/plain')
+        if sector_index is not None and calculations.get('transition_matrices_array') is None:
+            return Response("Transition matrices not found.", status=404, mimetype='text/plain')
+        league = get_league_average(window) if plot in LEAGUE_PLOTS else None
+        # Bands are resampled from the whole season of a context
+        bands = get_bootstrap_bands(context) if plot in BOOTSTRAP_PLOTS and window == FULL_WINDOW else None
+        with metrics.timer('render', context):
+            png_bytes = render_plot(calculations, plot, sector_index, league, bands)
+        entry = image_cache.put(cache_key, png_bytes)
+
+    png_bytes, etag = entry
+    response = Response(png_bytes, mimetype='image/png')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = 3600
+    return response.make_conditional(request)
+
+@dashboard.route('/api/<context>/grids')
+def grid_index(context):
+    """Lists the binned statistics available for a team context, optionally within a match/time window."""
+    try:
+        window = parse_window(request.args)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    calculations = get_window_calculations(context, window)
+    if calculations is None:
+        return jsonify(error="No data available for the selected game."), 404
+    return jsonify(context=context, version=context_version(context), window=window_parameters(window),
+                   formats=GRID_FORMATS, grids=describe_grids(grid_arrays(calculations)))
+
+@dashboard.route('/api/<context>/grids/<name>')
+def grid_data(context, name):
+    """
+    Returns one binned statistic (counts, probabilities, xT iterates or the full transition tensor)
+    so the client can render it itself. ?format= selects json (gzip), npy or f32; the window
+    parameters of /analyze restrict the matches and match time.
+    """
+    fmt = request.args.get('format', 'json')
+    if fmt not in GRID_FORMATS:
+        return jsonify(error=f"Unknown format '{fmt}'", formats=GRID_FORMATS), 400
+    try:
+        window = parse_window(request.args)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    calculations = get_window_calculations(context, window)
+    if calculations is None:
+        return jsonify(error="No data available for the selected game."), 404
+    arrays = grid_arrays(calculations)
+    if name not in arrays:
+        return jsonify(error=f"Unknown grid '{name}'", grids=list(arrays)), 404
+
+    gzip_json = 'gzip' in request.headers.get('Accept-Encoding', '')
+    body, mimetype, headers = encode_grid(arrays[name], fmt, gzip_json=gzip_json)
+    response = Response(body, mimetype=mimetype, headers=headers)
+    # Grids only change when a match of this context is added
+    window_tag = '-'.join(f"{key}{value}" for key, value in window_parameters(window).items())
+    response.set_etag(f"{context_version(context)}-{window_tag}-{name}-{fmt}-{int(gzip_json)}")
+    response.cache_control.public = True
+    response.cache_control.max_age = 3600
+    response.vary.add('Accept-Encoding')
+    return response.make_conditional(request)
+
+def parse_leaderboard_request():
+    by = request.args.get('by', 'player')
+    limit = request.args.get('limit', '50')
+    if by not in LEADERBOARD_GROUPS:
+        raise ValueError(f"Unknown grouping '{by}', expected one of {list(LEADERBOARD_GROUPS)}")
+    if not limit.isdigit():
+        raise ValueError("'limit' must be a non-negative integer")
+    return by, int(limit)
+
+@dashboard.route('/players')
+def players():
+    """
+    Renders the xT leaderboard of a context: the threat added by each player's passes and carries
+    (or per match, player and match, or possession).
+    """
+    team_id_context = request.args.get('team_id_selection', 'UCLUJ')
+    team_name = next((name for tid, name in TEAMS if str(tid) == team_id_context), None)
+    title = "UCLUJ - All Games" if team_id_context == 'UCLUJ' else f"Game vs {team_name or 'Team ' + team_id_context}"
+    page = dict(team_id_selection=team_id_context, title=title, groups=list(LEADERBOARD_GROUPS))
+    try:
+        by, limit = parse_leaderboard_request()
+    except ValueError as e:
+        return render_template_string(HTML_LEADERBOARD, rows=[], by=None, message=str(e), **page)
+
+    scored = get_scored_actions(team_id_context)
+    if scored is None or scored.empty:
+        message = "No xT model available for the selected game. Please go back and try again."
+        return render_template_string(HTML_LEADERBOARD, rows=[], by=by, message=message, **page)
+    board = leaderboard(scored, by, limit)
+    return render_template_string(HTML_LEADERBOARD, rows=board.to_dict('records'), columns=list(board.columns), by=by, **page)
+
+@dashboard.route('/api/<context>/actions')
+def action_leaderboard(context):
+    """
+    Returns the xT leaderboard of a context as JSON. ?by= selects player, match,
+    player_match or possession; ?limit= the number of rows (0 for all).
+    """
+    try:
+        by, limit = parse_leaderboard_request()
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    scored = get_scored_actions(context)
+    if scored is None:
+        return jsonify(error="No xT model available for the selected game."), 404
+    board = leaderboard(scored, by, limit)
+    # Ids come back as numbers, names as strings
+    rows = json.loads(board.to_json(orient='records'))
+    return jsonify(context=context, version=context_version(context), by=by, actions=len(scored), rows=rows)
+
+@dashboard.route('/api/<context>/possessions')
+def possession_metrics(context):
+    """
+    Returns the possession metrics of a context as JSON: possessions, chains ending in a shot
+    or goal, mean length, duration and xT gained, plus the most common sector paths that end
+    a possession. ?path_length= sets the sectors per path, ?limit= the number of paths and
+    ?shots_only=1 counts only the chains that end in a shot.
+    """
+    path_length = request.args.get('path_length', '3')
+    limit = request.args.get('limit', '20')
+    if not path_length.isdigit() or not 1 <= int(path_length) <= 6:
+        return jsonify(error="'path_length' must be an integer between 1 and 6"), 400
+    if not limit.isdigit():
+        return jsonify(error="'limit' must be a non-negative integer"), 400
+    chains, xT_final = get_possession_chains(context)
+    if chains is None:
+        return jsonify(error="No xT model available for the selected game."), 404
+    summary = {name: values[0].item() for name, values in chains.summary(xT_final).items()}
+    # NaN (e.g. no durations in the data) is not valid JSON
+    summary = {name: None if value != value else value for name, value in summary.items()}
+    paths = chains.common_paths(int(path_length), request.args.get('shots_only') == '1', int(limit))
+    return jsonify(context=context, version=context_version(context), summary=summary, paths=paths)
+
+@dashboard.route('/metrics')
+def metrics_endpoint():
+    """Exposes stage latencies and cache hit/miss counters in the Prometheus text format."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# --- PER-REQUEST PROFILING ---
+# Opt in with ?profile=1 or an "X-Profile: 1" header; the stages timed while serving the
+# request come back in a Server-Timing header (shown by the browser devtools).
+def start_profiling():
+    if request.args.get('profile') == '1' or request.headers.get('X-Profile') == '1':
+        g.profile_start = time.perf_counter()
+        metrics.start_profile()
+
+def finish_profiling(response):
+    server_timing = metrics.finish_profile()
+    if server_timing is not None and 'profile_start' in g:
+        total = (time.perf_counter() - g.profile_start) * 1000
+        response.headers['Server-Timing'] = ', '.join(filter(None, [server_timing, f"total;dur={total:.2f}"]))
+    return response
+
+@dashboard.route('/matches', methods=['POST'])
+def append_matches():
+    """
+    Appends the events of new matches, posted as a CSV in the raw export format, and
+    invalidates only the contexts whose counts changed. Disabled unless FRF_ADMIN_TOKEN is
+    set; the token is expected in the X-Admin-Token header.
+    """
+    token = os.environ.get('FRF_ADMIN_TOKEN')
+    if not token or not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token):
+        return jsonify(error="Appending matches is not allowed."), 403
+    import pandas as pd
+    from event_store import compact_events
+
+    try:
+        events = pd.read_csv(io.BytesIO(request.get_data()))
+    except (ValueError, pd.errors.ParserError) as e:
+        return jsonify(error=f"Could not read the CSV: {e}"), 400
+    missing = [c for c in ['matchId', 'team.id', 'type.primary', 'type.secondary', 'location.x', 'location.y'] if c not in events]
+    if events.empty or missing:
+        return jsonify(error="No events or missing columns.", missing=missing), 400
+
+    events = compact_events(events)
+    try:
+        changed = append_match_events(events)
+    except ValueError as e:
+        # Matches are append-only; a match that is already indexed is rejected as a whole
+        return jsonify(error=str(e)), 409
+    return jsonify(appended=sorted(int(m) for m in events['matchId'].unique()), invalidated=sorted(changed))
+
+@dashboard.route('/warmup', methods=['POST'])
+def start_warmup():
+    """Schedules the background computation of every team context."""
+    warmup.warm(ALL_CONTEXTS)
+    return warmup_status()
+
+@dashboard.route('/warmup/status')
+def warmup_status():
+    """Reports which team contexts are ready to be served from the cache."""
+    states = warmup.status(ALL_CONTEXTS)
+    return jsonify(ready=all(state == 'ready' for state in states.values()), contexts=states)
+
+def create_app(warm=False):
+    """
+    Builds the dashboard's Flask app. Nothing is loaded here: the dataset is read on the first
+    request that needs it (see dashboard_core.get_match_index). With warm=True every team
+    context is precomputed in the background right away.
+    """
+    app = Flask(__name__)
+    app.register_blueprint(dashboard)
+    app.before_request(start_profiling)
+    app.after_request(finish_profiling)
+    if warm:
+        warmup.warm(ALL_CONTEXTS)
+    return app
+
+# Module-level instance for `flask run` and WSGI servers
+app = create_app()
+
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    # With the debug reloader only the serving child process precomputes the contexts
+    create_app(warm=os.environ.get('WERKZEUG_RUN_MAIN') == 'true').run(debug=True)
@@ -0,0 +1,112 @@
+import argparse
+import sys
+
+import numpy as np
+
+from transition_counts import sector_index
+
+# Event columns needed to value actions and attribute them to players, matches and possessions
+ACTION_COLUMNS = ['matchId', 'team.id', 'player.id', 'player.name', 'possession.id', 'type.primary',
+                  'location.x', 'location.y', 'pass.accurate', 'pass.endLocation.x', 'pass.endLocation.y',
+                  'carry.endLocation.x', 'carry.endLocation.y']
+
+# Leaderboard groupings and the columns that identify a group
+LEADERBOARD_GROUPS = {
+    'player': ['player.id'],
+    'match': ['matchId'],
+    'player_match': ['player.id', 'matchId'],
+    'possession': ['matchId', 'possession.id'],
+}
+
+
+def xt_by_sector(xT_final):
+    """
+    Flattens the final xT grid of run_all_calculations (top of the pitch in the first row)
+    into one value per sector index of transition_counts.sector_index (row 0 at the bottom).
+    """
+    return np.flipud(np.asarray(xT_final, dtype=float)).reshape(-1)
+
+
+def score_actions(events, xT_final, bins=(16, 12)):
+    """
+    Values every accurate pass and every carry as xT(end sector) - xT(start sector).
+
+    All locations are binned in one vectorized pass and the xT values are looked up with a
+    single gather. Actions that start or end off the pitch are left out. Returns one row per
+    action with the id columns that are present, 'action' ('pass' or 'carry'), the start and
+    end sectors and 'xT_added'.
+    """
+    is_pass = ((events['type.primary'] == 'pass') & (events['pass.accurate'] == True)).to_numpy()
+    end_x = events['pass.endLocation.x'].to_numpy(dtype=float)
+    end_y = events['pass.endLocation.y'].to_numpy(dtype=float)
+    is_carry = np.zeros(len(events), dtype=bool)
+    if 'carry.endLocation.x' in events:
+        # A carry is any other event with a carry end location
+        is_carry = ~is_pass & events['carry.endLocation.x'].notna().to_numpy()
+        end_x = np.where(is_carry, events['carry.endLocation.x'].to_numpy(dtype=float), end_x)
+        end_y = np.where(is_carry, events['carry.endLocation.y'].to_numpy(dtype=float), end_y)
+
+    start = sector_index(events['location.x'], events['location.y'], bins)
+    end = sector_index(end_x, end_y, bins)
+    valued = (is_pass | is_carry) & (start >= 0) & (end >= 0)
+
+    xt = xt_by_sector(xT_final)
+    id_columns = [c for c in ['matchId', 'team.id', 'player.id', 'player.name', 'possession.id'] if c in events]
+    scored = events.loc[valued, id_columns].reset_index(drop=True)
+    scored['action'] = np.where(is_pass[valued], 'pass', 'carry')
+    scored['start_sector'] = start[valued]
+    scored['end_sector'] = end[valued]
+    scored['xT_added'] = xt[end[valued]] - xt[start[valued]]
+    return scored
+
+
+def leaderboard(scored, by='player', limit=None):
+    """
+    Sums the xT added by the scored actions per group of LEADERBOARD_GROUPS, best first.
+    Player boards also carry the player's name and the number of matches played.
+    """
+    if by not in LEADERBOARD_GROUPS:
+        raise ValueError(f"Unknown leaderboard '{by}', expected one of {list(LEADERBOARD_GROUPS)}")
+    keys = [c for c in LEADERBOARD_GROUPS[by] if c in scored]
+    if len(keys) < len(LEADERBOARD_GROUPS[by]):
+        raise ValueError(f"The events have no {LEADERBOARD_GROUPS[by]} columns")
+
+    grouped = scored.assign(positive=scored['xT_added'] > 0).groupby(keys, sort=False, observed=True)
+    board = grouped.agg(xT_added=('xT_added', 'sum'), actions=('xT_added', 'size'),
+                        positive_actions=('positive', 'sum'), xT_per_action=('xT_added', 'mean'))
+    if by == 'player':
+        board['matches'] = grouped['matchId'].nunique() if 'matchId' in scored else 1
+        board['xT_per_match'] = board['xT_added'] / board['matches']
+    for column in ['player.name', 'team.id']:
+        if column in scored and column not in keys and by in ('player', 'player_match'):
+            board[column] = grouped[column].first()
+    board = board.sort_values('xT_added', ascending=False).reset_index()
+    return board.head(limit) if limit else board
+
+
+def main(argv=None):
+    from event_store import load_event_store
+    from streaming_ingest import CountAccumulator
+
+    parser = argparse.ArgumentParser(description="Value every pass and carry with xT and print a leaderboard.")
+    parser.add_argument('store', help="events Parquet store (see event_store.py)")
+    parser.add_argument('--context', default='UCLUJ', help="'UCLUJ' (every opponent) or a team id")
+    parser.add_argument('--by', default='player', choices=list(LEADERBOARD_GROUPS))
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    events = load_event_store(args.store, columns=sorted(set(ACTION_COLUMNS) | {'pass.accurate', 'shot.isGoal'}))
+    accumulator = CountAccumulator()
+    accumulator.add(events)
+    calculations = accumulator.calculations(args.context)
+    if calculations is None or calculations.get('xT_final') is None:
+        print(f"No xT model for context {args.context}")
+        return 1
+    context_events = events[events['team.id'].isin(accumulator.context_team_ids(args.context))]
+    board = leaderboard(score_actions(context_events, calculations['xT_final']), args.by, args.limit)
+    print(board.to_string(index=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
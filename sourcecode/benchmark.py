@@ -0,0 +1,232 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from mplsoccer import Pitch
+
+from event_store import load_event_store, has_secondary_type
+from match_counts import MatchCountIndex
+from pitch_renderer import get_template, rows_top_down
+from possession_chains import CHAIN_COLUMNS, PossessionChains
+from streaming_ingest import CountAccumulator
+from synthetic_events import EVENTS_PER_MATCH, write_event_store
+from transition_counts import build_transition_matrices
+from xt_model import MOVE_TYPES, batched_calculations, calculations_from_counts
+from xt_solver import solve_xt
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+BINS = (16, 12)
+# Importing the app must stay under this many seconds and must not import these libraries
+IMPORT_BUDGET = 0.5
+DEFERRED_MODULES = ['pandas', 'scipy', 'matplotlib', 'mplsoccer', 'pyarrow']
+
+# Runs inside a fresh interpreter whose working directory holds a synthetic datasets/ folder
+REQUEST_SCRIPT = """
+import json, re, resource, sys, time
+sys.path.insert(0, {source_dir!r})
+start = time.perf_counter()
+import MVP_Flask_GUI_with_transition_matrix as app_module
+import_seconds = time.perf_counter() - start
+imported = [name for name in {deferred_modules!r} if name in sys.modules]
+import dashboard_core
+start = time.perf_counter()
+client = app_module.create_app().test_client()
+startup = time.perf_counter() - start
+
+# The first load builds the match index from the store and writes its snapshot; the second reads the snapshot
+start = time.perf_counter()
+dashboard_core.get_match_index()
+load_store = time.perf_counter() - start
+dashboard_core.match_index = None
+start = time.perf_counter()
+dashboard_core.get_match_index()
+load_snapshot = time.perf_counter() - start
+
+def request_with_image(url):
+    start = time.perf_counter()
+    page = client.get(url)
+    image_url = re.search(r'<img src="([^"]+)"', page.get_data(as_text=True)).group(1).replace('&amp;', '&')
+    client.get(image_url)
+    return time.perf_counter() - start
+
+cold = request_with_image('/analyze?team_id_selection=UCLUJ')
+warm = request_with_image('/analyze?team_id_selection=UCLUJ&plot_title=Shot+Heatmap')
+app_module.warmup.shutdown()
+peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps({{'import': import_seconds, 'imported': imported, 'startup': startup, 'load_store': load_store,
+                  'load_snapshot': load_snapshot, 'cold_request': cold, 'warm_request': warm, 'peak_mb': peak_mb}}))
+"""
+
+
+def measure(stage, fn, repeat, results):
+    """
+    Times a stage (best of `repeat` runs), then runs it once more under tracemalloc for its peak
+    memory. The peak covers Python/NumPy allocations; Arrow buffers of the Parquet reader are not traced.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = fn()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    results[stage] = {'seconds': min(timings), 'peak_mb': peak / 1e6}
+    return output
+
+
+def run_scale(n_matches, repeat=3, full_request=True):
+    """
+    Benchmarks every stage of the analysis on a synthetic league dataset of `n_matches` matches.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        os.makedirs(os.path.join(workdir, 'datasets'))
+        store_path = os.path.join(workdir, 'datasets', 'Universitatea_Cluj_2024_2025_events.parquet')
+        write_event_store(store_path, n_matches)
+
+        df = measure('load', lambda: load_event_store(store_path), repeat, results)
+        # The app's startup path: per-match count tensors, then the summed counts of a context
+        def index_matches():
+            index = MatchCountIndex()
+            index.append(df)
+            return index
+
+        index = measure('match_index', index_matches, repeat, results)
+        measure('context_counts', lambda: index.context_counts('UCLUJ'), repeat, results)
+        context_df = df[df['team.id'].isin(index.context_team_ids('UCLUJ'))]
+
+        def binning():
+            pitch = Pitch(pitch_type='custom', pitch_length=105, pitch_width=68)
+            move_df = context_df.loc[has_secondary_type(context_df, MOVE_TYPES) & (context_df['pass.accurate'] == True)]
+            shot_df = context_df.loc[context_df['type.primary'] == 'shot']
+            goal_df = shot_df.loc[shot_df['shot.isGoal'] == True]
+            grids = [pitch.bin_statistic(frame['location.x'], frame['location.y'], statistic='count', bins=BINS)
+                     for frame in (move_df, shot_df, goal_df)]
+            return move_df, grids
+
+        move_df, (move_binned, shot_binned, goal_binned) = measure('binning', binning, repeat, results)
+        transition = measure('transition_tensor', lambda: build_transition_matrices(move_df, BINS), repeat, results)
+
+        move_count, shot_count, goal_count = (b['statistic'] for b in (move_binned, shot_binned, goal_binned))
+        total = move_count + shot_count
+        move_probability = np.divide(move_count, total, out=np.zeros_like(move_count), where=total != 0)
+        shot_probability = np.divide(shot_count, total, out=np.zeros_like(shot_count), where=total != 0)
+        goal_probability = np.divide(goal_count, shot_count, out=np.zeros_like(goal_count), where=shot_count != 0)
+        xT_final, _ = measure('xT', lambda: solve_xt(shot_probability, goal_probability, move_probability, transition),
+                              repeat, results)
+
+        # Every team context: one calculations_from_counts per team vs one batched call
+        accumulator = CountAccumulator(BINS)
+        accumulator.add(df)
+        all_counts = [accumulator.context_counts(context) for context in accumulator.contexts()]
+        measure('xT_all_teams', lambda: [calculations_from_counts(c['move'], c['shot'], c['goal'], c['start_counts'],
+                                                                  c['counts'], BINS) for c in all_counts],
+                repeat, results)
+        measure('xT_all_teams_batched', lambda: batched_calculations(all_counts, BINS), repeat, results)
+
+        # Possession chains of every team, then the possession metrics and common paths
+        chain_df = load_event_store(store_path, columns=CHAIN_COLUMNS)
+        chains = measure('possession_chains', lambda: PossessionChains(chain_df, BINS), repeat, results)
+        measure('possession_metrics', lambda: (chains.summary(xT_final, np.unique(chains.team_ids, return_inverse=True)[1]),
+                                               chains.common_paths(3)), repeat, results)
+
+        template = get_template(BINS)
+        statistic = rows_top_down(dict(move_binned, statistic=xT_final))
+        labels = np.array(["{0:,.2f}".format(v) for v in statistic.reshape(-1)])
+        measure('render', lambda: template.render(statistic, 'xT', cmap='Oranges', value_labels=labels), repeat, results)
+
+        if full_request:
+            script = REQUEST_SCRIPT.format(source_dir=SOURCE_DIR, deferred_modules=DEFERRED_MODULES)
+            completed = subprocess.run([sys.executable, '-c', script], cwd=workdir, capture_output=True, text=True, check=True)
+            request_stats = json.loads(completed.stdout.strip().splitlines()[-1])
+            for stage, key in [('import', 'import'), ('startup', 'startup'), ('load_store', 'load_store'),
+                               ('load_snapshot', 'load_snapshot'), ('full_request_cold', 'cold_request'),
+                               ('full_request_warm', 'warm_request')]:
+                results[stage] = {'seconds': request_stats[key], 'peak_mb': request_stats['peak_mb']}
+            results['import']['imported'] = request_stats['imported']
+    return results
+
+
+def check_import_budget(results, budget):
+    """
+    Lists every scale whose app import took longer than `budget` seconds or pulled in one of
+    DEFERRED_MODULES, which must only be imported once data is loaded or a plot is rendered.
+    """
+    problems = []
+    for scale, stages in results.items():
+        stats = stages.get('import')
+        if stats is None:
+            continue
+        if stats['seconds'] > budget:
+            problems.append(f"{scale} matches / import: {stats['seconds']:.3f}s over the {budget:.3f}s budget")
+        if stats['imported']:
+            problems.append(f"{scale} matches / import: imports {', '.join(stats['imported'])}")
+    return problems
+
+
+def compare(results, baseline, tolerance, min_delta=0.005):
+    """
+    Lists every stage that got slower than its baseline by more than `tolerance` (a fraction).
+    Differences under `min_delta` seconds are treated as timer noise.
+    """
+    regressions = []
+    for scale, stages in results.items():
+        for stage, stats in stages.items():
+            reference = baseline.get(scale, {}).get(stage)
+            if (reference and stats['seconds'] > reference['seconds'] * (1 + tolerance)
+                    and stats['seconds'] - reference['seconds'] > min_delta):
+                regressions.append(f"{scale} matches / {stage}: {stats['seconds']:.3f}s vs {reference['seconds']:.3f}s")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the xT pipeline on synthetic league-scale data.")
+    parser.add_argument('--matches', default='1,40,240',
+                        help="comma separated dataset sizes in matches (a league season is about 240)")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--baseline', default=os.path.join(SOURCE_DIR, 'benchmark_baseline.json'))
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown before a stage is flagged")
+    parser.add_argument('--skip-request', action='store_true', help="skip the Flask startup/request stages")
+    parser.add_argument('--import-budget', type=float, default=IMPORT_BUDGET,
+                        help="seconds the app import may take (default %(default)s)")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for n_matches in [int(n) for n in args.matches.split(',')]:
+        print(f"--- {n_matches} matches (~{n_matches * EVENTS_PER_MATCH:,} events) ---")
+        results[str(n_matches)] = run_scale(n_matches, args.repeat, not args.skip_request)
+        for stage, stats in results[str(n_matches)].items():
+            print(f"{stage:<20} {stats['seconds'] * 1000:>10.1f} ms {stats['peak_mb']:>10.1f} MB peak")
+
+    over_budget = check_import_budget(results, args.import_budget)
+    for line in over_budget:
+        print(f"BUDGET {line}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 1 if over_budget else 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions or over_budget else 0
+    return 1 if over_budget else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+import warnings
+
+import numpy as np
+
+# Maps that get per-sector confidence bands
+BOOTSTRAP_KEYS = ['move_probability', 'shot_probability', 'goal_probability', 'xT_final']
+RESAMPLES = 200
+CONFIDENCE = 0.9
+# Resamples solved together in one batched_calculations call
+RESAMPLES_PER_CHUNK = 25
+
+
+def unit_counts(events, unit_ids, bins=(16, 12)):
+    """
+    Count tensors of every resampling unit (a match or a possession) as the rows of one sparse
+    (n_units, n_columns) matrix: the move/shot/goal grids, the moves per start sector, the
+    event totals and the flattened (start, end) transition counts. A resample is then a
+    weighted sum of rows.
+    """
+    from scipy import sparse
+    from streaming_ingest import event_counts
+
+    n_sectors = bins[0] * bins[1]
+    _, unit = np.unique(unit_ids, axis=0, return_inverse=True)
+    unit = unit.reshape(-1)
+    n_units = int(unit.max()) + 1 if len(unit) else 0
+    counts = event_counts(events, unit, n_units, bins)
+
+    dense = np.hstack([counts['grids'].reshape(n_units, -1), counts['start_counts'], counts['totals']])
+    group, pair, count = counts['transitions']
+    transitions = sparse.csr_matrix((count, (group, pair)), shape=(n_units, n_sectors * n_sectors))
+    return sparse.hstack([sparse.csr_matrix(dense), transitions], format='csr')
+
+
+def split_columns(row, bins=(16, 12)):
+    """Inverse of the unit_counts column layout for one summed row; see summed_counts."""
+    from streaming_ingest import TOTAL_KEYS, summed_counts
+
+    n_sectors = bins[0] * bins[1]
+    grids = row[:3 * n_sectors].reshape(3, n_sectors)
+    start_counts = row[3 * n_sectors:4 * n_sectors]
+    totals = row[4 * n_sectors:4 * n_sectors + len(TOTAL_KEYS)]
+    counts = row[4 * n_sectors + len(TOTAL_KEYS):]
+    return summed_counts(grids, start_counts, counts, totals, bins)
+
+
+def resample_maps(units, weights, bins=(16, 12), xt_method='iterate'):
+    """
+    Solves a chunk of resamples. weights is (n_resamples, n_units): how often each unit was
+    drawn. The summed counts of all resamples come from one sparse product; the grids,
+    transition tensors and xT from one batched_calculations call. Returns a dict of
+    (n_resamples, ny, nx) stacks per BOOTSTRAP_KEYS, NaN where a resample has no xT model
+    (for example no goals were drawn).
+    """
+    from scipy import sparse
+    from xt_model import batched_calculations
+
+    sums = np.asarray((units.T @ sparse.csr_matrix(weights).T).T.todense()).astype(np.int64)
+    calculations = batched_calculations([split_columns(row, bins) for row in sums], bins, xt_method)
+    shape = (bins[1], bins[0])
+    return {key: np.stack([c[key] if c is not None and c.get('xT_final') is not None else np.full(shape, np.nan)
+                           for c in calculations])
+            for key in BOOTSTRAP_KEYS}
+
+
+def bootstrap_bands(units, resamples=RESAMPLES, confidence=CONFIDENCE, seed=0, map_chunks=map, bins=(16, 12),
+                    xt_method='iterate'):
+    """
+    Per-sector bootstrap confidence bands of the probability and xT maps.
+
+    Every resample draws as many units as there are, with replacement: one multinomial draw
+    of unit weights, so no events are filtered or copied. The resamples are solved in chunks;
+    `map_chunks` (for example Executor.map) spreads the chunks over processes.
+    Returns {key: {'lower', 'upper', 'width', 'std'}} grids and the number of resamples
+    that had an xT model.
+    """
+    n_units = units.shape[0]
+    rng = np.random.default_rng(seed)
+    weights = rng.multinomial(n_units, np.full(n_units, 1 / n_units), size=resamples)
+    chunks = np.array_split(weights, max(1, -(-resamples // RESAMPLES_PER_CHUNK)))
+
+    results = list(map_chunks(resample_maps, [units] * len(chunks), chunks, [bins] * len(chunks),
+                              [xt_method] * len(chunks)))
+    tail = (1 - confidence) / 2 * 100
+    bands = {}
+    for key in BOOTSTRAP_KEYS:
+        stack = np.concatenate([result[key] for result in results])
+        # Sectors without a value in any resample stay NaN
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            lower, upper = np.nanpercentile(stack, [tail, 100 - tail], axis=0)
+            bands[key] = {'lower': lower, 'upper': upper, 'width': upper - lower, 'std': np.nanstd(stack, axis=0)}
+    valid = int(np.count_nonzero(~np.isnan(np.concatenate([result['xT_final'] for result in results])[:, 0, 0])))
+    return bands, valid
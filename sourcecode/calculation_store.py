@@ -0,0 +1,113 @@
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# Bump whenever run_all_calculations changes what it produces, so old stores are not reused
+STORE_FORMAT_VERSION = 1
+
+# Binned-statistic containers of run_all_calculations that are persisted as their 'statistic' grid
+BINNED_KEYS = ['move_binned', 'shot_binned', 'goal_binned', 'move_prob_binned', 'shot_prob_binned', 'goal_prob_binned']
+# Plain arrays of run_all_calculations
+ARRAY_KEYS = ['move_probability', 'shot_probability', 'goal_probability', 'transition_matrices_array', 'xT_final']
+# Pitch geometry shared by every binned container
+GRID_KEYS = ['x_grid', 'y_grid', 'cx', 'cy']
+
+
+class CalculationStore:
+    """
+    Versioned on-disk store of run_all_calculations outputs, one .npy file per array.
+    Every process memory-maps the files read-only, so the numbers are computed once per
+    version of a context's counts and the pages are shared between all workers. Contexts
+    are keyed '<context>-<digest>'; writing a new digest removes the ones it supersedes.
+    """
+
+    def __init__(self, root, version):
+        self.root = root
+        self.version = version
+        self.directory = os.path.join(root, version)
+
+    def _context_dir(self, context):
+        return os.path.join(self.directory, str(context))
+
+    def contains(self, context):
+        return os.path.exists(os.path.join(self._context_dir(context), 'meta.json'))
+
+    def save(self, context, calculations):
+        """
+        Writes the calculations of one context. The directory is written under a temporary
+        name and renamed into place, so readers never see a half-written context.
+        """
+        if self.contains(context):
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=self.directory, prefix='.tmp-')
+        meta = {'empty': calculations is None, 'binned': [], 'arrays': [], 'xT_iterations': []}
+
+        if calculations is not None:
+            grid_source = next((calculations[k] for k in BINNED_KEYS if calculations.get(k) is not None), None)
+            if grid_source is not None:
+                for key in GRID_KEYS:
+                    np.save(os.path.join(tmp_dir, f'{key}.npy'), grid_source[key])
+            for key in BINNED_KEYS:
+                if calculations.get(key) is not None:
+                    np.save(os.path.join(tmp_dir, f'{key}.npy'), calculations[key]['statistic'])
+                    meta['binned'].append(key)
+            for key in ARRAY_KEYS:
+                if calculations.get(key) is not None:
+                    np.save(os.path.join(tmp_dir, f'{key}.npy'), calculations[key])
+                    meta['arrays'].append(key)
+            xT_matrices = calculations.get('xT_matrices')
+            if xT_matrices:
+                meta['xT_iterations'] = list(xT_matrices)
+                np.save(os.path.join(tmp_dir, 'xT_iterates.npy'),
+                        np.stack([binned['statistic'] for binned in xT_matrices.values()]))
+
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        try:
+            os.rename(tmp_dir, self._context_dir(context))
+        except OSError:
+            # Another worker stored the same context first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        self.prune(context)
+
+    def prune(self, context):
+        """
+        Removes the superseded versions of a context: every stored '<context>-<digest>' with
+        another digest. Processes that still map the old files keep reading them until they
+        unmap them; where the files cannot be removed yet (Windows), the next save retries.
+        """
+        name = str(context)
+        prefix = name.rsplit('-', 1)[0]
+        for entry in os.listdir(self.directory):
+            if entry != name and entry.rsplit('-', 1)[0] == prefix:
+                shutil.rmtree(os.path.join(self.directory, entry), ignore_errors=True)
+
+    def load(self, context):
+        """
+        Memory-maps the stored calculations of one context and rebuilds the dict returned by
+        run_all_calculations. Returns None for an empty context.
+        """
+        context_dir = self._context_dir(context)
+        with open(os.path.join(context_dir, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta['empty']:
+            return None
+
+        def mapped(name):
+            return np.load(os.path.join(context_dir, f'{name}.npy'), mmap_mode='r')
+
+        calculations = {}
+        grid = {key: mapped(key) for key in GRID_KEYS} if meta['binned'] else {}
+        for key in BINNED_KEYS:
+            calculations[key] = dict(grid, statistic=mapped(key)) if key in meta['binned'] else None
+        for key in meta['arrays']:
+            calculations[key] = mapped(key)
+        if meta['xT_iterations']:
+            iterates = mapped('xT_iterates')
+            calculations['xT_matrices'] = {title: dict(grid, statistic=iterates[i])
+                                           for i, title in enumerate(meta['xT_iterations'])}
+        return calculations
@@ -0,0 +1,580 @@
+import os
+import pickle
+import threading
+import time
+
+import numpy as np
+
+from bootstrap import CONFIDENCE
+from calculation_store import CalculationStore, STORE_FORMAT_VERSION
+from image_cache import ImageCache
+from metrics import Metrics
+from precompute import WarmupScheduler
+from window_counts import FULL_WINDOW
+
+# The dashboard's data and calculation layer, importable without Flask. Only NumPy and the
+# light modules above are imported here; pandas, SciPy, matplotlib and mplsoccer are imported
+# by the functions that need them, so importing this module (or the app) reads no data and
+# starts no heavy library.
+
+# Stage latencies and cache hit/miss counters, exported on /metrics
+metrics = Metrics()
+
+# --- DATA LOADING ---
+# The raw CSV is ingested a single time into a compact Parquet store with 'type.secondary'
+# pre-parsed into boolean flag columns; afterwards only the columns the app uses are loaded.
+# The events are reduced to count tensors per match, so appending a match never means
+# recomputing the season. Nothing is read until the match index is first needed, and a
+# snapshot of the index is reused as long as the dataset files are unchanged.
+EVENTS_CSV = "datasets/Universitatea_Cluj_2024_2025_events.csv"
+EVENTS_STORE = "datasets/Universitatea_Cluj_2024_2025_events.parquet"
+APPENDED_MATCHES_DIR = "datasets/appended_matches"
+CALCULATIONS_DIR = "datasets/calculations"
+MATCH_INDEX_SNAPSHOT = "datasets/match_index.pickle"
+
+match_index = None
+# Identity of the snapshot the loaded index matches; an append by any process replaces the file
+match_index_stamp = None
+match_index_lock = threading.Lock()
+# Calculations are persisted per context and counts digest, and memory-mapped by every worker
+calculation_store = CalculationStore(CALCULATIONS_DIR, f"v{STORE_FORMAT_VERSION}")
+
+def dataset_paths():
+    """The events store followed by the matches appended through POST /matches, in replay order."""
+    paths = [EVENTS_STORE]
+    if os.path.isdir(APPENDED_MATCHES_DIR):
+        paths += [os.path.join(APPENDED_MATCHES_DIR, name) for name in sorted(os.listdir(APPENDED_MATCHES_DIR))
+                  if name.endswith('.parquet')]
+    return paths
+
+def dataset_signature(paths):
+    """Name, size and modification time of every dataset file; a snapshot is only reused for the same files."""
+    return [(path, os.path.getsize(path), os.stat(path).st_mtime_ns) for path in paths]
+
+def read_snapshot(paths):
+    """The match index of the snapshot, or None when there is none or the dataset files changed since."""
+    if not os.path.exists(MATCH_INDEX_SNAPSHOT):
+        return None
+    with open(MATCH_INDEX_SNAPSHOT, 'rb') as f:
+        signature, data = pickle.load(f)
+    return pickle.loads(data) if signature == dataset_signature(paths) else None
+
+def write_snapshot(index, paths):
+    """Writes the match index together with the signature of the files it was built from."""
+    with open(MATCH_INDEX_SNAPSHOT + '.tmp', 'wb') as f:
+        pickle.dump((dataset_signature(paths), index.dumps()), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(MATCH_INDEX_SNAPSHOT + '.tmp', MATCH_INDEX_SNAPSHOT)
+
+def load_match_index():
+    """
+    Builds the match index from the snapshot when it is still valid, otherwise from the events
+    store (ingesting the raw CSV first if needed) and the appended matches.
+    """
+    from event_store import ingest_csv, load_event_store
+    from match_counts import MatchCountIndex
+
+    if not os.path.exists(EVENTS_STORE):
+        with metrics.timer('ingest'):
+            ingest_csv(EVENTS_CSV, EVENTS_STORE)
+    paths = dataset_paths()
+    with metrics.timer('load'):
+        index = read_snapshot(paths)
+        if index is None:
+            index = MatchCountIndex()
+            for path in paths:
+                index.append(load_event_store(path))
+            write_snapshot(index, paths)
+    return index
+
+def snapshot_stamp():
+    """Inode, size and modification time of the snapshot file; None when there is none."""
+    try:
+        stat = os.stat(MATCH_INDEX_SNAPSHOT)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+def get_match_index():
+    """
+    Returns the match count index, loading the dataset on first use. When another process
+    (another WSGI worker handling POST /matches) has replaced the snapshot since, the index is
+    reloaded and the contexts whose counts changed are invalidated, so every worker serves
+    the appended matches.
+    """
+    global match_index, match_index_stamp, event_rows
+    with match_index_lock:
+        if match_index is not None and snapshot_stamp() == match_index_stamp:
+            return match_index
+        previous = match_index
+        try:
+            match_index = load_match_index()
+        except FileNotFoundError:
+            print("Error: Dataset file not found. Please check the file path.")
+            raise
+        match_index_stamp = snapshot_stamp()
+        index = match_index
+    if previous is not None:
+        changed = {context for context in set(previous.contexts()) | set(index.contexts())
+                   if previous.context_digest(context) != index.context_digest(context)}
+        if changed:
+            with event_rows_lock:
+                event_rows = None
+            invalidate_contexts(changed)
+    return index
+
+# --- Define the list of teams and their IDs ---
+TEAMS = [
+    (11566, 'Rapid Bucureşti'),
+    (11564, 'Dinamo Bucureşti'),
+    (11565, 'FCS Bucureşti'),
+    (11611, 'CFR Cluj'),
+    (26233, 'Universitatea Craiova'),
+    (61242, 'Farul Constanţa'),
+    (11634, 'Botoşani'),
+    (11571, 'Oţelul'),
+    (11663, 'Unirea Slobozia'),
+    (11886, 'Poli Iaşi'),
+    (60392, 'AS FC Buzău'),
+    (32854, 'Sepsi'),
+    (60390, 'Petrolul 52'),
+    (30817, 'UTA Arad'),
+    (55427, 'Hermannstadt')
+]
+
+# Every context the dashboard can show: all opponents together plus each opponent
+ALL_CONTEXTS = ['UCLUJ'] + [str(team_id) for team_id, _ in TEAMS]
+
+# Bootstrap band plots: the map and the band statistic each one shows
+BOOTSTRAP_PLOTS = {
+    f'xT Lower Bound ({CONFIDENCE:.0%} CI)': ('xT_final', 'lower'),
+    f'xT Upper Bound ({CONFIDENCE:.0%} CI)': ('xT_final', 'upper'),
+    f'xT Uncertainty ({CONFIDENCE:.0%} CI Width)': ('xT_final', 'width'),
+    f'Move Probability Uncertainty ({CONFIDENCE:.0%} CI Width)': ('move_probability', 'width'),
+    f'Shot Probability Uncertainty ({CONFIDENCE:.0%} CI Width)': ('shot_probability', 'width'),
+    f'Goal Probability Uncertainty ({CONFIDENCE:.0%} CI Width)': ('goal_probability', 'width'),
+}
+
+# Teams averaged for the "vs League Average" plots, and the map each of those plots compares
+LEAGUE_CONTEXTS = [str(team_id) for team_id, _ in TEAMS]
+LEAGUE_PLOTS = {
+    'xT vs League Average': 'xT_final',
+    'Move Probability vs League Average': 'move_probability',
+    'Shot Probability vs League Average': 'shot_probability',
+    'Goal Probability vs League Average': 'goal_probability',
+}
+
+# Every plot of the results page, in dropdown order
+PLOT_TITLES = (['Moving-Ball Actions ( Pass actions ) Heatmap', 'Shot Heatmap', 'Goal Heatmap', 'Move Probability',
+                'Shot Probability', 'Goal Probability', 'Transition Matrix']
+               + [f'xT Matrix after {i+1} Moves' for i in range(10)] + list(LEAGUE_PLOTS) + list(BOOTSTRAP_PLOTS))
+
+# --- CACHING ---
+calculation_cache = {}
+# Calculations of match/time windows, keyed by (context, counts version, window); oldest dropped first
+window_cache = {}
+MAX_WINDOW_CALCULATIONS = 64
+# League average maps, keyed by (counts versions of every league team, window)
+league_cache = {}
+# Event rows for action values and bootstrap resampling, loaded on the first request that needs them
+event_rows = None
+event_rows_lock = threading.Lock()
+# Scored actions per context, keyed by the context's counts version
+scored_actions_cache = {}
+# Bootstrap confidence bands per context, keyed by the context's counts version
+bootstrap_cache = {}
+# Possession chains per context, keyed by the context's counts version
+possession_cache = {}
+# Possessions, since a per-opponent context is often a single match
+BOOTSTRAP_UNIT = ['matchId', 'possession.id']
+# Rendered PNGs, capped in memory; set spill_dir to keep evicted images on disk
+image_cache = ImageCache(max_bytes=64 * 1024 * 1024, spill_dir=None)
+
+# --- RENDERING ---
+def _pitch_renderer():
+    """Imports the pitch renderer, and with it matplotlib, on the first render."""
+    import matplotlib
+    # Non-GUI backend, so plots can be rendered from the Flask worker threads
+    matplotlib.use('Agg')
+    import pitch_renderer
+    return pitch_renderer
+
+def load_pitch_template(bins=(16, 12), figsize=(15, 8)):
+    """
+    Draws the pitch template ahead of the first render, e.g. before starting render processes,
+    which then inherit it instead of each importing mplsoccer and drawing their own.
+    """
+    _pitch_renderer().get_template(bins=bins, figsize=figsize)
+
+def generate_heatmap_plot(binned_statistic, title, cmap='Blues', show_labels=False, figsize=(15, 8), vmin=None, vmax=None):
+    """
+    Generates a heatmap plot from a pre-binned statistic and returns it as PNG bytes.
+    The pitch is drawn once per grid size by the cached template; only the cells,
+    colorbar and labels are rasterized here.
+    """
+    renderer = _pitch_renderer()
+    if binned_statistic is None:
+        return renderer.get_template(figsize=figsize).render(None, title)
+
+    statistic = renderer.rows_top_down(binned_statistic)
+    template = renderer.get_template(bins=(statistic.shape[1], statistic.shape[0]), figsize=figsize)
+    value_labels = None
+    if show_labels:
+        value_labels = np.array(["" if np.isnan(v) else "{0:,.2f}".format(v) for v in statistic.reshape(-1)])
+    return template.render(statistic, title, cmap=cmap, vmin=vmin, vmax=vmax, value_labels=value_labels)
+
+def generate_transition_matrix_plot(transition_matrices_array, sector_index, bins):
+    """
+    Generates a heatmap of a specific transition matrix for a given sector,
+    with an added number for each cell.
+    """
+    template = _pitch_renderer().get_template(bins=bins)
+
+    if sector_index < 0 or sector_index >= transition_matrices_array.shape[0]:
+        return template.render(None, f"Invalid Sector Index: {sector_index}"), "Invalid Sector"
+
+    # Rows of the transition matrix run from the bottom of the pitch; the template draws top-down
+    transition_matrix = np.asarray(transition_matrices_array[sector_index])[::-1]
+    sector_y_bin = sector_index // bins[0]
+    sector_x_bin = sector_index % bins[0]
+
+    # Sector numbers are white on dark cells and black elsewhere
+    label_colors = np.where((transition_matrix > 0.05)[..., None], 255, 0) * np.ones(3)
+
+    plot_title = f"Transition Probabilities from Sector {sector_index}"
+    png_bytes = template.render(transition_matrix, plot_title, cmap='Greens', vmin=0, vmax=np.max(transition_matrix),
+                                sector_label_colors=label_colors,
+                                highlight_cell=(bins[1] - 1 - sector_y_bin, sector_x_bin))
+    return png_bytes, plot_title
+
+
+def run_all_calculations(context_counts, xt_method='iterate'):
+    """
+    Runs all the core calculations of one context from its summed match counts:
+    the probability maps, then the xT Markov chain.
+    xt_method selects the xT solver mode ('iterate' or 'direct').
+    """
+    from xt_model import calculations_from_counts
+
+    return calculations_from_counts(context_counts['move'], context_counts['shot'], context_counts['goal'],
+                                    context_counts['start_counts'], context_counts['counts'], xt_method=xt_method)
+
+def generate_specific_plot(calculations, plot_title):
+    """
+    Generates a single plot based on a title and pre-calculated statistics.
+    """
+    binned_stat = None
+    cmap = 'Blues'
+    show_labels = False
+    
+    if plot_title == 'Moving-Ball Actions ( Pass actions ) Heatmap':
+        binned_stat = calculations.get('move_binned')
+        cmap = 'Oranges'
+    elif plot_title == 'Shot Heatmap':
+        binned_stat = calculations.get('shot_binned')
+        cmap = 'Oranges'
+        show_labels = True
+    elif plot_title == 'Goal Heatmap':
+        binned_stat = calculations.get('goal_binned')
+        cmap = 'Oranges'
+        show_labels = True
+    elif plot_title == 'Move Probability':
+        binned_stat = calculations.get('move_prob_binned')
+        cmap = 'Oranges'
+        show_labels = True
+    elif plot_title == 'Shot Probability':
+        binned_stat = calculations.get('shot_prob_binned')
+        cmap = 'Oranges'
+        show_labels = True
+    elif plot_title == 'Goal Probability':
+        binned_stat = calculations.get('goal_prob_binned')
+        cmap = 'Oranges'
+        show_labels = True
+    elif 'xT Matrix after' in plot_title:
+        xT_matrices = calculations.get('xT_matrices', {})
+        binned_stat = xT_matrices.get(plot_title)
+        cmap = 'Oranges'
+        show_labels = True
+    else:
+        title = "Plot Not Found"
+        return generate_heatmap_plot(None, title), title
+
+    return generate_heatmap_plot(binned_stat, plot_title, cmap=cmap, show_labels=show_labels), plot_title
+
+def generate_bootstrap_plot(calculations, bands, plot_title):
+    """
+    Generates a heatmap of one bootstrap band statistic: the lower or upper bound of a map,
+    or the width of its confidence interval.
+    """
+    if bands is None:
+        title = "Confidence Bands Not Available"
+        return generate_heatmap_plot(None, title), title
+    key, statistic = BOOTSTRAP_PLOTS[plot_title]
+    binned_stat = dict(calculations['move_binned'], statistic=bands[key][statistic])
+    cmap = 'Purples' if statistic == 'width' else 'Oranges'
+    return generate_heatmap_plot(binned_stat, plot_title, cmap=cmap, show_labels=True), plot_title
+
+def generate_league_difference_plot(calculations, league, plot_title):
+    """
+    Generates a heatmap of a context's map minus the league average, on a diverging scale
+    centred on zero: red where the context is above the league, blue where it is below.
+    """
+    key = LEAGUE_PLOTS[plot_title]
+    if league is None or calculations.get(key) is None:
+        title = "League Average Not Available"
+        return generate_heatmap_plot(None, title), title
+    difference = np.asarray(calculations[key]) - league[key]
+    limit = float(np.max(np.abs(difference)))
+    binned_stat = dict(calculations['move_binned'], statistic=difference)
+    return generate_heatmap_plot(binned_stat, plot_title, cmap='RdBu_r', show_labels=True, vmin=-limit, vmax=limit), plot_title
+
+def render_plot(calculations, plot, sector_index=None, league=None, bands=None):
+    """
+    Renders one plot of the results page as PNG bytes: the transition matrix of sector_index,
+    a comparison with the league averages of get_league_average(), a band plot of the
+    get_bootstrap_bands() result, or one of the calculation plots.
+    """
+    if sector_index is not None:
+        return generate_transition_matrix_plot(calculations['transition_matrices_array'], sector_index, (16, 12))[0]
+    if plot in BOOTSTRAP_PLOTS:
+        return generate_bootstrap_plot(calculations, bands, plot)[0]
+    if plot in LEAGUE_PLOTS:
+        return generate_league_difference_plot(calculations, league, plot)[0]
+    return generate_specific_plot(calculations, plot)[0]
+
+# --- CALCULATIONS ---
+def context_version(team_id_context):
+    """Store key of a context's current counts; it changes only when one of its matches is added."""
+    return f"{team_id_context}-{get_match_index().context_digest(team_id_context)}"
+
+def compute_context(team_id_context, version, context_counts):
+    """
+    Runs all calculations for one team context and writes them to the calculation store,
+    unless these counts are already stored. Executed inside the warmup process pool, with
+    the counts taken when the job was submitted; the stage timings are returned to the
+    parent instead of being recorded here.
+    """
+    timings = {}
+    if not calculation_store.contains(version):
+        start = time.perf_counter()
+        calculations = None if context_counts is None else run_all_calculations(context_counts)
+        timings['run_all_calculations'] = time.perf_counter() - start
+        calculation_store.save(version, calculations)
+    else:
+        # A version stored earlier is current again (e.g. after a restart); drop the others
+        calculation_store.prune(version)
+    return version, timings
+
+def compute_contexts(team_id_contexts, arguments):
+    """
+    compute_context for several contexts in one warmup job: every context whose counts are
+    not stored yet is solved in a single vectorized call (batched_calculations). The batch
+    is timed once and reported with the first context.
+    """
+    from xt_model import batched_calculations
+
+    missing = [(version, context_counts) for version, context_counts in arguments if not calculation_store.contains(version)]
+    timings = {}
+    if missing:
+        start = time.perf_counter()
+        results = batched_calculations([context_counts for _, context_counts in missing])
+        timings[team_id_contexts[0]] = {'batched_calculations': time.perf_counter() - start}
+        for (version, _), calculations in zip(missing, results):
+            calculation_store.save(version, calculations)
+    for version, _ in arguments:
+        calculation_store.prune(version)
+    return {context: (version, timings.get(context, {})) for context, (version, _) in zip(team_id_contexts, arguments)}
+
+def load_context(team_id_context, result):
+    """
+    Records the stage timings of a computed context and memory-maps its stored calculations;
+    None when the context has no events.
+    """
+    version, timings = result
+    for stage, seconds in timings.items():
+        # A batch covers many contexts, so its timing is not attributed to one of them
+        metrics.observe(stage, seconds, 'all' if stage == 'batched_calculations' else team_id_context)
+    return calculation_store.load(version)
+
+def context_arguments(team_id_context):
+    return context_version(team_id_context), get_match_index().context_counts(team_id_context)
+
+# Computes contexts in a process pool; concurrent requests for the same context share one job,
+# and warming several contexts solves them together in one batched job
+warmup = WarmupScheduler(compute_context, calculation_cache, finalize=load_context, arguments=context_arguments,
+                         compute_batch=compute_contexts)
+
+def get_calculations(team_id_context):
+    """
+    Returns the cached calculations for a team context, computing them on a miss.
+    Returns None when the context has no events.
+    """
+    # Contexts without any events are never computed or stored
+    if not get_match_index().has_events(team_id_context):
+        return None
+    hit = team_id_context in calculation_cache
+    metrics.cache_result('calculation', team_id_context, hit)
+    if hit:
+        return calculation_cache[team_id_context]
+    with metrics.timer('calculations', team_id_context):
+        return warmup.get(team_id_context)
+
+def get_window_calculations(team_id_context, window):
+    """
+    Returns the calculations of a context restricted to a match/time window. The counts come
+    from the prefix sums of the match index, so only the probability and xT steps run here.
+    Returns None when the window holds no events.
+    """
+    if window == FULL_WINDOW:
+        return get_calculations(team_id_context)
+    if not get_match_index().has_events(team_id_context):
+        return None
+    key = (team_id_context, context_version(team_id_context), window)
+    hit = key in window_cache
+    metrics.cache_result('window', team_id_context, hit)
+    if not hit:
+        with metrics.timer('window', team_id_context):
+            counts = get_match_index().window_counts(team_id_context, window)
+            calculations = None if counts is None else run_all_calculations(counts)
+        if len(window_cache) >= MAX_WINDOW_CALCULATIONS:
+            window_cache.pop(next(iter(window_cache)), None)
+        window_cache[key] = calculations
+    return window_cache.get(key)
+
+def get_league_average(window=FULL_WINDOW):
+    """
+    Returns the league average maps within a window: the per-sector mean over every team in
+    LEAGUE_CONTEXTS, from one batched solve of all teams. Recomputed only when the counts of
+    one of the teams change.
+    """
+    from xt_model import batched_calculations, league_average
+
+    key = (tuple(context_version(context) for context in LEAGUE_CONTEXTS), window)
+    hit = key in league_cache
+    metrics.cache_result('league', 'all', hit)
+    if not hit:
+        with metrics.timer('league_average'):
+            counts = [get_match_index().context_counts(context) if window == FULL_WINDOW
+                      else get_match_index().window_counts(context, window) for context in LEAGUE_CONTEXTS]
+            average = league_average(batched_calculations(counts))
+        if len(league_cache) >= MAX_WINDOW_CALCULATIONS:
+            league_cache.pop(next(iter(league_cache)), None)
+        league_cache[key] = average
+    return league_cache.get(key)
+
+def get_event_rows():
+    """
+    Returns the event rows used to value actions, to resample possessions and to build
+    possession chains (the app columns, action_values.ACTION_COLUMNS,
+    possession_chains.CHAIN_COLUMNS and the secondary type flags), loading them from the store
+    and the appended matches on first use.
+    """
+    import pandas as pd
+    from action_values import ACTION_COLUMNS
+    from event_store import APP_COLUMNS, load_event_store
+    from possession_chains import CHAIN_COLUMNS
+
+    global event_rows
+    with event_rows_lock:
+        if event_rows is None:
+            with metrics.timer('load_events'):
+                columns = list(dict.fromkeys(APP_COLUMNS + ACTION_COLUMNS + CHAIN_COLUMNS))
+                event_rows = pd.concat([load_event_store(path, columns=columns) for path in dataset_paths()],
+                                       ignore_index=True)
+        return event_rows
+
+def get_scored_actions(team_id_context):
+    """
+    Returns every pass and carry of a context valued with the context's final xT grid, or
+    None when the context has no xT model.
+    """
+    from action_values import score_actions
+
+    calculations = get_calculations(team_id_context)
+    if calculations is None or calculations.get('xT_final') is None:
+        return None
+    version = context_version(team_id_context)
+    if version not in scored_actions_cache:
+        events = get_event_rows()
+        with metrics.timer('score_actions', team_id_context):
+            context_events = events[events['team.id'].isin(get_match_index().context_team_ids(team_id_context))]
+            scored_actions_cache[version] = score_actions(context_events, calculations['xT_final'])
+    return scored_actions_cache[version]
+
+def get_bootstrap_bands(team_id_context):
+    """
+    Returns the per-sector bootstrap confidence bands of a context (see bootstrap.py): its
+    possessions are resampled with replacement and every resample is re-solved, spread over
+    the warmup process pool. None when the context has no xT model.
+    """
+    from bootstrap import bootstrap_bands, unit_counts
+
+    calculations = get_calculations(team_id_context)
+    if calculations is None or calculations.get('xT_final') is None:
+        return None
+    version = context_version(team_id_context)
+    if version not in bootstrap_cache:
+        events = get_event_rows()
+        with metrics.timer('bootstrap', team_id_context):
+            context_events = events[events['team.id'].isin(get_match_index().context_team_ids(team_id_context))]
+            unit = [c for c in BOOTSTRAP_UNIT if c in context_events]
+            units = unit_counts(context_events, context_events[unit].to_numpy())
+            bootstrap_cache[version], _ = bootstrap_bands(units, map_chunks=warmup.map)
+    return bootstrap_cache[version]
+
+def get_possession_chains(team_id_context):
+    """
+    Returns the possession chains of a context (see possession_chains.py) and the context's
+    final xT grid, None when the context has no xT model.
+    """
+    from possession_chains import PossessionChains
+
+    calculations = get_calculations(team_id_context)
+    if calculations is None or calculations.get('xT_final') is None:
+        return None, None
+    version = context_version(team_id_context)
+    if version not in possession_cache:
+        events = get_event_rows()
+        with metrics.timer('possession_chains', team_id_context):
+            context_events = events[events['team.id'].isin(get_match_index().context_team_ids(team_id_context))]
+            possession_cache[version] = PossessionChains(context_events)
+    return possession_cache[version], calculations['xT_final']
+
+def invalidate_contexts(contexts):
+    """
+    Drops the cached calculations and images of the given contexts and re-solves them in the background.
+    """
+    warmup.invalidate(contexts)
+    # League plots of every context compare against the teams that changed
+    image_cache.discard(lambda key: key[0] in contexts or key[2] in LEAGUE_PLOTS)
+    for key in [key for key in list(window_cache) if key[0] in contexts]:
+        window_cache.pop(key, None)
+    for cache in [scored_actions_cache, bootstrap_cache, possession_cache]:
+        for version in [version for version in list(cache) if version.rsplit('-', 1)[0] in contexts]:
+            cache.pop(version, None)
+    warmup.warm(contexts)
+
+def append_match_events(events):
+    """
+    Adds the events of new matches (compacted, see event_store.compact_events): indexes them,
+    persists one Parquet file per match so a restart replays them, refreshes the snapshot and
+    invalidates only the contexts whose counts changed. Returns those contexts. Other worker
+    processes pick the new snapshot up on their next get_match_index().
+    Raises ValueError for a match that is already indexed.
+    """
+    global event_rows, match_index_stamp
+    # Picks up the snapshot of other workers first; the lock is not reentrant
+    get_match_index()
+    with match_index_lock:
+        # Another thread may have reloaded the index since, so mutate the current one
+        index = match_index
+        changed = index.append(events)
+        os.makedirs(APPENDED_MATCHES_DIR, exist_ok=True)
+        for match_id, match_events in events.groupby('matchId'):
+            match_events.to_parquet(os.path.join(APPENDED_MATCHES_DIR, f"{int(match_id)}.parquet"), index=False)
+        write_snapshot(index, dataset_paths())
+        # This process already holds the new counts
+        match_index_stamp = snapshot_stamp()
+    with event_rows_lock:
+        event_rows = None
+    invalidate_contexts(changed)
+    return changed
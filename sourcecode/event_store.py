@@ -0,0 +1,107 @@
+import ast
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Prefix of the one-boolean-column-per-type flags that replace the 'type.secondary' lists
+SECONDARY_PREFIX = 'type.secondary.'
+
+CATEGORICAL_COLUMNS = ['type.primary', 'team.name', 'opponentTeam.name', 'player.name', 'matchPeriod', 'Home_Away']
+FLOAT32_COLUMNS = ['location.x', 'location.y', 'pass.endLocation.x', 'pass.endLocation.y',
+                   'carry.endLocation.x', 'carry.endLocation.y']
+BOOL_COLUMNS = ['pass.accurate', 'shot.isGoal', 'shot.onTarget']
+
+# U Cluj's own team id; the "UCLUJ" context holds every opponent event, i.e. all other teams
+UCLUJ_TEAM_ID = 60374
+
+# Columns the Flask app reads; the secondary type flags are always loaded on top of these
+APP_COLUMNS = ['matchId', 'matchPeriod', 'minute', 'team.id', 'type.primary', 'location.x', 'location.y',
+               'pass.accurate', 'pass.endLocation.x', 'pass.endLocation.y', 'shot.isGoal']
+
+
+def parse_secondary(series):
+    """
+    Converts the string representation of the 'type.secondary' lists to actual lists.
+    """
+    return series.apply(lambda x: ast.literal_eval(x) if isinstance(x, str) else x)
+
+
+def secondary_flags(secondary_lists):
+    """
+    Expands a series of 'type.secondary' lists into one boolean column per secondary type.
+    """
+    exploded = secondary_lists.apply(lambda x: x if isinstance(x, list) else []).explode().dropna()
+    flags = pd.crosstab(exploded.index, exploded).astype(bool)
+    flags = flags.reindex(secondary_lists.index, fill_value=False)
+    flags.columns = [SECONDARY_PREFIX + str(name) for name in flags.columns]
+    return flags
+
+
+def compact_events(df):
+    """
+    Pre-parses a raw events dataframe into the compact columnar layout of the store.
+    """
+    df = df.copy()
+    flags = secondary_flags(parse_secondary(df['type.secondary']))
+    df = pd.concat([df.drop(columns=['type.secondary']), flags], axis=1)
+
+    for column in FLOAT32_COLUMNS:
+        if column in df:
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype(np.float32)
+    for column in BOOL_COLUMNS:
+        if column in df:
+            # The app only ever tests for '== True', so a missing value behaves like False
+            df[column] = df[column].map({True: True, 'True': True, 1: True}).fillna(False).astype(bool)
+    for column in CATEGORICAL_COLUMNS:
+        if column in df:
+            df[column] = df[column].astype('category')
+    return df
+
+
+def ingest_csv(csv_path, store_path):
+    """
+    One-time ingest step: reads the raw CSV export and writes the compact Parquet store.
+    """
+    df = compact_events(pd.read_csv(csv_path))
+    df.to_parquet(store_path, index=False)
+    return store_path
+
+
+def store_columns(store_path):
+    """
+    Lists the columns available in a Parquet store without reading any data.
+    """
+    import pyarrow.parquet as pq
+    return pq.read_schema(store_path).names
+
+
+def load_event_store(store_path, columns=APP_COLUMNS):
+    """
+    Loads only the requested columns (plus every secondary type flag) from the store.
+    """
+    available = store_columns(store_path)
+    wanted = [c for c in columns if c in available] + [c for c in available if c.startswith(SECONDARY_PREFIX)]
+    return pd.read_parquet(store_path, columns=wanted)
+
+
+def has_secondary_type(dataframe, types):
+    """
+    Vectorized test for rows tagged with any of the given secondary types.
+    Falls back to the list-based check for dataframes that still carry 'type.secondary' lists.
+    """
+    if 'type.secondary' in dataframe.columns:
+        return dataframe['type.secondary'].apply(lambda x: isinstance(x, list) and any(item in x for item in types))
+    flag_columns = [SECONDARY_PREFIX + t for t in types if SECONDARY_PREFIX + t in dataframe.columns]
+    if not flag_columns:
+        return pd.Series(False, index=dataframe.index)
+    return dataframe[flag_columns].any(axis=1)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print("Usage: python event_store.py <events.csv> <events.parquet>")
+        sys.exit(1)
+    ingest_csv(sys.argv[1], sys.argv[2])
+    print(f"Wrote {sys.argv[2]} ({os.path.getsize(sys.argv[2]) / 1e6:.1f} MB)")
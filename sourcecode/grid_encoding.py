@@ -0,0 +1,62 @@
+import gzip
+import io
+import json
+
+import numpy as np
+
+# Encodings supported by the grid API
+GRID_FORMATS = ['json', 'npy', 'f32']
+
+
+def grid_arrays(calculations):
+    """
+    Collects the binned statistics of run_all_calculations as plain arrays, keyed by API name.
+    Missing statistics (for example no goals in a context) are left out.
+    """
+    arrays = {}
+    for name, key in [('move_count', 'move_binned'), ('shot_count', 'shot_binned'), ('goal_count', 'goal_binned')]:
+        if calculations.get(key) is not None:
+            arrays[name] = calculations[key]['statistic']
+    for name in ['move_probability', 'shot_probability', 'goal_probability', 'xT_final']:
+        if calculations.get(name) is not None:
+            arrays[name] = calculations[name]
+    if calculations.get('xT_matrices'):
+        arrays['xT_iterates'] = np.stack([binned['statistic'] for binned in calculations['xT_matrices'].values()])
+    if calculations.get('transition_matrices_array') is not None:
+        arrays['transition_tensor'] = calculations['transition_matrices_array']
+    return arrays
+
+
+def describe_grids(arrays):
+    """
+    Shape and dtype of every available grid, so a client knows what to fetch.
+    """
+    return {name: {'shape': list(array.shape), 'dtype': str(array.dtype)} for name, array in arrays.items()}
+
+
+def encode_grid(array, fmt='json', gzip_json=True):
+    """
+    Encodes one grid and returns (body, mimetype, extra headers).
+
+    'json' is {"shape": [...], "data": [...]} rounded to 6 decimals, gzip-compressed when
+    `gzip_json` is set; 'npy' is a NumPy .npy file; 'f32' is raw little-endian float32
+    values in C order, with the shape in the X-Grid-Shape header.
+    """
+    array = np.asarray(array)
+    shape_header = ','.join(str(n) for n in array.shape)
+    if fmt == 'json':
+        values = np.round(array.astype(np.float64), 6).tolist()
+        body = json.dumps({'shape': list(array.shape), 'data': values}, separators=(',', ':')).encode('utf-8')
+        headers = {'X-Grid-Shape': shape_header}
+        if gzip_json:
+            body = gzip.compress(body)
+            headers['Content-Encoding'] = 'gzip'
+        return body, 'application/json', headers
+    if fmt == 'npy':
+        buf = io.BytesIO()
+        np.save(buf, np.ascontiguousarray(array))
+        return buf.getvalue(), 'application/octet-stream', {'X-Grid-Shape': shape_header}
+    if fmt == 'f32':
+        body = np.ascontiguousarray(array, dtype='<f4').tobytes()
+        return body, 'application/octet-stream', {'X-Grid-Shape': shape_header, 'X-Grid-Dtype': 'float32'}
+    raise ValueError(f"Unknown grid format: {fmt}")
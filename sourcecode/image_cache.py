@@ -0,0 +1,92 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+class ImageCache:
+    """
+    Bounded LRU cache of rendered PNG bytes keyed by (team context, counts version, plot title,
+    sector index, window).
+    Entries are evicted least-recently-used first once `max_bytes` is exceeded; when a
+    `spill_dir` is given, evicted images are written there and read back on the next miss.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, spill_dir=None):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._spilled = set()
+        self._lock = threading.Lock()
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    @staticmethod
+    def etag_for(png_bytes):
+        return hashlib.sha1(png_bytes).hexdigest()
+
+    def _spill_path(self, key):
+        return os.path.join(self.spill_dir, hashlib.sha1(repr(key).encode('utf-8')).hexdigest() + '.png')
+
+    def get(self, key):
+        """
+        Returns (png_bytes, etag) for a cached image, or None on a miss.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        if self.spill_dir and os.path.exists(self._spill_path(key)):
+            with open(self._spill_path(key), 'rb') as f:
+                png_bytes = f.read()
+            return self.put(key, png_bytes)
+        return None
+
+    def put(self, key, png_bytes):
+        """
+        Stores an image and returns its (png_bytes, etag) entry.
+        """
+        entry = (png_bytes, self.etag_for(png_bytes))
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= len(self._entries.pop(key)[0])
+            self._entries[key] = entry
+            self.current_bytes += len(png_bytes)
+
+            evicted = []
+            while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+                old_key, (old_bytes, _) = self._entries.popitem(last=False)
+                self.current_bytes -= len(old_bytes)
+                evicted.append((old_key, old_bytes))
+
+        if self.spill_dir:
+            for old_key, old_bytes in evicted:
+                with open(self._spill_path(old_key), 'wb') as f:
+                    f.write(old_bytes)
+                with self._lock:
+                    self._spilled.add(old_key)
+        return entry
+
+    def discard(self, predicate):
+        """
+        Removes every image whose key matches `predicate(key)`, including spilled copies.
+        Returns the number of images removed.
+        """
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                self.current_bytes -= len(self._entries.pop(key)[0])
+            spilled = [key for key in self._spilled if predicate(key)]
+            self._spilled.difference_update(spilled)
+
+        for key in spilled:
+            try:
+                os.remove(self._spill_path(key))
+            except FileNotFoundError:
+                pass
+        return len(keys) + len(spilled)
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,149 @@
+import hashlib
+import pickle
+import threading
+
+import numpy as np
+
+from event_store import UCLUJ_TEAM_ID
+from streaming_ingest import CountAccumulator, event_counts, summed_counts
+from window_counts import PrefixCounts, time_buckets
+
+# Window tables kept at once; the one of a season-long context holds matches x time buckets grids
+MAX_WINDOW_TABLES = 4
+
+
+def split_counts(counts, start, stop):
+    """
+    The groups start..stop-1 of an event_counts() result, renumbered from zero.
+    """
+    group, pair, count = counts['transitions']
+    first, last = np.searchsorted(group, [start, stop])
+    return {'grids': counts['grids'][start:stop], 'start_counts': counts['start_counts'][start:stop],
+            'totals': counts['totals'][start:stop],
+            'transitions': (group[first:last] - start, pair[first:last], count[first:last])}
+
+
+class MatchCountIndex:
+    """
+    Append-only count tensors per match: for every (match, team, time bucket) the
+    move/shot/goal sector grids and the non-zero (start sector, end sector) counts, plus
+    running per-team totals. Adding a match only adds its tensors to the totals of the teams
+    that played it; the calculations of a context are then a re-normalization and xT
+    re-solve of its counts. Match and time windows are answered from per-context prefix sums.
+    """
+
+    def __init__(self, bins=(16, 12), home_team_id=UCLUJ_TEAM_ID):
+        self.bins = bins
+        self.home_team_id = home_team_id
+        self.matches = {}
+        self.totals = CountAccumulator(bins, home_team_id)
+        self._digests = {}
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Window tables are rebuilt on demand and the lock cannot be pickled
+        state = dict(self.__dict__)
+        del state['_lock']
+        state['_windows'] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def dumps(self):
+        """Pickled copy of the index, taken under the lock so a concurrent append is never half included."""
+        with self._lock:
+            return pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def append(self, events):
+        """
+        Adds the events of one or more new matches ('matchId' and 'team.id' columns plus the
+        columns used by event_counts; 'matchPeriod' and 'minute' place them in time). Returns the set of contexts whose counts changed: every
+        team that played and 'UCLUJ' when an opponent of U Cluj played.
+        Raises ValueError for a match that is already indexed.
+        """
+        match_ids = events['matchId'].to_numpy().astype(np.int64)
+        team_ids = events['team.id'].to_numpy().astype(np.int64)
+        # Groups are sorted by match, then team and time bucket, so each match is a contiguous run of groups
+        pairs, group = np.unique(np.column_stack([match_ids, team_ids, time_buckets(events)]), axis=0,
+                                 return_inverse=True)
+        new_matches = np.unique(pairs[:, 0])
+
+        with self._lock:
+            known = [int(m) for m in new_matches if int(m) in self.matches]
+            if known:
+                raise ValueError(f"Matches already indexed: {known}")
+            counts = event_counts(events, group.reshape(-1), len(pairs), self.bins)
+            bounds = np.searchsorted(pairs[:, 0], new_matches, side='left').tolist() + [len(pairs)]
+            for match_id, start, stop in zip(new_matches, bounds[:-1], bounds[1:]):
+                self.matches[int(match_id)] = {'team_ids': pairs[start:stop, 1], 'buckets': pairs[start:stop, 2],
+                                               'counts': split_counts(counts, start, stop)}
+            self.totals.add_counts(pairs[:, 1], counts)
+
+            changed = {str(team_id) for team_id in np.unique(pairs[:, 1])}
+            if (pairs[:, 1] != self.home_team_id).any():
+                changed.add('UCLUJ')
+            for context in changed:
+                self._digests.pop(context, None)
+                self._windows.pop(context, None)
+        return changed
+
+    def has_events(self, context):
+        if context != 'UCLUJ' and not str(context).isdigit():
+            return False
+        with self._lock:
+            return self.totals.event_total(context) > 0
+
+    def context_team_ids(self, context):
+        with self._lock:
+            return self.totals.context_team_ids(context)
+
+    def context_counts(self, context):
+        """Summed counts of one context, see CountAccumulator.context_counts."""
+        with self._lock:
+            return self.totals.context_counts(context)
+
+    def context_digest(self, context):
+        """
+        Fingerprint of a context's counts; it only changes when a match of that context is added.
+        """
+        with self._lock:
+            if context not in self._digests:
+                counts = self.totals.context_counts(context)
+                digest = hashlib.sha1()
+                for name in ['move', 'shot', 'goal', 'start_counts', 'counts']:
+                    value = None if counts is None else counts[name]
+                    digest.update(b'-' if value is None else np.ascontiguousarray(value).tobytes())
+                self._digests[context] = digest.hexdigest()[:16]
+            return self._digests[context]
+
+    def _window_table(self, context):
+        # Built on the first window query of a context and dropped when one of its matches is added
+        if context not in self._windows:
+            if len(self._windows) >= MAX_WINDOW_TABLES:
+                self._windows.pop(next(iter(self._windows)))
+            context_teams = self.totals.context_team_ids(context)
+            match_ids, match_groups = [], []
+            for match_id in sorted(self.matches):
+                match = self.matches[match_id]
+                keep = np.isin(match['team_ids'], context_teams)
+                if keep.any():
+                    match_ids.append(match_id)
+                    match_groups.append((match['counts'], match['buckets'], keep))
+            self._windows[context] = PrefixCounts(match_ids, match_groups, self.bins)
+        return self._windows[context]
+
+    def window_counts(self, context, window):
+        """
+        Summed counts of one context inside a match and time window (see window_counts.Window),
+        in the format of context_counts. None when the window holds no events.
+        """
+        with self._lock:
+            sums = self._window_table(context).window_sums(window)
+        return summed_counts(sums['grids'], sums['start_counts'], sums['counts'], sums['totals'], self.bins)
+
+    def contexts(self):
+        with self._lock:
+            return self.totals.contexts()
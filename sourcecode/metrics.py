@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _labels(**labels):
+    return ','.join(f'{name}="{str(value)}"' for name, value in labels.items())
+
+
+class Metrics:
+    """
+    In-process stage latency histograms and cache hit/miss counters, exported in the
+    Prometheus text format. Each WSGI worker keeps its own numbers.
+
+    When a request opts into profiling, every stage timed on that request's thread is also
+    collected into a per-request breakdown.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._histograms = {}
+        self._counters = defaultdict(int)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def observe(self, stage, seconds, context='all'):
+        """
+        Records one stage duration for a team context.
+        """
+        key = (stage, str(context))
+        with self._lock:
+            if key not in self._histograms:
+                self._histograms[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            histogram = self._histograms[key]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram['buckets'][i] += 1
+            histogram['sum'] += seconds
+            histogram['count'] += 1
+
+        breakdown = getattr(self._local, 'breakdown', None)
+        if breakdown is not None:
+            breakdown.append((stage, seconds))
+
+    @contextmanager
+    def timer(self, stage, context='all'):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, context)
+
+    def cache_result(self, cache, context, hit):
+        with self._lock:
+            self._counters[(cache, str(context), 'hit' if hit else 'miss')] += 1
+
+    def start_profile(self):
+        """
+        Starts collecting a stage breakdown for the current request thread.
+        """
+        self._local.breakdown = []
+
+    def finish_profile(self):
+        """
+        Stops collecting and returns the stage breakdown as a Server-Timing header value,
+        or None when the current request did not opt in.
+        """
+        breakdown = getattr(self._local, 'breakdown', None)
+        self._local.breakdown = None
+        if breakdown is None:
+            return None
+        return ', '.join(f'{stage};dur={seconds * 1000:.2f}' for stage, seconds in breakdown)
+
+    def render(self):
+        """
+        Returns all metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            histograms = {key: dict(value, buckets=list(value['buckets'])) for key, value in self._histograms.items()}
+            counters = dict(self._counters)
+
+        lines = ['# HELP frf_stage_duration_seconds Time spent in each stage of the analysis.',
+                 '# TYPE frf_stage_duration_seconds histogram']
+        for (stage, context), histogram in sorted(histograms.items()):
+            labels = _labels(stage=stage, context=context)
+            for bound, count in zip(self.buckets, histogram['buckets']):
+                lines.append(f'frf_stage_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'frf_stage_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram["count"]}')
+            lines.append(f'frf_stage_duration_seconds_sum{{{labels}}} {histogram["sum"]:.6f}')
+            lines.append(f'frf_stage_duration_seconds_count{{{labels}}} {histogram["count"]}')
+
+        lines += ['# HELP frf_cache_requests_total Cache lookups per cache, team context and result.',
+                  '# TYPE frf_cache_requests_total counter']
+        for (cache, context, result), count in sorted(counters.items()):
+            lines.append(f'frf_cache_requests_total{{{_labels(cache=cache, context=context, result=result)}}} {count}')
+        return '\n'.join(lines) + '\n'
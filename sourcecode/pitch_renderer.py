@@ -0,0 +1,232 @@
+import io
+import threading
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+PITCH_LENGTH = 105
+PITCH_WIDTH = 68
+DPI = 100
+
+GRID_EDGE_COLOR = np.array([128, 128, 128], dtype=np.uint8)
+TITLE_HEIGHT = 50
+COLORBAR_GAP = 25
+COLORBAR_WIDTH = 45
+COLORBAR_LABEL_WIDTH = 80
+
+
+def _points_to_pixels(points):
+    return int(round(points * DPI / 72))
+
+
+def _font(size_points):
+    from matplotlib import font_manager
+    path = font_manager.findfont(font_manager.FontProperties(family='DejaVu Sans'))
+    return ImageFont.truetype(path, _points_to_pixels(size_points))
+
+
+class PitchTemplate:
+    """
+    Pitch drawing for one grid size, rendered by mplsoccer a single time and then reused.
+    Every plot only rasterizes its heatmap cells with NumPy (one colormap lookup and one
+    gather), composites the cached pitch lines and sector numbers on top, and draws its
+    title, colorbar and cell values.
+    """
+
+    def __init__(self, bins=(16, 12), figsize=(15, 8)):
+        import matplotlib.pyplot as plt
+        from mplsoccer import Pitch
+
+        self.bins = bins
+        plt.style.use('seaborn-v0_8-whitegrid')
+        fig, ax = plt.subplots(figsize=figsize, dpi=DPI)
+        fig.patch.set_alpha(0)
+        pitch = Pitch(line_color='black', pitch_type='custom', pitch_length=PITCH_LENGTH, pitch_width=PITCH_WIDTH,
+                      line_zorder=2, pitch_color='none')
+        pitch.draw(ax=ax)
+        fig.canvas.draw()
+        rgba = np.asarray(fig.canvas.buffer_rgba()).copy()
+
+        # Crop the drawing to the pitch axes and find the pixel edges of every grid cell
+        fig_height = rgba.shape[0]
+        extent = ax.get_window_extent()
+        left, right = int(np.floor(extent.x0)), int(np.ceil(extent.x1))
+        top, bottom = fig_height - int(np.ceil(extent.y1)), fig_height - int(np.floor(extent.y0))
+        x_data = np.linspace(0, PITCH_LENGTH, bins[0] + 1)
+        y_data = np.linspace(PITCH_WIDTH, 0, bins[1] + 1)
+        x_pixels = ax.transData.transform(np.column_stack([x_data, np.zeros_like(x_data)]))[:, 0] - left
+        y_pixels = fig_height - ax.transData.transform(np.column_stack([np.zeros_like(y_data), y_data]))[:, 1] - top
+        plt.close(fig)
+
+        lines = rgba[top:bottom, left:right]
+        self.height, self.width = lines.shape[:2]
+        self.x_edges = np.round(x_pixels).astype(int)
+        self.y_edges = np.round(y_pixels).astype(int)
+
+        # Cell index of every pixel (-1 outside the pitch), rows counted from the top
+        cols = np.searchsorted(self.x_edges, np.arange(self.width), side='right') - 1
+        rows = np.searchsorted(self.y_edges, np.arange(self.height), side='right') - 1
+        cols[(cols < 0) | (cols >= bins[0])] = -1
+        rows[(rows < 0) | (rows >= bins[1])] = -1
+        self.cell_index = np.where((rows[:, None] >= 0) & (cols[None, :] >= 0), rows[:, None] * bins[0] + cols[None, :], -1)
+
+        # Grid edges drawn around the cells, two pixels wide like the mplsoccer heatmap
+        edges = np.zeros((self.height, self.width), dtype=bool)
+        pitch_rows = slice(self.y_edges[0], self.y_edges[-1] + 1)
+        pitch_cols = slice(self.x_edges[0], self.x_edges[-1] + 1)
+        for offset in (-1, 0):
+            edges[pitch_rows, np.clip(self.x_edges + offset, 0, self.width - 1)] = True
+            edges[np.clip(self.y_edges + offset, 0, self.height - 1), pitch_cols] = True
+        self.edge_pixels = np.flatnonzero(edges)
+
+        # Pitch lines are sparse, so only the pixels they cover are blended
+        alpha = lines[..., 3].reshape(-1)
+        self.line_pixels = np.flatnonzero(alpha)
+        self.line_alpha = (alpha[self.line_pixels] / 255.0)[:, None]
+        self.line_rgb = lines[..., :3].reshape(-1, 3)[self.line_pixels].astype(float)
+
+        self.cell_centers = [((self.x_edges[c] + self.x_edges[c + 1]) / 2, (self.y_edges[r] + self.y_edges[r + 1]) / 2)
+                             for r in range(bins[1]) for c in range(bins[0])]
+        self.title_font = _font(20)
+        self.label_font = _font(9)
+        self.tick_font = _font(10)
+        self._sector_layer = None
+
+    def sector_layer(self):
+        """
+        Coverage mask of the sector numbers (sector = y_bin * nx + x_bin, y_bin counted from the
+        bottom of the pitch), drawn once and recoloured per plot.
+        """
+        if self._sector_layer is None:
+            layer = Image.new('L', (self.width, self.height), 0)
+            draw = ImageDraw.Draw(layer)
+            font = _font(8)
+            nx, ny = self.bins
+            for cell, (cx, cy) in enumerate(self.cell_centers):
+                row, col = divmod(cell, nx)
+                draw.text((cx, cy), str((ny - 1 - row) * nx + col), fill=255, font=font, anchor='mm')
+            mask = np.asarray(layer).reshape(-1)
+            pixels = np.flatnonzero(mask)
+            self._sector_layer = (pixels, (mask[pixels] / 255.0)[:, None])
+        return self._sector_layer
+
+    def render(self, statistic, title, cmap='Blues', vmin=None, vmax=None, value_labels=None,
+               label_color=(0, 0, 255), sector_label_colors=None, highlight_cell=None):
+        """
+        Renders one heatmap and returns it as PNG bytes.
+
+        statistic is a (ny, nx) grid whose first row is the top of the pitch, or None for an
+        empty pitch. value_labels is an optional (ny, nx) grid of strings drawn in the cells;
+        sector_label_colors an optional (ny, nx, 3) grid of colours for the cached sector numbers.
+        """
+        import matplotlib
+
+        canvas_width = self.width + COLORBAR_GAP + COLORBAR_WIDTH + COLORBAR_LABEL_WIDTH
+        canvas = np.full((TITLE_HEIGHT + self.height, canvas_width, 3), 255, dtype=np.uint8)
+        pitch_area = np.full((self.height * self.width, 3), 255, dtype=float)
+
+        if statistic is not None:
+            statistic = np.asarray(statistic, dtype=float)
+            finite = statistic[np.isfinite(statistic)]
+            vmin = (finite.min() if finite.size else 0.0) if vmin is None else vmin
+            vmax = (finite.max() if finite.size else 0.0) if vmax is None else vmax
+            scale = (statistic - vmin) / (vmax - vmin) if vmax > vmin else np.zeros_like(statistic)
+            colormap = matplotlib.colormaps[cmap]
+            cell_colors = colormap(scale.reshape(-1), bytes=True)[:, :3].astype(float)
+            cell_colors[~np.isfinite(statistic.reshape(-1))] = 255
+            # One extra white "cell" for the pixels outside the pitch
+            palette = np.vstack([cell_colors, [255, 255, 255]])
+            pitch_area = palette[self.cell_index.reshape(-1)]
+            pitch_area[self.edge_pixels] = GRID_EDGE_COLOR
+
+        pitch_area[self.line_pixels] = pitch_area[self.line_pixels] * (1 - self.line_alpha) + self.line_rgb * self.line_alpha
+
+        if highlight_cell is not None:
+            row, col = highlight_cell
+            y0, y1 = self.y_edges[row], self.y_edges[row + 1]
+            x0, x1 = self.x_edges[col], self.x_edges[col + 1]
+            area = pitch_area.reshape(self.height, self.width, 3)
+            area[y0:y1, x0:x1] = area[y0:y1, x0:x1] * 0.5 + np.array([255, 255, 0]) * 0.5
+            border = _points_to_pixels(3) // 2
+            for ys, xs in [(slice(y0 - border, y0 + border), slice(x0 - border, x1 + border)),
+                           (slice(y1 - border, y1 + border), slice(x0 - border, x1 + border)),
+                           (slice(y0, y1), slice(x0 - border, x0 + border)),
+                           (slice(y0, y1), slice(x1 - border, x1 + border))]:
+                area[ys, xs] = area[ys, xs] * 0.5 + np.array([255, 0, 0]) * 0.5
+
+        if sector_label_colors is not None:
+            pixels, coverage = self.sector_layer()
+            colors = np.vstack([np.asarray(sector_label_colors, dtype=float).reshape(-1, 3), [0, 0, 0]])
+            text_rgb = colors[self.cell_index.reshape(-1)[pixels]]
+            pitch_area[pixels] = pitch_area[pixels] * (1 - coverage) + text_rgb * coverage
+
+        canvas[TITLE_HEIGHT:, :self.width] = pitch_area.reshape(self.height, self.width, 3).astype(np.uint8)
+
+        if statistic is not None:
+            self._draw_colorbar(canvas, colormap, vmin, vmax)
+
+        image = Image.fromarray(canvas)
+        draw = ImageDraw.Draw(image)
+        draw.text((canvas_width / 2, TITLE_HEIGHT / 2), title, fill=(0, 0, 0), font=self.title_font, anchor='mm')
+        if statistic is not None:
+            self._draw_ticks(draw, vmin, vmax)
+        if value_labels is not None:
+            for (cx, cy), text in zip(self.cell_centers, np.asarray(value_labels).reshape(-1)):
+                if text:
+                    draw.text((cx, cy + TITLE_HEIGHT), text, fill=label_color, font=self.label_font, anchor='mm')
+
+        buf = io.BytesIO()
+        image.save(buf, format='PNG', compress_level=1)
+        return buf.getvalue()
+
+    def _colorbar_box(self):
+        x0 = self.width + COLORBAR_GAP
+        return x0, TITLE_HEIGHT + self.y_edges[0], x0 + COLORBAR_WIDTH, TITLE_HEIGHT + self.y_edges[-1]
+
+    def _draw_colorbar(self, canvas, colormap, vmin, vmax):
+        x0, y0, x1, y1 = self._colorbar_box()
+        gradient = colormap(np.linspace(1, 0, y1 - y0), bytes=True)[:, :3]
+        canvas[y0:y1, x0:x1] = gradient[:, None, :]
+        canvas[[y0, y1 - 1], x0:x1] = 0
+        canvas[y0:y1, [x0, x1 - 1]] = 0
+
+    def _draw_ticks(self, draw, vmin, vmax):
+        from matplotlib.ticker import MaxNLocator
+
+        x0, y0, x1, y1 = self._colorbar_box()
+        if vmax <= vmin:
+            ticks = [vmin]
+        else:
+            ticks = [t for t in MaxNLocator(nbins=8).tick_values(vmin, vmax) if vmin <= t <= vmax]
+        step = (ticks[1] - ticks[0]) if len(ticks) > 1 else 1
+        decimals = max(0, -int(np.floor(np.log10(abs(step))))) if step else 0
+        for tick in ticks:
+            y = y1 - 1 if vmax <= vmin else y1 - 1 - (tick - vmin) / (vmax - vmin) * (y1 - y0 - 1)
+            draw.line([(x1, y), (x1 + 5, y)], fill=(0, 0, 0), width=1)
+            draw.text((x1 + 8, y), f"{tick:.{decimals}f}", fill=(0, 0, 0), font=self.tick_font, anchor='lm')
+
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def get_template(bins=(16, 12), figsize=(15, 8)):
+    """
+    Returns the cached pitch template for a grid size, building it on first use.
+    """
+    key = (tuple(bins), tuple(figsize))
+    with _templates_lock:
+        if key not in _templates:
+            _templates[key] = PitchTemplate(bins, figsize)
+        return _templates[key]
+
+
+def rows_top_down(binned_statistic):
+    """
+    Returns the statistic of a binned container with the top of the pitch in the first row,
+    whichever way its y grid runs.
+    """
+    statistic = np.asarray(binned_statistic['statistic'])
+    y_grid = np.asarray(binned_statistic['y_grid'])
+    descending = y_grid.ndim == 2 and y_grid[0, 0] >= y_grid[-1, 0] or y_grid.ndim == 1 and y_grid[0] >= y_grid[-1]
+    return statistic if descending else statistic[::-1]
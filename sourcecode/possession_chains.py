@@ -0,0 +1,209 @@
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from action_values import xt_by_sector
+from transition_counts import sector_index
+from window_counts import PERIODS
+
+# Event columns used to build possession chains; the optional ones are used when present
+CHAIN_COLUMNS = ['matchId', 'possession.id', 'team.id', 'matchPeriod', 'minute', 'second', 'type.primary',
+                 'location.x', 'location.y', 'shot.isGoal', 'possession.team.id', 'possession.duration']
+# Pads the sector paths of chains shorter than a requested path length
+NO_SECTOR = -1
+
+
+def event_time(events):
+    """
+    Time of every event for ordering inside a match: the period in PERIODS order, then
+    'minute' and 'second'. Missing parts count as zero.
+    """
+    n = len(events)
+    period = np.zeros(n)
+    if 'matchPeriod' in events:
+        period = np.maximum(pd.Categorical(events['matchPeriod'].astype(str), categories=PERIODS).codes, 0)
+    minute, second = (pd.to_numeric(events[column], errors='coerce').fillna(0).to_numpy(dtype=float)
+                      if column in events else np.zeros(n) for column in ['minute', 'second'])
+    # Minutes keep counting across periods, but stoppage time of one period overlaps the next
+    return period * 1e5 + minute * 60 + second
+
+
+class PossessionChains:
+    """
+    Every possession of a set of events as a chain: the sectors in which the team in possession
+    had the ball, in time order, with consecutive repeats collapsed. The chains are stored
+    back to back in `sectors`; chain i spans sectors[offsets[i]:offsets[i + 1]]. The per-chain
+    arrays (match_ids, possession_ids, team_ids, shots, goals, durations) line up with the chains.
+
+    The events are sorted once by match, possession and time, and every chain quantity comes
+    from the group boundaries of that order with bincount and fancy indexing; there is no
+    loop over possessions.
+    """
+
+    def __init__(self, events, bins=(16, 12)):
+        self.bins = bins
+        events = events[events['possession.id'].notna()]
+        match = events['matchId'].to_numpy(dtype=np.int64)
+        possession = events['possession.id'].to_numpy(dtype=np.int64)
+        # lexsort is stable, so events at the same time keep their row order
+        order = np.lexsort((event_time(events), possession, match))
+        match, possession = match[order], possession[order]
+        team = events['team.id'].to_numpy(dtype=np.int64)[order]
+
+        boundary = np.ones(len(order), dtype=bool)
+        boundary[1:] = (match[1:] != match[:-1]) | (possession[1:] != possession[:-1])
+        starts = np.flatnonzero(boundary)
+        chain = np.cumsum(boundary) - 1
+        n_chains = len(starts)
+
+        # The team in possession; without the column it is the team of the possession's first event
+        owner = team[starts]
+        if 'possession.team.id' in events:
+            possession_team = pd.to_numeric(events['possession.team.id'], errors='coerce').to_numpy()[order][starts]
+            owner = np.where(np.isnan(possession_team), owner, np.nan_to_num(possession_team)).astype(np.int64)
+        on_ball = team == owner[chain]
+
+        is_shot = on_ball & (events['type.primary'].to_numpy()[order] == 'shot')
+        is_goal = is_shot & (events['shot.isGoal'] == True).to_numpy()[order] if 'shot.isGoal' in events else is_shot & False
+        self.shots = np.bincount(chain[is_shot], minlength=n_chains)
+        self.goals = np.bincount(chain[is_goal], minlength=n_chains)
+
+        sector = sector_index(events['location.x'].to_numpy(dtype=float)[order],
+                              events['location.y'].to_numpy(dtype=float)[order], bins)
+        keep = on_ball & (sector >= 0)
+        kept_chain, kept_sector = chain[keep], sector[keep]
+        new_sector = np.ones(len(kept_sector), dtype=bool)
+        new_sector[1:] = (kept_sector[1:] != kept_sector[:-1]) | (kept_chain[1:] != kept_chain[:-1])
+        self.sectors = kept_sector[new_sector]
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(kept_chain[new_sector], minlength=n_chains))])
+
+        self.match_ids = match[starts]
+        self.possession_ids = possession[starts]
+        self.team_ids = owner
+        self.durations = np.full(n_chains, np.nan)
+        if 'possession.duration' in events:
+            self.durations = pd.to_numeric(events['possession.duration'], errors='coerce').to_numpy(dtype=float)[order][starts]
+
+    @property
+    def n_chains(self):
+        return len(self.offsets) - 1
+
+    @property
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    def end_sectors(self):
+        """First and last sector of every chain; NO_SECTOR for chains without a located event."""
+        lengths = self.lengths
+        last = len(self.sectors) - 1
+        first = np.where(lengths > 0, self.sectors[np.minimum(self.offsets[:-1], last)], NO_SECTOR)
+        end = np.where(lengths > 0, self.sectors[np.clip(self.offsets[1:] - 1, 0, last)], NO_SECTOR)
+        return first, end
+
+    def xt_gained(self, xT_final):
+        """
+        xT of the sector where each possession ended minus xT of the sector where it started,
+        with the final xT grid of run_all_calculations. NaN for chains without a located event.
+        """
+        xt = xt_by_sector(xT_final)
+        first, end = self.end_sectors()
+        located = first != NO_SECTOR
+        return np.where(located, xt[end] - xt[np.where(located, first, 0)], np.nan)
+
+    def final_paths(self, length):
+        """
+        The last `length` sectors of every chain as an (n_chains, length) array, left-padded
+        with NO_SECTOR for shorter chains.
+        """
+        positions = self.offsets[1:, None] - length + np.arange(length)
+        inside = positions >= self.offsets[:-1, None]
+        if len(self.sectors) == 0:
+            return np.full((self.n_chains, length), NO_SECTOR)
+        return np.where(inside, self.sectors[np.clip(positions, 0, len(self.sectors) - 1)], NO_SECTOR)
+
+    def common_paths(self, length=3, shots_only=False, limit=20):
+        """
+        The most common sequences of `length` sectors that end a possession, counted over the
+        chains with at least that many sectors (only those with a shot when shots_only). Every
+        path is encoded as one integer, so the counting is a single np.unique. Returns a list of
+        {'path', 'chains', 'shot_chains', 'goal_chains'}, most common first.
+        """
+        selected = self.lengths >= length
+        if shots_only:
+            selected &= self.shots > 0
+        paths = self.final_paths(length)[selected]
+        n_sectors = self.bins[0] * self.bins[1]
+        codes = paths @ (n_sectors ** np.arange(length - 1, -1, -1, dtype=np.int64))
+        unique, first, inverse, counts = np.unique(codes, return_index=True, return_inverse=True, return_counts=True)
+        shot_counts = np.bincount(inverse.reshape(-1), self.shots[selected] > 0, len(unique))
+        goal_counts = np.bincount(inverse.reshape(-1), self.goals[selected] > 0, len(unique))
+        top = np.argsort(-counts, kind='stable')[:limit]
+        return [{'path': paths[first[i]].tolist(), 'chains': int(counts[i]), 'shot_chains': int(shot_counts[i]),
+                 'goal_chains': int(goal_counts[i])} for i in top]
+
+    def summary(self, xT_final=None, groups=None):
+        """
+        Possession metrics per group of chains (`groups` holds a label 0..k-1 per chain; by
+        default all chains form one group): the number of possessions, of chains with a shot
+        and with a goal, the share that ends in a shot, the mean path length and duration and,
+        given the xT grid, the mean xT gained overall and by the chains that end in a shot.
+        Returns {metric: array with one value per group}.
+        """
+        if groups is None:
+            groups, n_groups = np.zeros(self.n_chains, dtype=np.int64), 1
+        else:
+            groups = np.asarray(groups)
+            n_groups = int(groups.max()) + 1 if len(groups) else 0
+
+        def mean(values, mask=True):
+            valid = mask & ~np.isnan(values)
+            n = np.bincount(groups[valid], minlength=n_groups)
+            total = np.bincount(groups[valid], values[valid], minlength=n_groups)
+            return np.divide(total, n, out=np.full(n_groups, np.nan), where=n > 0)
+
+        shot_chain = self.shots > 0
+        metrics = {'possessions': np.bincount(groups, minlength=n_groups),
+                   'shot_chains': np.bincount(groups, shot_chain, minlength=n_groups).astype(np.int64),
+                   'goal_chains': np.bincount(groups, self.goals > 0, minlength=n_groups).astype(np.int64)}
+        metrics['shot_chain_rate'] = np.divide(metrics['shot_chains'], metrics['possessions'],
+                                               out=np.full(n_groups, np.nan), where=metrics['possessions'] > 0)
+        metrics['mean_length'] = mean(self.lengths.astype(float))
+        metrics['mean_duration'] = mean(self.durations)
+        if xT_final is not None:
+            gained = self.xt_gained(xT_final)
+            metrics['mean_xT_gained'] = mean(gained)
+            metrics['mean_xT_gained_shot_chains'] = mean(gained, shot_chain)
+        return metrics
+
+
+def main(argv=None):
+    from event_store import load_event_store
+    from streaming_ingest import STREAM_COLUMNS, CountAccumulator
+
+    parser = argparse.ArgumentParser(description="Build possession chains and print possession metrics per team.")
+    parser.add_argument('store', help="events Parquet store (see event_store.py)")
+    parser.add_argument('--context', default='UCLUJ', help="'UCLUJ' (every opponent) or a team id")
+    parser.add_argument('--path-length', type=int, default=3, help="sectors per common path")
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    events = load_event_store(args.store, columns=sorted(set(CHAIN_COLUMNS) | set(STREAM_COLUMNS)))
+    accumulator = CountAccumulator()
+    accumulator.add(events)
+    calculations = accumulator.calculations(args.context)
+    xT_final = None if calculations is None else calculations.get('xT_final')
+    chains = PossessionChains(events[events['team.id'].isin(accumulator.context_team_ids(args.context))])
+
+    team_ids, groups = np.unique(chains.team_ids, return_inverse=True)
+    table = pd.DataFrame(chains.summary(xT_final, groups), index=pd.Index(team_ids, name='team.id'))
+    print(table.sort_values('shot_chain_rate', ascending=False).to_string(float_format='{:.3f}'.format))
+    print(f"\nMost common final {args.path_length}-sector paths of shot chains:")
+    for path in chains.common_paths(args.path_length, shots_only=True, limit=args.limit):
+        print(f"{' -> '.join(map(str, path['path']))}: {path['chains']} chains, {path['goal_chains']} with a goal")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,149 @@
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+
+
+class WarmupScheduler:
+    """
+    Computes team contexts in a process pool and stores the results in `cache`.
+    Every key is computed at most once at a time: a request for a key that is still
+    being computed waits for the running job instead of starting a second one.
+    `finalize(key, result)`, when given, runs in the calling process to turn what the
+    pool returned into the cached value. `arguments(key)`, when given, returns extra
+    positional arguments for `compute`, taken in the calling process when the job is submitted.
+    `compute_batch(keys, arguments)`, when given, computes several keys in one job and returns
+    a dict of their results; warm() then submits every missing key as a single batch.
+    """
+
+    def __init__(self, compute, cache, max_workers=None, finalize=None, arguments=None, compute_batch=None):
+        self.compute = compute
+        self.cache = cache
+        self.finalize = finalize
+        self.arguments = arguments
+        self.compute_batch = compute_batch
+        self.max_workers = max_workers
+        self._executor = None
+        self._futures = {}
+        # Futures of batch jobs, whose result is a dict of per-key results
+        self._batches = weakref.WeakSet()
+        self._failed = {}
+        # Re-entrant because a done callback may run immediately inside _submit
+        self._lock = threading.RLock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def _submit(self, key):
+        # Must be called with the lock held
+        future = self._futures.get(key)
+        if future is None:
+            arguments = self.arguments(key) if self.arguments is not None else ()
+            future = self._get_executor().submit(self.compute, key, *arguments)
+            future.add_done_callback(lambda f, key=key: self._store(key, f))
+            self._futures[key] = future
+            self._failed.pop(key, None)
+        return future
+
+    def _submit_batch(self, keys):
+        # Must be called with the lock held; every key shares the one future of the batch
+        arguments = [self.arguments(key) if self.arguments is not None else () for key in keys]
+        future = self._get_executor().submit(self.compute_batch, keys, arguments)
+        self._batches.add(future)
+        for key in keys:
+            self._futures[key] = future
+            self._failed.pop(key, None)
+        for key in keys:
+            future.add_done_callback(lambda f, key=key: self._store(key, f))
+
+    def _result(self, key, future):
+        return future.result()[key] if future in self._batches else future.result()
+
+    def _store(self, key, future):
+        with self._lock:
+            # Jobs dropped by invalidate() never write their (outdated) result
+            if self._futures.get(key) is not future:
+                return
+            # get() may already have finalized this result; finalize runs once per job
+            if future.exception() is None:
+                if key not in self.cache:
+                    self.cache[key] = self._finalize(key, self._result(key, future))
+            else:
+                self._failed[key] = repr(future.exception())
+            self._futures.pop(key, None)
+
+    def _finalize(self, key, result):
+        return self.finalize(key, result) if self.finalize is not None else result
+
+    def warm(self, keys):
+        """
+        Schedules every key that is neither cached nor already computing. Returns immediately.
+        """
+        with self._lock:
+            missing = [key for key in keys if key not in self.cache and key not in self._futures]
+            if self.compute_batch is not None and len(missing) > 1:
+                self._submit_batch(missing)
+                return
+            for key in missing:
+                self._submit(key)
+
+    def get(self, key):
+        """
+        Returns the result for a key, computing it (or waiting for the running job) on a miss.
+        """
+        while True:
+            if key in self.cache:
+                return self.cache[key]
+            with self._lock:
+                if key in self.cache:
+                    return self.cache[key]
+                future = self._submit(key)
+            result = self._result(key, future)
+            # The done callback may not have run yet when the future's result is available
+            with self._lock:
+                if key in self.cache:
+                    return self.cache[key]
+                if self._futures.get(key) is future:
+                    self.cache[key] = self._finalize(key, result)
+                    return self.cache[key]
+            # The key was invalidated while this job ran; compute it again
+
+    def invalidate(self, keys):
+        """
+        Drops the cached results of `keys`. Jobs still running for them are detached, so their
+        results are discarded and the next request computes the key again.
+        """
+        with self._lock:
+            for key in keys:
+                self.cache.pop(key, None)
+                self._failed.pop(key, None)
+                self._futures.pop(key, None)
+
+    def status(self, keys):
+        """
+        Readiness of each key: 'ready', 'computing', 'failed' or 'pending'.
+        """
+        with self._lock:
+            states = {}
+            for key in keys:
+                if key in self.cache:
+                    states[key] = 'ready'
+                elif key in self._futures:
+                    states[key] = 'computing'
+                elif key in self._failed:
+                    states[key] = 'failed'
+                else:
+                    states[key] = 'pending'
+            return states
+
+    def map(self, fn, *iterables):
+        """
+        Runs fn over the iterables in the scheduler's process pool, like Executor.map, for
+        work that is split across cores without being cached per key.
+        """
+        return self._get_executor().map(fn, *iterables)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,239 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import dashboard_core as core
+from window_counts import FULL_WINDOW, WINDOW_PARAMETERS, describe_window, parse_window, window_parameters
+
+# Records the inputs every exported file was rendered from, next to the files
+MANIFEST_NAME = 'manifest.json'
+TRANSITION_PLOT = 'Transition Matrix'
+N_SECTORS = 16 * 12
+# Height of the context banner above every PDF page, in pixels, and the resolution of the pages
+PDF_HEADER = 48
+PDF_DPI = 100
+
+# Calculations, league averages and bootstrap bands of the contexts being rendered, set once per worker
+_shared = None
+
+
+def slugify(text):
+    """File name friendly version of a plot title."""
+    return re.sub(r'[^0-9A-Za-z]+', '_', text).strip('_').lower()
+
+
+def context_label(context):
+    """Title of a context as shown on the dashboard."""
+    if context == 'UCLUJ':
+        return "UCLUJ - All Games"
+    team_name = next((name for team_id, name in core.TEAMS if str(team_id) == context), f"Team {context}")
+    return f"Game vs {team_name}"
+
+
+def window_suffix(window):
+    """Directory suffix of a window; empty for the full season."""
+    return ''.join(f"_{name}-{value}" for name, value in window_parameters(window).items())
+
+
+def plan_outputs(contexts, plots, sectors, window):
+    """
+    Every output file of the report as (relative path, context, plot, sector index) in page
+    order. The transition matrix expands to one file per selected sector.
+    """
+    outputs = []
+    for context in contexts:
+        directory = f"{context}{window_suffix(window)}"
+        for plot in plots:
+            if plot == TRANSITION_PLOT:
+                outputs.extend((f"{directory}/transition_matrix_sector_{sector:03d}.png", context, plot, sector)
+                               for sector in sectors)
+            else:
+                outputs.append((f"{directory}/{slugify(plot)}.png", context, plot, None))
+    return outputs
+
+
+def output_key(context, plot, window):
+    """
+    Identifies the inputs of a plot: the counts version of its context, plus those of every
+    league team for the league comparisons. A file whose key is unchanged is up to date.
+    """
+    versions = [core.context_version(context)]
+    if plot in core.LEAGUE_PLOTS:
+        versions.extend(core.context_version(team) for team in core.LEAGUE_CONTEXTS)
+    return hashlib.sha1(repr((versions, window)).encode()).hexdigest()
+
+
+def load_manifest(out_dir):
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(out_dir, manifest):
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def shared_inputs(contexts, plots, window):
+    """
+    Computes what the plots of the given contexts share, once per context: the calculations
+    (all contexts solved in one batched warmup job), the league averages and the bootstrap
+    bands, each only when a selected plot needs it.
+    """
+    if window == FULL_WINDOW:
+        core.warmup.warm(contexts)
+    calculations = {context: core.get_window_calculations(context, window) for context in contexts}
+    league = core.get_league_average(window) if any(plot in core.LEAGUE_PLOTS for plot in plots) else None
+    bands = {}
+    if window == FULL_WINDOW and any(plot in core.BOOTSTRAP_PLOTS for plot in plots):
+        bands = {context: core.get_bootstrap_bands(context) for context in contexts}
+    return {'calculations': calculations, 'league': league, 'bands': bands}
+
+
+def _init_worker(shared):
+    global _shared
+    _shared = shared
+
+
+def render_output(out_dir, path, context, plot, sector_index):
+    """Renders one output file in a pool worker; the file is replaced atomically."""
+    calculations = _shared['calculations'][context]
+    if calculations is None:
+        png_bytes = core.generate_heatmap_plot(None, "No Data Available")
+    elif sector_index is not None and calculations.get('transition_matrices_array') is None:
+        png_bytes = core.generate_heatmap_plot(None, "Transition Matrices Not Available")
+    else:
+        png_bytes = core.render_plot(calculations, plot, sector_index, _shared['league'],
+                                     _shared['bands'].get(context))
+    target = os.path.join(out_dir, path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target + '.tmp', 'wb') as f:
+        f.write(png_bytes)
+    os.replace(target + '.tmp', target)
+    return path
+
+
+def write_pdf(pdf_path, out_dir, outputs, window):
+    """
+    Assembles the rendered PNGs into one multi-page PDF, in page order, with the context
+    (and window) written above every plot. Pages are written one at a time, so a full
+    report pack never sits in memory.
+    """
+    from matplotlib.backends.backend_pdf import PdfPages
+    from matplotlib.figure import Figure
+    from matplotlib.image import imread
+
+    with PdfPages(pdf_path + '.tmp') as pdf:
+        for path, context, _, _ in outputs:
+            image = imread(os.path.join(out_dir, path))
+            height, width = image.shape[:2]
+            fig = Figure(figsize=(width / PDF_DPI, (height + PDF_HEADER) / PDF_DPI), dpi=PDF_DPI)
+            fig.figimage(image, 0, 0)
+            label = context_label(context) + (f" ({describe_window(window)})" if window != FULL_WINDOW else '')
+            fig.text(0.02, 1 - PDF_HEADER / 2 / (height + PDF_HEADER), label, fontsize=16, va='center')
+            pdf.savefig(fig, dpi=PDF_DPI)
+    os.replace(pdf_path + '.tmp', pdf_path)
+
+
+def export_report(out_dir, contexts, plots, sectors, window=FULL_WINDOW, pdf_path=None, workers=None, force=False):
+    """
+    Renders every selected plot of every context into out_dir (and optionally one PDF).
+    Files whose inputs have not changed since they were written are skipped; the shared
+    calculations are computed only for the contexts that still have stale files.
+    Returns (rendered, skipped).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = load_manifest(out_dir)
+    outputs = plan_outputs(contexts, plots, sectors, window)
+    keys = {path: output_key(context, plot, window) for path, context, plot, _ in outputs}
+    stale = [output for output in outputs
+             if force or manifest.get(output[0]) != keys[output[0]] or not os.path.exists(os.path.join(out_dir, output[0]))]
+
+    if stale:
+        stale_contexts = list(dict.fromkeys(context for _, context, _, _ in stale))
+        stale_plots = list(dict.fromkeys(plot for _, _, plot, _ in stale))
+        shared = shared_inputs(stale_contexts, stale_plots, window)
+        core.load_pitch_template()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(shared,)) as executor:
+            columns = list(zip(*stale))
+            chunksize = max(1, len(stale) // (4 * (workers or os.cpu_count() or 1)))
+            for path in executor.map(render_output, [out_dir] * len(stale), *columns, chunksize=chunksize):
+                manifest[path] = keys[path]
+        save_manifest(out_dir, manifest)
+
+    if pdf_path:
+        pdf_key = hashlib.sha1(repr([(path, keys[path]) for path, _, _, _ in outputs]).encode()).hexdigest()
+        pdf_name = os.path.abspath(pdf_path)
+        if force or stale or manifest.get(pdf_name) != pdf_key or not os.path.exists(pdf_path):
+            write_pdf(pdf_path, out_dir, outputs, window)
+            manifest[pdf_name] = pdf_key
+            save_manifest(out_dir, manifest)
+    return len(stale), len(outputs) - len(stale)
+
+
+def parse_sectors(value):
+    """'all', 'none' or a comma separated list of sector indices."""
+    if value == 'all':
+        return list(range(N_SECTORS))
+    if value == 'none':
+        return []
+    sectors = [int(sector) for sector in value.split(',')]
+    if any(not 0 <= sector < N_SECTORS for sector in sectors):
+        raise argparse.ArgumentTypeError(f"sectors must lie in [0, {N_SECTORS})")
+    return sectors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render every dashboard plot of the chosen contexts to PNG files and, optionally, one PDF.")
+    parser.add_argument('--out', default='reports', help="output directory for the PNG files and the manifest")
+    parser.add_argument('--pdf', help="also write every page into this multi-page PDF")
+    parser.add_argument('--contexts', default=','.join(core.ALL_CONTEXTS),
+                        help="comma separated contexts: 'UCLUJ' (every opponent) and/or team ids (default: all)")
+    parser.add_argument('--plots', default=None,
+                        help="comma separated plot titles (default: every plot of the results page)")
+    parser.add_argument('--sectors', type=parse_sectors, default='all',
+                        help="transition matrix sectors: 'all', 'none' or a comma separated list (default: all)")
+    parser.add_argument('--workers', type=int, default=None, help="rendering processes (default: one per core)")
+    parser.add_argument('--force', action='store_true', help="render every file, even when it is up to date")
+    for name in WINDOW_PARAMETERS:
+        parser.add_argument(f"--{name.replace('_', '-')}", dest=name, help=f"match/time window: {name}")
+    args = parser.parse_args(argv)
+
+    try:
+        window = parse_window(vars(args))
+    except ValueError as e:
+        parser.error(str(e))
+    plots = core.PLOT_TITLES if args.plots is None else [plot.strip() for plot in args.plots.split(',')]
+    unknown = [plot for plot in plots if plot not in core.PLOT_TITLES]
+    if unknown:
+        parser.error(f"unknown plots {unknown}, expected some of {core.PLOT_TITLES}")
+
+    contexts = [context.strip() for context in args.contexts.split(',')]
+    malformed = [context for context in contexts if context != 'UCLUJ' and not context.isdigit()]
+    if malformed:
+        parser.error(f"invalid contexts {malformed}, expected 'UCLUJ' or team ids")
+    without_events = [context for context in contexts if not core.get_match_index().has_events(context)]
+    if without_events:
+        parser.error(f"no events for contexts {without_events}, expected some of {core.ALL_CONTEXTS}")
+
+    start = time.perf_counter()
+    try:
+        rendered, skipped = export_report(args.out, contexts, plots, args.sectors, window,
+                                          args.pdf, args.workers, args.force)
+    finally:
+        core.warmup.shutdown()
+    print(f"Rendered {rendered} files, {skipped} up to date, in {time.perf_counter() - start:.1f}s -> {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
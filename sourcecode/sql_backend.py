@@ -0,0 +1,269 @@
+import argparse
+import io
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from event_store import UCLUJ_TEAM_ID
+from xt_model import MOVE_TYPES, calculations_from_counts
+
+SQL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                       '4_steps_project_breakdown', 'Data_Engineer_Phase', 'SQL_Queries')
+# Schema and table of the Data Engineer phase, plus the pass accuracy the move filter needs
+STRUCTURE_QUERIES = ['creating_frf_schema.sql', 'create_raw_data_table.sql', 'add_pass_accurate_column.sql']
+RAW_TABLE = 'frf_prjt.frf_raw_data_excel'
+
+# CSV export column -> frf_raw_data_excel column
+TABLE_COLUMNS = {
+    'id': 'id', 'matchId': 'matchid', 'matchPeriod': 'matchperiod', 'minute': 'mminute', 'second': 'msecond',
+    'type.primary': 'type_primary', 'type.secondary': 'type_secondary',
+    'location.x': 'location_x', 'location.y': 'location_y',
+    'team.id': 'team_id', 'team.name': 'team_name', 'opponentTeam.id': 'opponentteam_id',
+    'opponentTeam.name': 'opponentteam_name', 'player.id': 'player_id', 'player.name': 'player_name',
+    'pass.endLocation.x': 'pass_endlocation_x', 'pass.endLocation.y': 'pass_endlocation_y',
+    'shot.xg': 'shot_xg', 'shot.isGoal': 'shot_isgoal', 'shot.onTarget': 'shot_ontarget',
+    'carry.endLocation.x': 'carry_endlocation_x', 'carry.endLocation.y': 'carry_endlocation_y',
+    'possession.id': 'possession_id', 'possession.duration': 'possession_duration',
+    'possession.startLocation.x': 'possession_startlocation_x', 'possession.startLocation.y': 'possession_startlocation_y',
+    'possession.endLocation.x': 'possession_endlocation_x', 'possession.endLocation.y': 'possession_endlocation_y',
+    'competitionId': 'competitionid', 'seasonId': 'seasonid', 'Home_Away': 'home_away',
+    'pass.accurate': 'pass_accurate',
+}
+BOOL_TABLE_COLUMNS = ['shot_isgoal', 'shot_ontarget', 'pass_accurate']
+# bigint columns of create_raw_data_table.sql; pandas reads them as float64 once a value is missing
+BIGINT_TABLE_COLUMNS = ['id', 'matchid', 'mminute', 'msecond', 'team_id', 'opponentteam_id', 'player_id',
+                        'competitionid', 'seasonid']
+LOAD_COLUMNS = list(TABLE_COLUMNS.values()) + ['start_zone', 'end_zone']
+
+# Placeholder of each supported driver: psycopg2 for PostgreSQL, DuckDB as the embedded stand-in
+PLACEHOLDERS = {'postgres': '%s', 'duckdb': '?'}
+
+
+def read_sql(file_path):
+    with open(file_path, "r") as file:
+        return file.read()
+
+
+def pitch_zone(x, y):
+    """
+    Vectorized calculating_pitch_zone_assignation of the Data Engineer notebook:
+    'zone_<x // 6.25>_<y // 8.33>', None where a coordinate is missing.
+    """
+    row = np.floor_divide(np.asarray(x, dtype=float), 6.25)
+    column = np.floor_divide(np.asarray(y, dtype=float), 8.33)
+    valid = np.isfinite(row) & np.isfinite(column)
+    zones = np.full(row.shape, None, dtype=object)
+    zones[valid] = ["zone_" + str(int(r)) + "_" + str(int(c)) for r, c in zip(row[valid], column[valid])]
+    return zones
+
+
+def table_rows(events):
+    """
+    Maps a chunk of the raw CSV export onto the frf_raw_data_excel columns, including the
+    start/end zones (pass end-location, else carry end-location). The bigint columns become
+    nullable integers, so COPY never receives a '12345.0' for them.
+    """
+    rows = pd.DataFrame({column: events[source] if source in events else None
+                         for source, column in TABLE_COLUMNS.items()})
+    for column in BIGINT_TABLE_COLUMNS:
+        rows[column] = rows[column].astype('Int64')
+    for column in BOOL_TABLE_COLUMNS:
+        rows[column] = rows[column].map({True: True, 'True': True, False: False, 'False': False}).astype(object)
+    end_x = events['pass.endLocation.x'].fillna(events['carry.endLocation.x']) if 'carry.endLocation.x' in events else events['pass.endLocation.x']
+    end_y = events['pass.endLocation.y'].fillna(events['carry.endLocation.y']) if 'carry.endLocation.y' in events else events['pass.endLocation.y']
+    rows['start_zone'] = pitch_zone(events['location.x'], events['location.y'])
+    rows['end_zone'] = pitch_zone(end_x, end_y)
+    return rows[LOAD_COLUMNS]
+
+
+def bin_expression(column, edges):
+    """
+    SQL expression for the zero-based bin of `column` over the given edges, NULL outside them.
+    Bins are [edge_i, edge_i+1) with the last one closed, like scipy's binned_statistic_2d,
+    and the edges are the exact float64 values scipy uses.
+    """
+    cases = ' '.join(f"WHEN {column} < {float(edge)!r} THEN {i}" for i, edge in enumerate(edges[1:-1]))
+    return (f"(CASE WHEN {column} IS NULL OR NOT ({column} >= {float(edges[0])!r} AND {column} <= {float(edges[-1])!r}) THEN NULL "
+            f"{cases} ELSE {len(edges) - 2} END)")
+
+
+class SqlEventBackend:
+    """
+    Data access on frf_prjt.frf_raw_data_excel that aggregates inside the database: only the
+    sector count grids and the (start sector, end sector) count table come back to Python.
+    `connection` is a DB-API connection (psycopg2 or DuckDB).
+    """
+
+    def __init__(self, connection, dialect='postgres', bins=(16, 12), pitch_length=105, pitch_width=68):
+        if dialect not in PLACEHOLDERS:
+            raise ValueError(f"Unknown SQL dialect: {dialect}")
+        self.connection = connection
+        self.dialect = dialect
+        self.bins = bins
+        self.x_edges = np.linspace(0, pitch_length, bins[0] + 1)
+        self.y_edges = np.linspace(0, pitch_width, bins[1] + 1)
+
+    def _query(self, sql, params=()):
+        cursor = self.connection.cursor()
+        cursor.execute(sql.format(p=PLACEHOLDERS[self.dialect]), list(params))
+        return cursor.fetchall()
+
+    def create_tables(self):
+        """Creates the frf_prjt schema and the raw data table when they do not exist yet."""
+        cursor = self.connection.cursor()
+        for query in STRUCTURE_QUERIES:
+            cursor.execute(read_sql(os.path.join(SQL_DIR, query)))
+        self.connection.commit()
+
+    def copy_rows(self, rows):
+        """
+        Bulk-loads rows in the table layout of table_rows(): COPY FROM STDIN on PostgreSQL,
+        a single INSERT ... SELECT from the registered frame on DuckDB.
+        """
+        columns = ', '.join(rows.columns)
+        cursor = self.connection.cursor()
+        if self.dialect == 'postgres':
+            buf = io.StringIO()
+            rows.to_csv(buf, index=False, header=False)
+            buf.seek(0)
+            cursor.copy_expert(f"COPY {RAW_TABLE} ({columns}) FROM STDIN WITH (FORMAT csv)", buf)
+        else:
+            cursor.register('events_chunk', rows)
+            cursor.execute(f"INSERT INTO {RAW_TABLE} ({columns}) SELECT {columns} FROM events_chunk")
+            cursor.unregister('events_chunk')
+        self.connection.commit()
+        return len(rows)
+
+    def load_csv(self, csv_path, chunksize=200_000):
+        """
+        Streams the raw CSV export into the table chunk by chunk. Returns the number of rows loaded.
+        """
+        loaded = 0
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+            loaded += self.copy_rows(table_rows(chunk))
+        return loaded
+
+    def _context_filter(self, context):
+        # "UCLUJ" holds every opponent event, any other context is a single team id
+        if str(context) == 'UCLUJ':
+            return "team_id <> {p}", [UCLUJ_TEAM_ID]
+        return "team_id = {p}", [int(context)]
+
+    def _move_filter(self):
+        # type_secondary holds the Python list repr, e.g. "['short_or_medium_pass', 'back_pass']"
+        types = ' OR '.join(["type_secondary LIKE {p}"] * len(MOVE_TYPES))
+        return f"(pass_accurate AND ({types}))", [f"%'{name}'%" for name in MOVE_TYPES]
+
+    def sector_counts(self, context):
+        """
+        Move, shot and goal counts per sector of one context, as (bins[1], bins[0]) grids with
+        row 0 at the bottom of the pitch. A grid is None when the context has no such events at
+        all, and the result is None when the context has no events.
+        """
+        context_sql, context_params = self._context_filter(context)
+        move_sql, move_params = self._move_filter()
+        y_bin = bin_expression('location_y', self.y_edges)
+        x_bin = bin_expression('location_x', self.x_edges)
+        rows = self._query(
+            f"SELECT {y_bin} AS y_bin, {x_bin} AS x_bin, COUNT(*), "
+            f"SUM(CASE WHEN {move_sql} THEN 1 ELSE 0 END), "
+            f"SUM(CASE WHEN type_primary = 'shot' THEN 1 ELSE 0 END), "
+            f"SUM(CASE WHEN type_primary = 'shot' AND shot_isgoal THEN 1 ELSE 0 END) "
+            f"FROM {RAW_TABLE} WHERE {context_sql} GROUP BY 1, 2",
+            move_params + context_params)
+        if not rows:
+            return None
+
+        nx, ny = self.bins
+        counts = {name: np.zeros((ny, nx)) for name in ['move', 'shot', 'goal']}
+        totals = dict.fromkeys(counts, 0)
+        for y, x, _, moves, shots, goals in rows:
+            for name, value in zip(['move', 'shot', 'goal'], [moves, shots, goals]):
+                # Events off the pitch count towards the totals only
+                totals[name] += int(value or 0)
+                if y is not None and x is not None:
+                    counts[name][int(y), int(x)] += int(value or 0)
+        return {name: counts[name] if totals[name] else None for name in counts}
+
+    def transition_counts(self, context):
+        """
+        Per-sector move totals and the (n_sectors, n_sectors) start/end count matrix of one
+        context, with the semantics of transition_counts.transition_counts.
+        """
+        context_sql, context_params = self._context_filter(context)
+        move_sql, move_params = self._move_filter()
+        nx, ny = self.bins
+        start = f"{bin_expression('location_y', self.y_edges)} * {nx} + {bin_expression('location_x', self.x_edges)}"
+        end = (f"{bin_expression('pass_endlocation_y', self.y_edges)} * {nx} + "
+               f"{bin_expression('pass_endlocation_x', self.x_edges)}")
+        rows = self._query(
+            f"SELECT start_sector, end_sector, COUNT(*) FROM ("
+            f"SELECT {start} AS start_sector, {end} AS end_sector FROM {RAW_TABLE} WHERE {context_sql} AND {move_sql}"
+            f") moves WHERE start_sector IS NOT NULL GROUP BY 1, 2",
+            context_params + move_params)
+
+        n_sectors = nx * ny
+        start_counts = np.zeros(n_sectors, dtype=np.int64)
+        counts = np.zeros((n_sectors, n_sectors), dtype=np.int64)
+        for start_sector, end_sector, count in rows:
+            start_counts[int(start_sector)] += count
+            # Moves ending off the pitch only count as a start
+            if end_sector is not None:
+                counts[int(start_sector), int(end_sector)] += count
+        return start_counts, counts
+
+    def calculations(self, context, xt_method='iterate'):
+        """
+        The calculations dict of run_all_calculations for one context, aggregated in the database.
+        """
+        grids = self.sector_counts(context)
+        if grids is None:
+            return None
+        start_counts, counts = self.transition_counts(context)
+        return calculations_from_counts(grids['move'], grids['shot'], grids['goal'], start_counts, counts,
+                                        self.bins, xt_method)
+
+
+def connect(database):
+    """
+    Opens a DuckDB file for a path, or PostgreSQL for a libpq DSN ("dbname=... host=...").
+    Returns (connection, dialect).
+    """
+    if '=' in database or database.startswith('postgresql://'):
+        import psycopg2
+        return psycopg2.connect(database), 'postgres'
+    import duckdb
+    return duckdb.connect(database), 'duckdb'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load events into frf_prjt.frf_raw_data_excel and aggregate them in SQL.")
+    parser.add_argument('database', help="DuckDB file path or PostgreSQL DSN")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    load = subparsers.add_parser('load', help="bulk-load a raw CSV export")
+    load.add_argument('csv')
+    load.add_argument('--chunksize', type=int, default=200_000)
+    counts = subparsers.add_parser('counts', help="print the sector counts of a team context")
+    counts.add_argument('context', help="UCLUJ or a team id")
+    args = parser.parse_args(argv)
+
+    connection, dialect = connect(args.database)
+    backend = SqlEventBackend(connection, dialect)
+    if args.command == 'load':
+        backend.create_tables()
+        print(f"Loaded {backend.load_csv(args.csv, args.chunksize):,} rows into {RAW_TABLE}")
+    else:
+        grids = backend.sector_counts(args.context)
+        if grids is None:
+            print(f"No events for context {args.context}")
+            return 1
+        for name, grid in grids.items():
+            print(f"{name}: {0 if grid is None else int(grid.sum()):,} events on the pitch")
+    connection.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,213 @@
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from event_store import UCLUJ_TEAM_ID, has_secondary_type
+from transition_counts import sector_index
+from xt_model import MOVE_TYPES, calculations_from_counts
+
+# The only CSV columns the counts need; everything else is never parsed
+STREAM_COLUMNS = ['team.id', 'type.primary', 'type.secondary', 'location.x', 'location.y',
+                  'pass.accurate', 'pass.endLocation.x', 'pass.endLocation.y', 'shot.isGoal']
+CHUNK_SIZE = 200_000
+
+# Per-team event totals, including events off the pitch; used to tell "no events" from "all zero"
+TOTAL_KEYS = ['events', 'move', 'shot', 'goal']
+
+# Matches a quoted move type inside the "['a', 'b']" strings of the raw CSV
+MOVE_TYPE_PATTERN = "'(?:" + '|'.join(MOVE_TYPES) + ")'"
+
+
+def move_type_mask(chunk):
+    """
+    Rows tagged with a move secondary type. The raw CSV strings of a batch are matched in one
+    vectorized regex pass instead of being literal_eval'd row by row; parsed lists and the
+    flag columns of the event store go through has_secondary_type.
+    """
+    secondary = chunk.get('type.secondary')
+    if secondary is None or not secondary.map(lambda x: isinstance(x, str)).any():
+        return has_secondary_type(chunk, MOVE_TYPES)
+    # Missing values (no secondary type) never match
+    return secondary.str.contains(MOVE_TYPE_PATTERN, regex=True, na=False)
+
+
+def event_counts(chunk, group, n_groups, bins=(16, 12)):
+    """
+    Sector counts of a batch of events split by an integer group code per row (0..n_groups-1):
+    'grids' (n_groups, 3, n_sectors) of moves/shots/goals, 'start_counts' (n_groups, n_sectors),
+    'totals' (n_groups, len(TOTAL_KEYS)) and 'transitions', the non-zero (start, end) counts as
+    (group, start * n_sectors + end, count) arrays.
+    """
+    n_sectors = bins[0] * bins[1]
+    group = np.asarray(group, dtype=np.int64)
+    is_move = (move_type_mask(chunk) & (chunk['pass.accurate'] == True)).to_numpy()
+    is_shot = (chunk['type.primary'] == 'shot').to_numpy()
+    is_goal = is_shot & (chunk['shot.isGoal'] == True).to_numpy()
+
+    start = sector_index(chunk['location.x'], chunk['location.y'], bins)
+    grids = np.zeros((n_groups, 3, n_sectors), dtype=np.int64)
+    for kind, mask in enumerate([is_move, is_shot, is_goal]):
+        on_pitch = mask & (start >= 0)
+        grids[:, kind] = np.bincount(group[on_pitch] * n_sectors + start[on_pitch],
+                                     minlength=n_groups * n_sectors).reshape(n_groups, n_sectors)
+
+    totals = np.stack([np.bincount(group[mask], minlength=n_groups)
+                       for mask in [np.ones_like(is_move), is_move, is_shot, is_goal]], axis=1)
+
+    # Same semantics as transition_counts: off-pitch starts are ignored, off-pitch ends only count as a start
+    moves = is_move & (start >= 0)
+    end = sector_index(chunk['pass.endLocation.x'].to_numpy()[moves], chunk['pass.endLocation.y'].to_numpy()[moves], bins)
+    move_group, move_start = group[moves], start[moves]
+    start_counts = np.bincount(move_group * n_sectors + move_start,
+                               minlength=n_groups * n_sectors).reshape(n_groups, n_sectors)
+    ended = end >= 0
+    flat = (move_group[ended] * n_sectors + move_start[ended]) * n_sectors + end[ended]
+    keys, count = np.unique(flat, return_counts=True)
+    transitions = (keys // n_sectors ** 2, keys % n_sectors ** 2, count)
+    return {'grids': grids, 'start_counts': start_counts, 'totals': totals, 'transitions': transitions}
+
+
+def summed_counts(grids, start_counts, counts, totals, bins=(16, 12)):
+    """
+    The counts dict of one context from its summed arrays: the move/shot/goal grids as
+    (bins[1], bins[0]) with row 0 at the bottom, or None without such events, plus
+    start_counts and counts (n_sectors, n_sectors). None when there are no events at all.
+    """
+    totals = dict(zip(TOTAL_KEYS, totals))
+    if not totals['events']:
+        return None
+    nx, ny = bins
+    result = {name: grids[kind].reshape(ny, nx) if totals[name] else None
+              for kind, name in enumerate(['move', 'shot', 'goal'])}
+    result['start_counts'] = start_counts
+    result['counts'] = counts.reshape(nx * ny, nx * ny)
+    return result
+
+
+class CountAccumulator:
+    """
+    Per-team sector counts built up chunk by chunk: move/shot/goal grids, moves per start
+    sector and the (start sector, end sector) count matrix. Memory is set by the number of
+    teams, not by the number of events.
+    """
+
+    def __init__(self, bins=(16, 12), home_team_id=UCLUJ_TEAM_ID):
+        self.bins = bins
+        self.home_team_id = home_team_id
+        self.n_sectors = bins[0] * bins[1]
+        self.team_ids = []
+        self._team_codes = {}
+        self.grids = np.zeros((0, 3, self.n_sectors), dtype=np.int64)
+        self.start_counts = np.zeros((0, self.n_sectors), dtype=np.int64)
+        self.counts = np.zeros((0, self.n_sectors, self.n_sectors), dtype=np.int64)
+        self.totals = np.zeros((0, len(TOTAL_KEYS)), dtype=np.int64)
+
+    def _codes(self, team_ids):
+        # Teams seen for the first time get a new row in every count array
+        unique_ids, inverse = np.unique(team_ids, return_inverse=True)
+        new_ids = [int(t) for t in unique_ids if int(t) not in self._team_codes]
+        if new_ids:
+            for team_id in new_ids:
+                self._team_codes[team_id] = len(self.team_ids)
+                self.team_ids.append(team_id)
+            grow = len(new_ids)
+            self.grids = np.concatenate([self.grids, np.zeros((grow,) + self.grids.shape[1:], dtype=np.int64)])
+            self.start_counts = np.concatenate([self.start_counts, np.zeros((grow, self.n_sectors), dtype=np.int64)])
+            self.counts = np.concatenate([self.counts, np.zeros((grow, self.n_sectors, self.n_sectors), dtype=np.int64)])
+            self.totals = np.concatenate([self.totals, np.zeros((grow, len(TOTAL_KEYS)), dtype=np.int64)])
+        unique_codes = np.array([self._team_codes[int(t)] for t in unique_ids], dtype=np.int64)
+        return unique_codes[inverse]
+
+    def add(self, chunk):
+        """
+        Adds one batch of events. 'type.secondary' may be the raw string column of the CSV,
+        parsed lists, or the flag columns of the event store.
+        """
+        if chunk.empty:
+            return
+        team_ids, team = np.unique(chunk['team.id'].to_numpy(), return_inverse=True)
+        self.add_counts(team_ids, event_counts(chunk, team, len(team_ids), self.bins))
+
+    def add_counts(self, team_ids, counts):
+        """
+        Adds the output of event_counts(), whose group g belongs to team team_ids[g].
+        Several groups may belong to the same team (for example one group per match).
+        """
+        codes = self._codes(np.asarray(team_ids))
+        np.add.at(self.grids, codes, counts['grids'])
+        np.add.at(self.start_counts, codes, counts['start_counts'])
+        np.add.at(self.totals, codes, counts['totals'])
+        group, pair, count = counts['transitions']
+        np.add.at(self.counts.reshape(len(self.team_ids), -1), (codes[group], pair), count)
+
+    def _context_rows(self, context):
+        team_ids = np.asarray(self.team_ids, dtype=np.int64)
+        if str(context) == 'UCLUJ':
+            return team_ids != self.home_team_id
+        return team_ids == int(context)
+
+    def context_team_ids(self, context):
+        """Ids of the teams whose events make up a context."""
+        return np.asarray(self.team_ids, dtype=np.int64)[self._context_rows(context)]
+
+    def event_total(self, context):
+        """Number of events of one context, including those off the pitch."""
+        return int(self.totals[self._context_rows(context), 0].sum())
+
+    def context_counts(self, context):
+        """
+        Summed counts of one context ('UCLUJ' = every opponent, or a team id): a dict with the
+        move/shot/goal grids ((bins[1], bins[0]), row 0 at the bottom; None without such events),
+        start_counts and counts. None when the context has no events.
+        """
+        rows = self._context_rows(context)
+        return summed_counts(self.grids[rows].sum(axis=0), self.start_counts[rows].sum(axis=0),
+                             self.counts[rows].sum(axis=0), self.totals[rows].sum(axis=0), self.bins)
+
+    def contexts(self):
+        """Every context with at least one event: 'UCLUJ' plus each team id as string."""
+        return ['UCLUJ'] + [str(team_id) for team_id in self.team_ids]
+
+    def calculations(self, context, xt_method='iterate'):
+        """
+        The calculations dict of run_all_calculations for one context, from the accumulated counts.
+        """
+        counts = self.context_counts(context)
+        if counts is None:
+            return None
+        return calculations_from_counts(counts['move'], counts['shot'], counts['goal'], counts['start_counts'],
+                                        counts['counts'], self.bins, xt_method)
+
+
+def stream_counts(csv_paths, chunksize=CHUNK_SIZE, bins=(16, 12)):
+    """
+    Streams one or more raw CSV exports (for example several clubs and seasons) in fixed-size
+    batches and returns the filled CountAccumulator. Peak memory is bounded by `chunksize`.
+    """
+    accumulator = CountAccumulator(bins)
+    for csv_path in csv_paths:
+        for chunk in pd.read_csv(csv_path, usecols=lambda c: c in STREAM_COLUMNS, chunksize=chunksize):
+            accumulator.add(chunk)
+    return accumulator
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream raw event CSVs into per-team sector counts.")
+    parser.add_argument('csv', nargs='+')
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    accumulator = stream_counts(args.csv, args.chunksize)
+    for context in accumulator.contexts():
+        counts = accumulator.context_counts(context)
+        if counts is None:
+            continue
+        print(f"{context:>8}: {int(counts['start_counts'].sum()):>9,} moves on the pitch, "
+              f"{0 if counts['shot'] is None else int(counts['shot'].sum()):>6,} shots")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+
+from event_store import SECONDARY_PREFIX, UCLUJ_TEAM_ID
+
+# Superliga team ids (see TEAMS in the Flask app) plus U Cluj itself
+LEAGUE_TEAM_IDS = [UCLUJ_TEAM_ID, 11566, 11564, 11565, 11611, 26233, 61242, 11634, 11571,
+                   11663, 11886, 60392, 32854, 60390, 30817, 55427]
+
+PASS_SECONDARY_TYPES = ['short_or_medium_pass', 'long_pass', 'head_pass', 'smart_pass', 'cross',
+                        'forward_pass', 'progressive_pass', 'lateral_pass', 'back_pass']
+OTHER_SECONDARY_TYPES = ['dribble', 'loss', 'key_pass', 'through_pass', 'recovery', 'carry']
+SECONDARY_TYPES = PASS_SECONDARY_TYPES + OTHER_SECONDARY_TYPES
+
+EVENTS_PER_MATCH = 1700
+EVENTS_PER_POSSESSION = 7
+
+
+def generate_events(n_matches, events_per_match=EVENTS_PER_MATCH, seed=0, layout='raw', first_match_id=5_000_000):
+    """
+    Generates WyScout-shaped events for `n_matches` matches between the league teams, with the
+    columns of frf_prjt.frf_raw_data_excel under the app's dotted names.
+
+    layout='raw' gives 'type.secondary' as lists, like the CSV after literal_eval;
+    layout='store' gives one boolean column per secondary type, like event_store.
+    """
+    rng = np.random.default_rng(seed)
+    n = n_matches * events_per_match
+
+    match_number = np.repeat(np.arange(n_matches), events_per_match)
+    match_id = match_number + first_match_id
+    within_match = np.tile(np.arange(events_per_match), n_matches)
+    possession = within_match // EVENTS_PER_POSSESSION
+    pairs = np.array([rng.choice(len(LEAGUE_TEAM_IDS), 2, replace=False) for _ in range(n_matches)])
+    # Each possession belongs to one of the two teams of the match
+    home_away = rng.integers(0, 2, (n_matches, possession.max() + 1))[match_number, possession]
+    team_ids = np.asarray(LEAGUE_TEAM_IDS)
+    team = team_ids[pairs[match_number, home_away]]
+    opponent = team_ids[pairs[match_number, 1 - home_away]]
+
+    # Events are evenly spread over 95 minutes, in order within each match
+    seconds = np.tile(np.sort(rng.integers(0, 95 * 60, events_per_match)), n_matches)
+    period = np.where(seconds < 47 * 60, '1H', '2H')
+
+    primary = rng.choice(['pass', 'shot', 'duel', 'touch', 'interception'], n, p=[0.55, 0.02, 0.2, 0.15, 0.08])
+    is_pass = primary == 'pass'
+    is_shot = primary == 'shot'
+
+    x = np.round(rng.uniform(0, 100, n))
+    y = np.round(rng.uniform(0, 100, n))
+    # Shots come from the attacking third
+    x[is_shot] = np.round(rng.uniform(70, 100, is_shot.sum()))
+    end_x = np.where(is_pass, np.clip(np.round(x + rng.normal(5, 15, n)), 0, 100), np.nan)
+    end_y = np.where(is_pass, np.clip(np.round(y + rng.normal(0, 15, n)), 0, 100), np.nan)
+
+    events = pd.DataFrame({
+        'id': match_id.astype(np.int64) * 10_000 + within_match,
+        'matchId': match_id,
+        'matchPeriod': period,
+        'minute': seconds // 60,
+        'second': seconds % 60,
+        'type.primary': primary,
+        'location.x': x,
+        'location.y': y,
+        'team.id': team,
+        'opponentTeam.id': opponent,
+        'player.id': team * 100 + rng.integers(0, 18, n),
+        'pass.accurate': np.where(is_pass, rng.random(n) < 0.8, False),
+        'pass.endLocation.x': end_x,
+        'pass.endLocation.y': end_y,
+        'shot.isGoal': is_shot & (rng.random(n) < 0.1),
+        'possession.id': match_id.astype(np.int64) * 1_000 + possession,
+        'possession.duration': rng.uniform(1, 40, n),
+    })
+
+    # Every pass gets one to three secondary types, dribbles are sprinkled over other events
+    flags = np.zeros((n, len(SECONDARY_TYPES)), dtype=bool)
+    for _ in range(3):
+        chosen = rng.integers(0, len(PASS_SECONDARY_TYPES), n)
+        keep = is_pass & (rng.random(n) < 0.7)
+        flags[np.flatnonzero(keep), chosen[keep]] = True
+    flags[np.flatnonzero(is_pass), rng.integers(0, len(PASS_SECONDARY_TYPES), is_pass.sum())] = True
+    others = ~is_pass & (rng.random(n) < 0.3)
+    flags[np.flatnonzero(others), len(PASS_SECONDARY_TYPES) + rng.integers(0, len(OTHER_SECONDARY_TYPES), others.sum())] = True
+
+    if layout == 'store':
+        flag_frame = pd.DataFrame(flags, columns=[SECONDARY_PREFIX + t for t in SECONDARY_TYPES])
+        for column in ['location.x', 'location.y', 'pass.endLocation.x', 'pass.endLocation.y']:
+            events[column] = events[column].astype(np.float32)
+        events['type.primary'] = events['type.primary'].astype('category')
+        return pd.concat([events, flag_frame], axis=1)
+    if layout == 'raw':
+        names = np.asarray(SECONDARY_TYPES, dtype=object)
+        events.insert(6, 'type.secondary', [list(names[row]) for row in flags])
+        return events
+    raise ValueError(f"Unknown layout: {layout}")
+
+
+def iter_event_chunks(n_matches, matches_per_chunk=200, seed=0, layout='store', **kwargs):
+    """
+    Yields a league-scale dataset chunk by chunk, so tens of millions of events can be written
+    without holding them all in memory.
+    """
+    for chunk_number, first in enumerate(range(0, n_matches, matches_per_chunk)):
+        yield generate_events(min(matches_per_chunk, n_matches - first), seed=seed + chunk_number,
+                              layout=layout, first_match_id=5_000_000 + first, **kwargs)
+
+
+def write_event_store(path, n_matches, matches_per_chunk=200, seed=0):
+    """
+    Writes a synthetic Parquet store in the layout produced by event_store.ingest_csv.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in iter_event_chunks(n_matches, matches_per_chunk, seed):
+            # Categories differ per chunk, so the chunks are written as plain strings
+            chunk['type.primary'] = chunk['type.primary'].astype(str)
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    return path
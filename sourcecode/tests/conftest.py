@@ -0,0 +1,14 @@
+import os
+import sys
+
+import pytest
+
+# The modules live flat in sourcecode/ and import each other by name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def raw_events():
+    """Three synthetic matches with 'type.secondary' lists, as the CSV gives them."""
+    from synthetic_events import generate_events
+    return generate_events(3, seed=1, layout='raw')
@@ -0,0 +1,54 @@
+import math
+from collections import defaultdict
+
+import numpy as np
+import pytest
+
+from action_values import leaderboard, score_actions
+
+
+def reference_sector(x, y, bins=(16, 12)):
+    """(column, row from the top) of the xT grid for one location, None off the pitch."""
+    if not (0 <= x <= 105 and 0 <= y <= 68):
+        return None
+    # The last bin includes the far edge of the pitch
+    column = min(int(x / 105 * bins[0]), bins[0] - 1)
+    row = min(int(y / 68 * bins[1]), bins[1] - 1)
+    return column, bins[1] - 1 - row
+
+
+@pytest.fixture
+def actions(raw_events):
+    events = raw_events.copy()
+    # Carries: every touch moves the ball a little forward
+    touches = events['type.primary'] == 'touch'
+    events['carry.endLocation.x'] = np.where(touches, np.minimum(events['location.x'] + 8, 104), np.nan)
+    events['carry.endLocation.y'] = np.where(touches, events['location.y'], np.nan)
+    return events
+
+
+def test_score_actions_matches_a_per_event_loop(actions):
+    xT_final = np.random.default_rng(0).random((12, 16))
+    expected = []
+    for _, event in actions.iterrows():
+        if event['type.primary'] == 'pass' and event['pass.accurate'] == True:
+            end = event['pass.endLocation.x'], event['pass.endLocation.y']
+        elif not math.isnan(event['carry.endLocation.x']):
+            end = event['carry.endLocation.x'], event['carry.endLocation.y']
+        else:
+            continue
+        start_cell, end_cell = reference_sector(event['location.x'], event['location.y']), reference_sector(*end)
+        if start_cell is None or end_cell is None:
+            continue
+        expected.append((event['player.id'], xT_final[end_cell[1], end_cell[0]] - xT_final[start_cell[1], start_cell[0]]))
+
+    scored = score_actions(actions, xT_final)
+    assert scored['player.id'].tolist() == [player for player, _ in expected]
+    np.testing.assert_allclose(scored['xT_added'], [value for _, value in expected], rtol=0, atol=1e-15)
+
+    totals = defaultdict(float)
+    for player, value in expected:
+        totals[player] += value
+    board = leaderboard(scored, 'player').set_index('player.id')
+    np.testing.assert_allclose(board.loc[list(totals), 'xT_added'], list(totals.values()), rtol=0, atol=1e-12)
+    assert board['xT_added'].is_monotonic_decreasing
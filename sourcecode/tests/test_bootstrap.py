@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+from bootstrap import BOOTSTRAP_KEYS, bootstrap_bands, resample_maps, unit_counts
+from streaming_ingest import CountAccumulator
+
+UNIT = ['matchId', 'possession.id']
+
+
+def test_resamples_match_recounting_the_resampled_events(raw_events):
+    units = unit_counts(raw_events, raw_events[UNIT].to_numpy())
+    possessions = [group for _, group in raw_events.groupby(UNIT, sort=True)]
+    assert units.shape[0] == len(possessions)
+    weights = np.random.default_rng(3).multinomial(len(possessions), np.full(len(possessions), 1 / len(possessions)), size=2)
+
+    maps = resample_maps(units, weights)
+    for r, row in enumerate(weights):
+        # The resample as events: every drawn possession repeated as often as it was drawn
+        resampled = pd.concat([possessions[u] for u in np.flatnonzero(row) for _ in range(row[u])], ignore_index=True)
+        accumulator = CountAccumulator(home_team_id=-1)
+        accumulator.add(resampled)
+        expected = accumulator.calculations('UCLUJ')
+        for key in BOOTSTRAP_KEYS:
+            np.testing.assert_allclose(maps[key][r], expected[key], rtol=0, atol=1e-12)
+
+
+def test_bootstrap_bands_are_ordered_and_reproducible(raw_events):
+    units = unit_counts(raw_events, raw_events[UNIT].to_numpy())
+    bands, valid = bootstrap_bands(units, resamples=20, seed=1)
+    again, _ = bootstrap_bands(units, resamples=20, seed=1)
+    assert 0 < valid <= 20
+    for key in BOOTSTRAP_KEYS:
+        finite = np.isfinite(bands[key]['lower'])
+        assert np.all(bands[key]['lower'][finite] <= bands[key]['upper'][finite])
+        np.testing.assert_array_equal(bands[key]['width'], again[key]['width'])
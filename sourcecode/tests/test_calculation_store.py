@@ -0,0 +1,18 @@
+import os
+
+import numpy as np
+
+from calculation_store import CalculationStore
+
+
+def test_saving_a_new_digest_prunes_only_that_contexts_old_versions(tmp_path):
+    store = CalculationStore(str(tmp_path), 'v1')
+    calculations = {'xT_final': np.arange(6.0).reshape(2, 3)}
+    for version in ['UCLUJ-aaaa', '11566-aaaa', 'UCLUJ-bbbb']:
+        store.save(version, calculations)
+
+    assert sorted(os.listdir(store.directory)) == ['11566-aaaa', 'UCLUJ-bbbb']
+    np.testing.assert_array_equal(store.load('UCLUJ-bbbb')['xT_final'], calculations['xT_final'])
+    store.save('11566-cccc', None)
+    assert sorted(os.listdir(store.directory)) == ['11566-cccc', 'UCLUJ-bbbb']
+    assert store.load('11566-cccc') is None
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from event_store import UCLUJ_TEAM_ID
+from match_counts import MatchCountIndex
+
+
+def assert_same_counts(left, right):
+    if left is None or right is None:
+        assert left is right
+        return
+    assert left.keys() == right.keys()
+    for name in left:
+        if left[name] is None or right[name] is None:
+            assert left[name] is right[name], name
+        else:
+            np.testing.assert_array_equal(left[name], right[name], err_msg=name)
+
+
+def test_appending_a_match_equals_indexing_every_match_at_once(raw_events):
+    last_match = raw_events['matchId'].max()
+    index = MatchCountIndex()
+    index.append(raw_events[raw_events['matchId'] != last_match])
+    full = MatchCountIndex()
+    full.append(raw_events)
+
+    new_match = raw_events[raw_events['matchId'] == last_match]
+    changed = index.append(new_match)
+
+    teams = {str(team_id) for team_id in new_match['team.id'].unique()}
+    expected = teams | {'UCLUJ'} if (new_match['team.id'] != UCLUJ_TEAM_ID).any() else teams
+    assert changed == expected
+    assert set(index.contexts()) == set(full.contexts())
+    for context in full.contexts():
+        assert_same_counts(index.context_counts(context), full.context_counts(context))
+        assert index.context_digest(context) == full.context_digest(context)
+
+
+def test_appending_an_indexed_match_raises(raw_events):
+    index = MatchCountIndex()
+    index.append(raw_events)
+    digest = index.context_digest('UCLUJ')
+    with pytest.raises(ValueError, match='already indexed'):
+        index.append(raw_events[raw_events['matchId'] == raw_events['matchId'].min()])
+    assert index.context_digest('UCLUJ') == digest
@@ -0,0 +1,98 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from action_values import xt_by_sector
+from possession_chains import PossessionChains
+from synthetic_events import generate_events
+from transition_counts import sector_index
+
+
+@pytest.fixture(scope='module')
+def events():
+    events = generate_events(4, seed=3)
+    # Every possession of the generator belongs to one team; hand some of its events to the opponent
+    rng = np.random.default_rng(3)
+    lost = rng.random(len(events)) < 0.2
+    events.loc[lost, 'team.id'] = events.loc[lost, 'opponentTeam.id']
+    return events
+
+
+def reference_chains(events, bins=(16, 12)):
+    """One (match, possession) group at a time, in the order PossessionChains stores them."""
+    events = events.assign(time=events['matchPeriod'].map({'1H': 0, '2H': 1}) * 1e5
+                           + events['minute'] * 60 + events['second'])
+    events = events.sort_values(['matchId', 'possession.id', 'time'], kind='stable')
+    chains = []
+    for (match_id, possession_id), possession in events.groupby(['matchId', 'possession.id'], sort=True):
+        owner = possession['team.id'].iloc[0]
+        if 'possession.team.id' in possession:
+            owner = possession['possession.team.id'].iloc[0]
+        on_ball = possession[possession['team.id'] == owner]
+        path = []
+        for sector in sector_index(on_ball['location.x'], on_ball['location.y'], bins):
+            if sector >= 0 and (not path or path[-1] != sector):
+                path.append(int(sector))
+        shots = on_ball['type.primary'] == 'shot'
+        chains.append({'match_id': match_id, 'possession_id': possession_id, 'team_id': owner, 'path': path,
+                       'shots': int(shots.sum()), 'goals': int((shots & on_ball['shot.isGoal']).sum()),
+                       'duration': possession['possession.duration'].iloc[0]})
+    return chains
+
+
+def assert_matches_reference(chains, expected):
+    assert chains.n_chains == len(expected)
+    assert [chains.sectors[chains.offsets[i]:chains.offsets[i + 1]].tolist() for i in range(chains.n_chains)] == \
+        [chain['path'] for chain in expected]
+    assert chains.offsets.tolist() == np.cumsum([0] + [len(chain['path']) for chain in expected]).tolist()
+    for name, attribute in [('match_id', 'match_ids'), ('possession_id', 'possession_ids'), ('team_id', 'team_ids'),
+                            ('shots', 'shots'), ('goals', 'goals')]:
+        assert getattr(chains, attribute).tolist() == [chain[name] for chain in expected], name
+    np.testing.assert_array_equal(chains.durations, [chain['duration'] for chain in expected])
+
+
+def test_chains_match_a_per_possession_loop(events):
+    assert_matches_reference(PossessionChains(events), reference_chains(events))
+
+
+def test_possession_team_column_decides_the_team_in_possession(events):
+    events = events.copy()
+    # The team of each possession's last row, which differs from its first one for some possessions
+    events['possession.team.id'] = events.groupby('possession.id')['team.id'].transform('last')
+    expected = reference_chains(events)
+    first_team = reference_chains(events.drop(columns='possession.team.id'))
+    assert any(chain['team_id'] != other['team_id'] for chain, other in zip(expected, first_team))
+    assert_matches_reference(PossessionChains(events), expected)
+
+
+def test_summary_and_common_paths_match_a_per_possession_loop(events):
+    chains = PossessionChains(events)
+    expected = reference_chains(events)
+    xT_final = np.random.default_rng(0).random((12, 16))
+    xt = xt_by_sector(xT_final)
+    groups = np.array([chain['match_id'] % 2 for chain in expected])
+
+    summary = chains.summary(xT_final, groups)
+    for group in [0, 1]:
+        selected = [chain for chain, label in zip(expected, groups) if label == group]
+        gained = [xt[chain['path'][-1]] - xt[chain['path'][0]] for chain in selected if chain['path']]
+        shot_gained = [xt[chain['path'][-1]] - xt[chain['path'][0]] for chain in selected if chain['path'] and chain['shots']]
+        assert summary['possessions'][group] == len(selected)
+        assert summary['shot_chains'][group] == sum(chain['shots'] > 0 for chain in selected)
+        assert summary['goal_chains'][group] == sum(chain['goals'] > 0 for chain in selected)
+        assert summary['shot_chain_rate'][group] == pytest.approx(summary['shot_chains'][group] / len(selected))
+        assert summary['mean_length'][group] == pytest.approx(np.mean([len(chain['path']) for chain in selected]))
+        assert summary['mean_duration'][group] == pytest.approx(np.mean([chain['duration'] for chain in selected]))
+        assert summary['mean_xT_gained'][group] == pytest.approx(np.mean(gained))
+        assert summary['mean_xT_gained_shot_chains'][group] == pytest.approx(np.mean(shot_gained))
+
+    for shots_only in [False, True]:
+        selected = [chain for chain in expected if len(chain['path']) >= 3 and (chain['shots'] or not shots_only)]
+        counts = Counter(tuple(chain['path'][-3:]) for chain in selected)
+        shot_counts = Counter(tuple(chain['path'][-3:]) for chain in selected if chain['shots'])
+        goal_counts = Counter(tuple(chain['path'][-3:]) for chain in selected if chain['goals'])
+        paths = chains.common_paths(3, shots_only=shots_only, limit=len(counts))
+        assert {tuple(path['path']): (path['chains'], path['shot_chains'], path['goal_chains']) for path in paths} == \
+            {path: (count, shot_counts[path], goal_counts[path]) for path, count in counts.items()}
+        assert [path['chains'] for path in paths] == sorted(counts.values(), reverse=True)
@@ -0,0 +1,54 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sql_backend import BIGINT_TABLE_COLUMNS, SqlEventBackend, table_rows
+from streaming_ingest import CountAccumulator
+
+duckdb = pytest.importorskip('duckdb')
+
+
+@pytest.fixture(scope='module')
+def events_csv(raw_events, tmp_path_factory):
+    events = raw_events.copy()
+    # Events without a player, like the WyScout export has, turn player.id into float64 on read
+    events.loc[events.index[::50], 'player.id'] = np.nan
+    path = tmp_path_factory.mktemp('sql') / 'events.csv'
+    events.to_csv(path, index=False)
+    return path
+
+
+@pytest.fixture(scope='module')
+def backend(events_csv):
+    backend = SqlEventBackend(duckdb.connect(), 'duckdb')
+    backend.create_tables()
+    backend.load_csv(events_csv, chunksize=5_000)
+    return backend
+
+
+def test_bigint_columns_are_copied_as_integers(events_csv):
+    rows = table_rows(pd.read_csv(events_csv, nrows=500))
+    assert rows['player_id'].isna().any()
+    copied = pd.read_csv(io.StringIO(rows.to_csv(index=False)), dtype=str)
+    for column in BIGINT_TABLE_COLUMNS:
+        assert not copied[column].str.contains('.', regex=False).any(), column
+
+
+def test_sql_counts_match_the_count_accumulator(raw_events, backend):
+    accumulator = CountAccumulator()
+    accumulator.add(raw_events)
+    assert backend.connection.execute("SELECT COUNT(*) FROM frf_prjt.frf_raw_data_excel").fetchone()[0] == len(raw_events)
+
+    for context in ['UCLUJ', str(raw_events['team.id'].iloc[0])]:
+        expected = accumulator.context_counts(context)
+        grids = backend.sector_counts(context)
+        for name in ['move', 'shot', 'goal']:
+            if expected[name] is None:
+                assert grids[name] is None, (context, name)
+            else:
+                np.testing.assert_array_equal(grids[name], expected[name], err_msg=f"{context} {name}")
+        start_counts, counts = backend.transition_counts(context)
+        np.testing.assert_array_equal(start_counts, expected['start_counts'])
+        np.testing.assert_array_equal(counts, expected['counts'])
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+from mplsoccer import Pitch
+from scipy.stats import binned_statistic_2d
+
+from streaming_ingest import CountAccumulator
+from transition_counts import build_transition_matrices, sector_index, transition_counts
+from xt_model import MOVE_TYPES, calculations_from_counts, count_containers
+
+BINS = (16, 12)
+
+
+def reference_frames(events):
+    """The move, shot and goal rows as the original run_all_calculations selected them."""
+    move_df = events.loc[events['type.secondary'].apply(lambda x: isinstance(x, list) and any(item in x for item in MOVE_TYPES))
+                         & (events['pass.accurate'] == True)].copy()
+    shot_df = events.loc[events['type.primary'] == 'shot']
+    goal_df = shot_df.loc[shot_df['shot.isGoal'] == True]
+    return move_df, shot_df, goal_df
+
+
+def reference_transition_matrices(move_df):
+    """The original per-sector loop over the moving-ball actions."""
+    start = binned_statistic_2d(move_df['location.x'], move_df['location.y'], values=None, statistic='count',
+                                bins=BINS, range=[[0, 105], [0, 68]], expand_binnumbers=True)[3]
+    end = binned_statistic_2d(move_df['pass.endLocation.x'], move_df['pass.endLocation.y'], values=None,
+                              statistic='count', bins=BINS, range=[[0, 105], [0, 68]], expand_binnumbers=True)[3]
+    move_df['start_x'], move_df['start_y'], move_df['end_x'], move_df['end_y'] = start[0], start[1], end[0], end[1]
+
+    transition_matrices_array = np.zeros((192, 12, 16))
+    for start_x in range(1, 17):
+        for start_y in range(1, 13):
+            this_sector_moves = move_df[(move_df['start_x'] == start_x) & (move_df['start_y'] == start_y)]
+            count_starts = len(this_sector_moves)
+            if count_starts == 0:
+                continue
+            end_counts = this_sector_moves.groupby(['end_x', 'end_y']).size().reset_index(name='count_ends')
+            for _, row in end_counts.iterrows():
+                end_x, end_y, value = row['end_x'], row['end_y'], row['count_ends']
+                if 0 < end_x <= 16 and 0 < end_y <= 12:
+                    transition_matrices_array[(start_y - 1) * 16 + (start_x - 1)][end_y - 1][end_x - 1] = value / count_starts
+    return transition_matrices_array
+
+
+def reference_xt_iterates(move_probability, shot_probability, goal_probability, transition_matrices_array):
+    xT = np.zeros((12, 16))
+    iterates = []
+    for _ in range(10):
+        move_payoff = move_probability.reshape(192) * np.sum(transition_matrices_array * xT, axis=(1, 2))
+        xT = goal_probability * shot_probability + move_payoff.reshape(12, 16)
+        iterates.append(xT)
+    return iterates
+
+
+def test_sector_index_marks_off_pitch_locations():
+    index = sector_index([0, 104.9, 105.1, np.nan, 50], [0, 67.9, 10, 10, -1], BINS)
+    assert index.tolist() == [0, 191, -1, -1, -1]
+
+
+def test_transition_counts_ignore_off_pitch_starts_and_ends():
+    start_counts, counts = transition_counts([0, 0, -1, 3], [1, -1, 2, 3], 4)
+    assert start_counts.tolist() == [2, 0, 0, 1]
+    assert counts[0, 1] == 1 and counts[3, 3] == 1 and counts.sum() == 2
+
+
+def test_transition_tensor_matches_the_per_sector_loop(raw_events):
+    move_df, _, _ = reference_frames(raw_events)
+    np.testing.assert_allclose(build_transition_matrices(move_df, BINS), reference_transition_matrices(move_df),
+                               rtol=0, atol=1e-15)
+
+
+@pytest.mark.parametrize('one_team', [False, True])
+def test_count_containers_and_xt_match_the_original_calculations(raw_events, one_team):
+    # Without a home team, 'UCLUJ' covers every event
+    context = str(raw_events['team.id'].iloc[0]) if one_team else 'UCLUJ'
+    events = raw_events[raw_events['team.id'] == int(context)] if one_team else raw_events
+    move_df, shot_df, goal_df = reference_frames(events)
+    pitch = Pitch(pitch_type='custom', pitch_length=105, pitch_width=68)
+    expected = [pitch.bin_statistic(frame['location.x'], frame['location.y'], statistic='count', bins=BINS)
+                for frame in (move_df, shot_df, goal_df)]
+
+    accumulator = CountAccumulator(BINS, home_team_id=-1)
+    accumulator.add(raw_events)
+    counts = accumulator.context_counts(context)
+
+    containers = count_containers(counts['move'], counts['shot'], counts['goal'], BINS)
+    for key, binned in zip(['move_binned', 'shot_binned', 'goal_binned'], expected):
+        for field in ['statistic', 'x_grid', 'y_grid', 'cx', 'cy']:
+            np.testing.assert_array_equal(containers[key][field], binned[field])
+
+    calculations = calculations_from_counts(counts['move'], counts['shot'], counts['goal'], counts['start_counts'],
+                                            counts['counts'], BINS)
+    transition = reference_transition_matrices(move_df)
+    np.testing.assert_allclose(calculations['transition_matrices_array'], transition, rtol=0, atol=1e-15)
+    reference = reference_xt_iterates(calculations['move_probability'], calculations['shot_probability'],
+                                      calculations['goal_probability'], transition)
+    for i, xT in enumerate(reference):
+        np.testing.assert_allclose(calculations['xT_matrices'][f'xT Matrix after {i+1} Moves']['statistic'], xT,
+                                   rtol=0, atol=1e-12)
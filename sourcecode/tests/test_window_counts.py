@@ -0,0 +1,18 @@
+import pytest
+
+from window_counts import TIME_BUCKETS, Window, bucket_ranges, describe_window, parse_window
+
+
+def test_parse_window_accepts_bucket_aligned_minutes():
+    window = parse_window({'period': '2H', 'minute_from': '60', 'minute_to': '90'})
+    assert window == Window(period='2H', minute_from=60, minute_to=90)
+    assert describe_window(window) == '2H, minutes 60-90'
+    assert [TIME_BUCKETS[i] for start, stop in bucket_ranges(window) for i in range(start, stop)] == [('2H', 60), ('2H', 75)]
+
+
+@pytest.mark.parametrize('values', [{'minute_from': '10'}, {'minute_to': '50'}, {'minute_from': '60', 'minute_to': '60'},
+                                    {'minute_from': '75', 'minute_to': '30'}, {'minute_from': '-15'},
+                                    {'last_matches': '0'}, {'period': '3H'}])
+def test_parse_window_rejects_windows_it_cannot_answer(values):
+    with pytest.raises(ValueError):
+        parse_window(values)
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from streaming_ingest import CountAccumulator
+from synthetic_events import generate_events
+from transition_counts import transition_probabilities
+from xt_model import probability_maps
+from xt_solver import solve_xt, solve_xt_batch, trapped_sectors, transition_operator
+
+TOL = 1e-10
+
+
+def singular_chain(seed=0, bins=(16, 12)):
+    """Random xT inputs where sectors 0 and 1 only pass to each other and never shoot."""
+    rng = np.random.default_rng(seed)
+    nx, ny = bins
+    n_sectors = nx * ny
+    move = rng.uniform(0.5, 0.95, (ny, nx))
+    shot = 1 - move
+    goal = rng.uniform(0, 0.3, (ny, nx))
+    transitions = rng.random((n_sectors, n_sectors)) * (rng.random((n_sectors, n_sectors)) < 0.05)
+    transitions[[0, 1]] = 0
+    transitions[0, 1] = transitions[1, 0] = 1
+    transitions /= np.maximum(transitions.sum(axis=1, keepdims=True), 1e-12)
+    move.reshape(-1)[[0, 1]], shot.reshape(-1)[[0, 1]] = 1, 0
+    return shot, goal, move, transitions.reshape(n_sectors, ny, nx)
+
+
+def synthetic_counts(context='11611', n_matches=10, seed=2):
+    accumulator = CountAccumulator()
+    accumulator.add(generate_events(n_matches, seed=seed, layout='store'))
+    return accumulator.context_counts(context)
+
+
+def synthetic_inputs(counts):
+    move, shot, goal = probability_maps(*(np.asarray(counts[key], dtype=float) for key in ['move', 'shot', 'goal']))
+    return shot, goal, move, transition_probabilities(counts['start_counts'], counts['counts'])
+
+
+def test_trapped_sectors_finds_closed_move_loops():
+    shot, goal, move, transitions = singular_chain()
+    operator = transition_operator(transitions).multiply(move.reshape(-1, 1))
+    assert np.flatnonzero(trapped_sectors(operator)).tolist() == [0, 1]
+
+
+def test_direct_matches_iterate_on_a_singular_system(capfd):
+    inputs = singular_chain()
+    iterated, _ = solve_xt(*inputs, method='iterate', tol=TOL)
+    direct, iterates = solve_xt(*inputs, method='direct', tol=TOL)
+    np.testing.assert_allclose(direct, iterated, rtol=0, atol=TOL)
+    # Not stuck at the last plotted iterate
+    assert np.abs(direct - iterates[-1]).max() > 1e-3
+    assert 'DGEMV' not in capfd.readouterr().err
+
+
+@pytest.mark.parametrize('context', ['11611', 'UCLUJ'])
+def test_direct_matches_iterate_on_synthetic_counts(context):
+    inputs = synthetic_inputs(synthetic_counts(context))
+    iterated, iterated_steps = solve_xt(*inputs, method='iterate', tol=TOL)
+    direct, direct_steps = solve_xt(*inputs, method='direct', tol=TOL)
+    # Value iteration stops on a step below tol, so it can sit slightly short of the fixed point
+    np.testing.assert_allclose(direct, iterated, rtol=0, atol=100 * TOL)
+    np.testing.assert_array_equal(np.array(direct_steps), np.array(iterated_steps))
+
+
+@pytest.mark.parametrize('method', ['iterate', 'direct'])
+def test_batched_solve_matches_solve_xt_per_context(method):
+    accumulator = CountAccumulator()
+    accumulator.add(generate_events(10, seed=2, layout='store'))
+    counts = [accumulator.context_counts(context) for context in accumulator.contexts()]
+    contexts = [synthetic_inputs(c) for c in counts if c is not None and all(c[key] is not None for key in ['move', 'shot', 'goal'])]
+    contexts.append(singular_chain())
+    stacked = [np.stack(arrays) for arrays in zip(*contexts)]
+
+    xT_batch, iterates_batch = solve_xt_batch(*stacked, method=method, tol=TOL)
+    for t, inputs in enumerate(contexts):
+        xT, iterates = solve_xt(*inputs, method=method, tol=TOL)
+        np.testing.assert_allclose(xT_batch[t], xT, rtol=0, atol=1e-12)
+        np.testing.assert_allclose(iterates_batch[t], np.array(iterates), rtol=0, atol=1e-12)
+        # Both solvers agree with plain value iteration, singular blocks included
+        np.testing.assert_allclose(xT_batch[t], solve_xt(*inputs, method='iterate', tol=TOL)[0], rtol=0, atol=100 * TOL)
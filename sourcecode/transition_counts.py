@@ -0,0 +1,68 @@
+import numpy as np
+
+
+def sector_index(x, y, bins=(16, 12), pitch_length=105, pitch_width=68):
+    """
+    Bins x/y locations into pitch sectors once and returns the flat, zero-based
+    sector index (y_bin * bins[0] + x_bin) of every location.
+    Locations outside the pitch (or missing) get the index -1.
+    """
+    # scipy.stats takes about a second to import; it is only needed once events are binned
+    from scipy.stats import binned_statistic_2d
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if x.size == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    binnumbers = binned_statistic_2d(x, y, values=None, statistic='count', bins=bins,
+                                     range=[[0, pitch_length], [0, pitch_width]], expand_binnumbers=True)[3]
+    x_bin = binnumbers[0] - 1
+    y_bin = binnumbers[1] - 1
+
+    on_pitch = (x_bin >= 0) & (x_bin < bins[0]) & (y_bin >= 0) & (y_bin < bins[1])
+    return np.where(on_pitch, y_bin * bins[0] + x_bin, -1).astype(np.int64)
+
+
+def transition_counts(start_index, end_index, n_sectors):
+    """
+    Counts (start sector, end sector) pairs in one batched pass.
+    Returns the number of moves started in each sector and the (n_sectors, n_sectors)
+    count matrix. Moves starting off the pitch are ignored; moves ending off the pitch
+    still count as a start but are dropped from the count matrix.
+    """
+    start_index = np.asarray(start_index)
+    end_index = np.asarray(end_index)
+
+    started = start_index >= 0
+    start_counts = np.bincount(start_index[started], minlength=n_sectors)
+
+    both_on_pitch = started & (end_index >= 0)
+    flat_pairs = start_index[both_on_pitch] * n_sectors + end_index[both_on_pitch]
+    counts = np.bincount(flat_pairs, minlength=n_sectors * n_sectors).reshape(n_sectors, n_sectors)
+    return start_counts, counts
+
+
+def transition_probabilities(start_counts, counts, bins=(16, 12)):
+    """
+    Turns transition counts into the (n_sectors, bins[1], bins[0]) tensor used by the app:
+    entry [s, y, x] is the share of moves started in sector s that ended in sector (x, y).
+    Stacks of counts with leading axes, e.g. one per team, give one tensor per entry.
+    """
+    n_sectors = bins[0] * bins[1]
+    start_counts = np.asarray(start_counts, dtype=float)
+    counts = np.asarray(counts).reshape(start_counts.shape + (n_sectors,))
+    probabilities = np.divide(counts, start_counts[..., None], out=np.zeros(counts.shape),
+                              where=start_counts[..., None] != 0)
+    return probabilities.reshape(start_counts.shape + (bins[1], bins[0]))
+
+
+def build_transition_matrices(move_df, bins=(16, 12), pitch_length=105, pitch_width=68):
+    """
+    Builds the full transition tensor for a dataframe of moving-ball actions,
+    binning the start and end locations a single time.
+    """
+    start_index = sector_index(move_df['location.x'], move_df['location.y'], bins, pitch_length, pitch_width)
+    end_index = sector_index(move_df['pass.endLocation.x'], move_df['pass.endLocation.y'], bins, pitch_length, pitch_width)
+    start_counts, counts = transition_counts(start_index, end_index, bins[0] * bins[1])
+    return transition_probabilities(start_counts, counts, bins)
@@ -0,0 +1,176 @@
+from collections import namedtuple
+
+import numpy as np
+
+# Match periods in playing order, with the minutes each one spans
+PERIODS = ['1H', '2H', 'E1', 'E2', 'P']
+PERIOD_MINUTES = {'1H': (0, 45), '2H': (45, 90), 'E1': (90, 105), 'E2': (105, 120), 'P': (120, 120)}
+BUCKET_MINUTES = 15
+
+# (period, first minute) of every time bucket in playing order. Stoppage time falls into the
+# last bucket of its period, so "minutes 75-90" includes 90+3 of the second half.
+TIME_BUCKETS = [(period, minute) for period, (start, end) in PERIOD_MINUTES.items()
+                for minute in (range(start, end, BUCKET_MINUTES) or [start])]
+
+# A contiguous slice of a context's events: a range of its matches (in matchId order) and a
+# range of match time. None means no restriction.
+Window = namedtuple('Window', ['last_matches', 'match_from', 'match_to', 'period', 'minute_from', 'minute_to'],
+                    defaults=[None] * 6)
+FULL_WINDOW = Window()
+
+# Request parameters of a Window, in field order
+WINDOW_PARAMETERS = list(Window._fields)
+
+
+def time_buckets(events):
+    """
+    Index into TIME_BUCKETS of every event, from the 'matchPeriod' and 'minute' columns.
+    Events without a known period are placed by their minute; without a minute they count
+    as the start of their period.
+    """
+    import pandas as pd
+
+    n = len(events)
+    minute = pd.to_numeric(events['minute'], errors='coerce').fillna(-1).to_numpy() if 'minute' in events else np.full(n, -1.0)
+    if 'matchPeriod' in events:
+        period = pd.Categorical(events['matchPeriod'].astype(str), categories=PERIODS).codes.astype(np.int64)
+    else:
+        period = np.full(n, -1, dtype=np.int64)
+    starts = np.array([PERIOD_MINUTES[p][0] for p in PERIODS])
+    unknown = period < 0
+    period[unknown] = np.clip(np.searchsorted(starts, minute[unknown], side='right') - 1, 0, len(PERIODS) - 1)
+
+    first_bucket = np.array([TIME_BUCKETS.index((p, PERIOD_MINUTES[p][0])) for p in PERIODS])
+    bucket_count = np.diff(np.append(first_bucket, len(TIME_BUCKETS)))
+    offset = (minute - starts[period]) // BUCKET_MINUTES
+    return first_bucket[period] + np.clip(offset, 0, bucket_count[period] - 1).astype(np.int64)
+
+
+def parse_window(values):
+    """
+    Builds a Window from request parameters (any mapping with .get). Raises ValueError for
+    malformed values, and for minute bounds that are not multiples of BUCKET_MINUTES or do
+    not form a non-empty range, since the counts only resolve whole time buckets.
+    """
+    fields = {}
+    for name in WINDOW_PARAMETERS:
+        value = values.get(name)
+        if value in (None, ''):
+            continue
+        if name == 'period':
+            if value not in PERIODS:
+                raise ValueError(f"Unknown period '{value}', expected one of {PERIODS}")
+            fields[name] = value
+        elif not str(value).isdigit():
+            raise ValueError(f"'{name}' must be a non-negative integer")
+        else:
+            fields[name] = int(value)
+    if fields.get('last_matches') == 0:
+        raise ValueError("'last_matches' must be at least 1")
+    for name in ['minute_from', 'minute_to']:
+        if fields.get(name, 0) % BUCKET_MINUTES:
+            raise ValueError(f"'{name}' must be a multiple of {BUCKET_MINUTES}")
+    if fields.get('minute_from', 0) >= fields.get('minute_to', float('inf')):
+        raise ValueError("'minute_to' must be greater than 'minute_from'")
+    return Window(**fields)
+
+
+def window_parameters(window):
+    """The request parameters of a Window, without the unrestricted fields."""
+    return {name: value for name, value in window._asdict().items() if value is not None}
+
+
+def describe_window(window):
+    """Short human readable label, e.g. 'last 5 matches, 2H, minutes 60-90'."""
+    parts = []
+    if window.last_matches:
+        parts.append(f"last {window.last_matches} matches")
+    if window.match_from is not None or window.match_to is not None:
+        parts.append(f"matches {window.match_from or ''}..{window.match_to or ''}")
+    if window.period:
+        parts.append(window.period)
+    if window.minute_from is not None or window.minute_to is not None:
+        parts.append(f"minutes {window.minute_from or 0}-{window.minute_to if window.minute_to is not None else 'end'}")
+    return ', '.join(parts)
+
+
+def bucket_ranges(window):
+    """
+    The time buckets selected by a window as a list of contiguous (start, stop) index ranges.
+    A bucket is selected when its period matches and its first minute lies in
+    [minute_from, minute_to).
+    """
+    selected = [(window.period is None or period == window.period)
+                and (window.minute_from is None or minute >= window.minute_from)
+                and (window.minute_to is None or minute < window.minute_to)
+                for period, minute in TIME_BUCKETS]
+    ranges = []
+    for index, keep in enumerate(selected):
+        if keep and ranges and ranges[-1][1] == index:
+            ranges[-1] = (ranges[-1][0], index + 1)
+        elif keep:
+            ranges.append((index, index + 1))
+    return ranges
+
+
+class PrefixCounts:
+    """
+    Cumulative (summed-area) counts of one context over its matches and the time buckets:
+    entry [m, b] holds the counts of the first m matches in matchId order, restricted to the
+    first b time buckets. Any match range times time range is then four O(grid) lookups,
+    followed by the usual probability and xT steps.
+    """
+
+    def __init__(self, match_ids, match_groups, bins=(16, 12)):
+        """
+        match_groups holds, per match in match_ids order, the event_counts() result of the
+        match together with the time bucket of every group and a mask of the groups that
+        belong to this context.
+        """
+        from streaming_ingest import TOTAL_KEYS
+
+        self.bins = bins
+        self.match_ids = np.asarray(match_ids, dtype=np.int64)
+        n_sectors = bins[0] * bins[1]
+        shape = (len(match_ids) + 1, len(TIME_BUCKETS) + 1)
+
+        moves = sum(int(counts['start_counts'][keep].sum()) for counts, _, keep in match_groups)
+        # Transition counts dominate the memory; they get the smallest type that holds the totals
+        transition_dtype = np.min_scalar_type(moves)
+        self.prefix = {'grids': np.zeros(shape + (3, n_sectors), dtype=np.int64),
+                       'start_counts': np.zeros(shape + (n_sectors,), dtype=np.int64),
+                       'totals': np.zeros(shape + (len(TOTAL_KEYS),), dtype=np.int64),
+                       'counts': np.zeros(shape + (n_sectors * n_sectors,), dtype=transition_dtype)}
+
+        for match, (counts, buckets, keep) in enumerate(match_groups, start=1):
+            cells = buckets[keep] + 1
+            for name in ['grids', 'start_counts', 'totals']:
+                np.add.at(self.prefix[name][match], cells, counts[name][keep])
+            group, pair, count = counts['transitions']
+            selected = keep[group]
+            np.add.at(self.prefix['counts'][match], (buckets[group[selected]] + 1, pair[selected]),
+                      count[selected].astype(transition_dtype))
+        for prefix in self.prefix.values():
+            np.cumsum(prefix, axis=0, out=prefix)
+            np.cumsum(prefix, axis=1, out=prefix)
+
+    def match_range(self, window):
+        """Positions [start, stop) of the window's matches."""
+        start, stop = 0, len(self.match_ids)
+        if window.match_from is not None:
+            start = int(np.searchsorted(self.match_ids, window.match_from, side='left'))
+        if window.match_to is not None:
+            stop = int(np.searchsorted(self.match_ids, window.match_to, side='right'))
+        if window.last_matches:
+            start = max(start, stop - window.last_matches)
+        return start, max(start, stop)
+
+    def window_sums(self, window):
+        """Summed counts inside the window, keyed like the prefix arrays."""
+        first, last = self.match_range(window)
+        sums = {name: np.zeros(prefix.shape[2:], dtype=np.int64) for name, prefix in self.prefix.items()}
+        for start, stop in bucket_ranges(window):
+            for name, prefix in self.prefix.items():
+                sums[name] += ((prefix[last, stop].astype(np.int64) - prefix[first, stop])
+                               - (prefix[last, start].astype(np.int64) - prefix[first, start]))
+        return sums
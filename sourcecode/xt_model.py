@@ -0,0 +1,154 @@
+import numpy as np
+
+from transition_counts import transition_probabilities
+from xt_solver import solve_xt, solve_xt_batch
+
+# Secondary types that make an accurate pass a moving-ball action
+MOVE_TYPES = ['short_or_medium_pass', 'long_pass', 'head_pass', 'smart_pass', 'cross', 'forward_pass',
+              'progressive_pass', 'lateral_pass', 'back_pass', 'dribble']
+
+_grids = {}
+
+
+def pitch_grid(bins=(16, 12)):
+    """
+    Pitch geometry (x_grid, y_grid, cx, cy) of mplsoccer's bin_statistic for the 105x68 pitch,
+    so binned containers can be built from counts computed elsewhere.
+    """
+    bins = tuple(bins)
+    if bins not in _grids:
+        from mplsoccer import Pitch
+        pitch = Pitch(pitch_type='custom', pitch_length=105, pitch_width=68)
+        binned = pitch.bin_statistic(np.zeros(1), np.zeros(1), statistic='count', bins=bins)
+        _grids[bins] = {key: binned[key] for key in ['x_grid', 'y_grid', 'cx', 'cy']}
+    return dict(_grids[bins])
+
+
+def probability_maps(move_count, shot_count, goal_count):
+    """
+    Move, shot and goal probability per sector from the count grids; also works on stacks of grids.
+    """
+    total_actions = move_count + shot_count
+    move_probability = np.divide(move_count, total_actions, out=np.zeros_like(move_count), where=total_actions != 0)
+    shot_probability = np.divide(shot_count, total_actions, out=np.zeros_like(shot_count), where=total_actions != 0)
+    goal_probability = np.divide(goal_count, shot_count, out=np.zeros_like(goal_count), where=shot_count != 0)
+    return move_probability, shot_probability, goal_probability
+
+
+def add_probabilities_and_xt(calculations, transition_matrices_array, xt_method='iterate'):
+    """
+    Steps 2 and 3 of run_all_calculations: the probability maps from the move/shot/goal
+    count containers, then the xT Markov chain over the given transition tensor.
+    """
+    move_probability, shot_probability, goal_probability = probability_maps(
+        calculations['move_binned']["statistic"], calculations['shot_binned']["statistic"],
+        calculations['goal_binned']["statistic"])
+    xT_final, xT_iterates = solve_xt(shot_probability, goal_probability, move_probability,
+                                     transition_matrices_array, method=xt_method)
+    return store_results(calculations, move_probability, shot_probability, goal_probability,
+                         transition_matrices_array, xT_final, xT_iterates)
+
+
+def store_results(calculations, move_probability, shot_probability, goal_probability, transition_matrices_array,
+                  xT_final, xT_iterates):
+    """
+    Adds the probability maps, the transition tensor and the xT grids to a calculations dict,
+    wrapped in the binned containers the plots expect.
+    """
+    move_prob_binned = calculations['move_binned'].copy()
+    move_prob_binned["statistic"] = move_probability
+    shot_prob_binned = calculations['shot_binned'].copy()
+    shot_prob_binned["statistic"] = shot_probability
+    goal_prob_binned = calculations['goal_binned'].copy()
+    goal_prob_binned["statistic"] = goal_probability
+
+    calculations['move_prob_binned'] = move_prob_binned
+    calculations['shot_prob_binned'] = shot_prob_binned
+    calculations['goal_prob_binned'] = goal_prob_binned
+    calculations['goal_probability'] = goal_probability
+    calculations['shot_probability'] = shot_probability
+    calculations['move_probability'] = move_probability
+
+    calculations['transition_matrices_array'] = transition_matrices_array
+    xT_matrices = {}
+    for i, xT_iter in enumerate(xT_iterates):
+        # Reuse the move grid container, only the statistic differs
+        xT_binned_iter = calculations['move_binned'].copy()
+        xT_binned_iter["statistic"] = xT_iter
+        xT_matrices[f'xT Matrix after {i+1} Moves'] = xT_binned_iter
+
+    calculations['xT_matrices'] = xT_matrices
+    calculations['xT_final'] = xT_final
+    return calculations
+
+
+def calculations_from_counts(move_count, shot_count, goal_count, start_counts, counts, bins=(16, 12),
+                             xt_method='iterate'):
+    """
+    Builds the same calculations dict as run_all_calculations from pre-aggregated counts.
+
+    The count grids are (bins[1], bins[0]) with row 0 at the bottom of the pitch, the y_bin
+    order of transition_counts.sector_index; a grid is None when the context has no such events.
+    start_counts and counts are the move totals per start sector and the (start, end) count
+    matrix of transition_counts.transition_counts.
+    """
+    calculations = count_containers(move_count, shot_count, goal_count, bins)
+    if has_all_counts(calculations):
+        add_probabilities_and_xt(calculations, transition_probabilities(start_counts, counts, bins), xt_method)
+    return calculations
+
+
+def count_containers(move_count, shot_count, goal_count, bins=(16, 12)):
+    grid = pitch_grid(bins)
+    calculations = {}
+    for key, count in [('move_binned', move_count), ('shot_binned', shot_count), ('goal_binned', goal_count)]:
+        # mplsoccer grids run from the top of the pitch
+        calculations[key] = None if count is None else dict(grid, statistic=np.flipud(np.asarray(count, dtype=float)))
+    return calculations
+
+
+def has_all_counts(calculations):
+    return all(calculations[key] is not None for key in ['move_binned', 'shot_binned', 'goal_binned'])
+
+
+def batched_calculations(contexts_counts, bins=(16, 12), xt_method='iterate'):
+    """
+    calculations_from_counts for many contexts in one vectorized pass. contexts_counts is a
+    list of counts dicts (see CountAccumulator.context_counts; None for a context without
+    events). The count grids and transition counts are stacked along a leading context axis,
+    so the probabilities, transition tensors and xT of every context come from single array
+    operations and one batched solve. Returns the calculations dicts in input order.
+    """
+    results = [None if counts is None else count_containers(counts['move'], counts['shot'], counts['goal'], bins)
+               for counts in contexts_counts]
+    complete = [i for i, calculations in enumerate(results) if calculations is not None and has_all_counts(calculations)]
+    if not complete:
+        return results
+
+    move_count, shot_count, goal_count = (np.stack([results[i][key]['statistic'] for i in complete])
+                                          for key in ['move_binned', 'shot_binned', 'goal_binned'])
+    move_probability, shot_probability, goal_probability = probability_maps(move_count, shot_count, goal_count)
+    transition_matrices = transition_probabilities(np.stack([contexts_counts[i]['start_counts'] for i in complete]),
+                                                   np.stack([contexts_counts[i]['counts'] for i in complete]), bins)
+    xT_final, xT_iterates = solve_xt_batch(shot_probability, goal_probability, move_probability,
+                                           transition_matrices, method=xt_method)
+    for t, i in enumerate(complete):
+        store_results(results[i], move_probability[t], shot_probability[t], goal_probability[t],
+                      transition_matrices[t], xT_final[t], list(xT_iterates[t]))
+    return results
+
+
+# Maps compared against the league average by the "vs League Average" plots
+LEAGUE_AVERAGE_KEYS = ['move_probability', 'shot_probability', 'goal_probability', 'xT_final']
+
+
+def league_average(calculations_list):
+    """
+    Per-sector mean of the probability and xT maps over every context that has them, each
+    team weighted equally. None when no context does.
+    """
+    complete = [calculations for calculations in calculations_list
+                if calculations is not None and calculations.get('xT_final') is not None]
+    if not complete:
+        return None
+    return {key: np.mean([calculations[key] for calculations in complete], axis=0) for key in LEAGUE_AVERAGE_KEYS}
@@ -0,0 +1,159 @@
+import warnings
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import breadth_first_order
+from scipy.sparse.linalg import MatrixRankWarning, spsolve
+
+
+def transition_operator(transition_matrices_array):
+    """
+    Flattens the (n_sectors, ny, nx) transition tensor into a sparse (n_sectors, n_sectors) operator.
+    """
+    n_sectors = transition_matrices_array.shape[0]
+    return sparse.csr_matrix(np.asarray(transition_matrices_array).reshape(n_sectors, n_sectors))
+
+
+def trapped_sectors(move_operator, tol=1e-9):
+    """
+    Sectors from which the ball can never leave the chain: every sector reachable from them
+    only moves (move probability one) and keeps all of its moves on the pitch. Any such
+    sector makes I - move_operator singular, so the direct solve is skipped for it.
+    """
+    size = move_operator.shape[0]
+    leaking = np.flatnonzero(np.asarray(move_operator.sum(axis=1)).reshape(-1) < 1 - tol)
+    # Reversed moves plus a source node linked to every leaking sector: what the source reaches can leave
+    moves = move_operator.tocoo()
+    graph = sparse.csr_matrix((np.ones(len(moves.row) + len(leaking)),
+                               (np.concatenate([moves.col, np.full(len(leaking), size)]),
+                                np.concatenate([moves.row, leaking]))), shape=(size + 1, size + 1))
+    trapped = np.ones(size + 1, dtype=bool)
+    trapped[breadth_first_order(graph, size, directed=True, return_predecessors=False)] = False
+    return trapped[:size]
+
+
+def direct_solve(move_operator, shoot_expected_payoff):
+    """
+    The fixed point of xT = payoff + move_operator @ xT from one sparse solve, or None when
+    the system is singular (see trapped_sectors) or the solve gives non-finite values.
+    """
+    if trapped_sectors(move_operator).any():
+        return None
+    system = sparse.identity(move_operator.shape[0], format='csc') - move_operator.tocsc()
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', MatrixRankWarning)
+        xT = spsolve(system, shoot_expected_payoff)
+    return xT if np.all(np.isfinite(xT)) else None
+
+
+def solve_xt(shot_probability, goal_probability, move_probability, transition_matrices_array,
+             method='iterate', tol=1e-10, max_iterations=1000, num_iterations=10):
+    """
+    Solves the xT Markov chain  xT = shot * goal + move * (T @ xT).
+
+    method='iterate' runs value iteration on the sparse operator until the largest change
+    drops below `tol` (or `max_iterations` is reached). method='direct' solves the linear
+    system for the fixed point; when the system is singular it iterates to convergence
+    instead, exactly as method='iterate' does.
+
+    Returns the final xT grid and the first `num_iterations` iterates, which back the
+    "xT Matrix after N Moves" plots.
+    """
+    if method not in ('iterate', 'direct'):
+        raise ValueError(f"Unknown xT solver method: {method}")
+
+    grid_shape = np.shape(shot_probability)
+    shoot_expected_payoff = (np.asarray(goal_probability) * np.asarray(shot_probability)).reshape(-1)
+    move_prob = np.asarray(move_probability).reshape(-1)
+    operator = transition_operator(transition_matrices_array)
+    # Scaling the rows by the move probability once turns every iteration into a single sparse mat-vec
+    move_operator = sparse.diags(move_prob) @ operator
+
+    xT_direct = direct_solve(move_operator, shoot_expected_payoff) if method == 'direct' else None
+    # A direct solution only needs as many iterations as the plots
+    total_iterations = max(num_iterations, max_iterations) if xT_direct is None else num_iterations
+    xT = np.zeros_like(shoot_expected_payoff)
+    xT_iterates = []
+    for i in range(total_iterations):
+        xT_next = shoot_expected_payoff + move_operator @ xT
+        converged = np.max(np.abs(xT_next - xT), initial=0) < tol
+        xT = xT_next
+        if i < num_iterations:
+            xT_iterates.append(xT.reshape(grid_shape))
+        elif converged:
+            break
+
+    if xT_direct is not None:
+        xT = xT_direct
+
+    return xT.reshape(grid_shape), xT_iterates
+
+
+def solve_xt_batch(shot_probability, goal_probability, move_probability, transition_matrices_array,
+                   method='iterate', tol=1e-10, max_iterations=1000, num_iterations=10):
+    """
+    solve_xt for a stack of contexts at once: the probability grids are (n_contexts, ny, nx)
+    and the transition tensors (n_contexts, n_sectors, ny, nx). All contexts share one
+    block-diagonal sparse operator, so every iteration is a single mat-vec and
+    method='direct' a single sparse solve over the non-singular blocks; the singular ones keep
+    iterating to convergence. Each context stops on its own convergence, so the results
+    match solve_xt per context.
+
+    Returns the final xT grids (n_contexts, ny, nx) and the first `num_iterations` iterates
+    (n_contexts, num_iterations, ny, nx).
+    """
+    if method not in ('iterate', 'direct'):
+        raise ValueError(f"Unknown xT solver method: {method}")
+
+    shot_probability = np.asarray(shot_probability)
+    n_contexts, grid_shape = shot_probability.shape[0], shot_probability.shape[1:]
+    shoot_expected_payoff = (np.asarray(goal_probability) * shot_probability).reshape(-1)
+    move_prob = np.asarray(move_probability).reshape(n_contexts, -1)
+    n_sectors = move_prob.shape[1]
+    transitions = np.asarray(transition_matrices_array).reshape(n_contexts, n_sectors, n_sectors)
+
+    # Block t of the operator is diag(move_prob[t]) @ T[t], placed at rows/columns t * n_sectors
+    context, row, col = np.nonzero(transitions)
+    offset = context * n_sectors
+    size = n_contexts * n_sectors
+    move_operator = sparse.csr_matrix((move_prob[context, row] * transitions[context, row, col],
+                                       (offset + row, offset + col)), shape=(size, size))
+
+    solved = np.zeros(n_contexts, dtype=bool)
+    xT_direct = np.zeros((n_contexts, n_sectors))
+    if method == 'direct':
+        # Blocks with a trapped sector are singular; the rest are solved together
+        candidates = np.flatnonzero(~trapped_sectors(move_operator).reshape(n_contexts, n_sectors).any(axis=1))
+        rows = (candidates[:, None] * n_sectors + np.arange(n_sectors)).reshape(-1)
+        xT_joint = direct_solve(move_operator[rows][:, rows], shoot_expected_payoff[rows]) if len(rows) else None
+        if xT_joint is not None:
+            xT_direct[candidates] = xT_joint.reshape(-1, n_sectors)
+            solved[candidates] = True
+        else:
+            # One ill-conditioned block spoils the joint solve; solve the blocks one by one instead
+            for t in candidates:
+                block = slice(t * n_sectors, (t + 1) * n_sectors)
+                xT_block = direct_solve(move_operator[block, block], shoot_expected_payoff[block])
+                if xT_block is not None:
+                    xT_direct[t], solved[t] = xT_block, True
+
+    xT = np.zeros(size)
+    xT_iterates = np.zeros((n_contexts, num_iterations, n_sectors))
+    # Solved contexts only iterate as far as the plots need
+    active = np.ones(n_contexts, dtype=bool)
+    for i in range(max(num_iterations, max_iterations)):
+        xT_next = shoot_expected_payoff + move_operator @ xT
+        converged = np.max(np.abs(xT_next - xT).reshape(n_contexts, n_sectors), axis=1, initial=0) < tol
+        # Contexts that already stopped keep their final value
+        xT = np.where(np.repeat(active, n_sectors), xT_next, xT)
+        if i < num_iterations:
+            xT_iterates[:, i] = xT.reshape(n_contexts, n_sectors)
+        else:
+            active &= ~converged & ~solved
+            if not active.any():
+                break
+
+    xT = xT.reshape(n_contexts, n_sectors)
+    xT[solved] = xT_direct[solved]
+
+    return xT.reshape((n_contexts,) + grid_shape), xT_iterates.reshape((n_contexts, num_iterations) + grid_shape)